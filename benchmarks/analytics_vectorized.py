@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark du module analytics : NumPy vectorisé vs boucles Python.
+
+Generates synthetic readings (timestamps, sensor codes, values) and times
+each statistic of iot.analytics against a straightforward pure-Python
+implementation: percentiles, moving average, linear trend and per-sensor
+comparison. No database access.
+
+Usage:
+    python benchmarks/analytics_vectorized.py --points 1000000 --sensors 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import django
+import numpy as np
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from iot import analytics  # noqa: E402
+
+
+def python_percentiles(values):
+    ordered = sorted(values)
+    return [statistics.quantiles(ordered, n=100, method='inclusive')[p - 1] for p in analytics.PERCENTILES]
+
+
+def python_moving_average(values, window):
+    result, total = [], 0.0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        if i >= window - 1:
+            result.append(total / window)
+    return result
+
+
+def python_trend(seconds, values):
+    n = len(values)
+    x_mean, y_mean = sum(seconds) / n, sum(values) / n
+    sxy = sum((x - x_mean) * (y - y_mean) for x, y in zip(seconds, values))
+    sxx = sum((x - x_mean) ** 2 for x in seconds)
+    return sxy / sxx
+
+
+def python_per_sensor(sensors, seconds, values):
+    """Same outputs as analytics.per_sensor: count, mean, std, slope, p50/p95/p99"""
+    groups = {}
+    for sensor, x, value in zip(sensors, seconds, values):
+        groups.setdefault(sensor, ([], []))
+        groups[sensor][0].append(x)
+        groups[sensor][1].append(value)
+    return {
+        sensor: (len(ys), statistics.fmean(ys), statistics.pstdev(ys), python_trend(xs, ys), python_percentiles(ys))
+        for sensor, (xs, ys) in groups.items()
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized analytics benchmark')
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--window', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = np.datetime64('2025-01-01T00:00:00', 'us')
+    times = start + np.cumsum(rng.integers(900000, 1100000, args.points)).astype('timedelta64[us]')
+    sensors = rng.integers(1, args.sensors + 1, args.points)
+    values = rng.normal(50, 15, args.points) + np.linspace(0, 5, args.points)
+    arrays = analytics.MetricArrays('cpu_usage', times, sensors, values)
+    seconds = arrays.seconds()
+
+    py_values, py_seconds, py_sensors = values.tolist(), seconds.tolist(), sensors.tolist()
+    cases = [
+        ('percentiles p50/p95/p99',
+         lambda: analytics.summary(values), lambda: python_percentiles(py_values)),
+        (f'moving average ({args.window} pts)',
+         lambda: analytics.moving_average(values, args.window), lambda: python_moving_average(py_values, args.window)),
+        ('linear trend',
+         lambda: analytics.linear_trend(seconds, values), lambda: python_trend(py_seconds, py_values)),
+        (f'per-sensor ({args.sensors} sensors)',
+         lambda: analytics.per_sensor(arrays), lambda: python_per_sensor(py_sensors, py_seconds, py_values)),
+    ]
+
+    print(f'{args.points:,} points, {args.sensors} sensors')
+    print(f"{'statistic':<28} {'numpy':>10} {'python':>10} {'speedup':>8}")
+    for name, vectorized, baseline in cases:
+        numpy_time = min(timed(vectorized) for _ in range(3))
+        python_time = timed(baseline)
+        print(f'{name:<28} {numpy_time * 1000:>8.1f}ms {python_time * 1000:>8.0f}ms '
+              f'{python_time / numpy_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
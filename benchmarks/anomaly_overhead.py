@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark du détecteur d'anomalies : coût par lecture.
+
+1. Detector alone: synthetic readings (no database) through
+   AnomalyDetector.observe, with a few injected spikes and a stuck CPU.
+2. Full ingest pipeline (ingest_reading) with detection on and off,
+   inside a transaction that is rolled back (the database is unchanged).
+
+Usage:
+    python benchmarks/anomaly_overhead.py --readings 100000 --sensors 50 --ingest 300
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from django.db import transaction  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from iot import anomalies, ingest, sketches  # noqa: E402
+
+
+class Reading:
+    """Stand-in for IoTData with the attributes the detector reads"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def synthetic_readings(count, sensors, seed):
+    rng = random.Random(seed)
+    start = datetime(2025, 12, 1, tzinfo=timezone.utc)
+    readings = []
+    for i in range(count):
+        sensor = i % sensors + 1
+        cpu = min(100, max(0, rng.gauss(45, 12)))
+        power = max(0, rng.gauss(120, 15))
+        if i > count // 2 and sensor == 1:
+            cpu = 100  # stuck CPU
+        if rng.random() < 0.0005:
+            power *= 4  # spike
+        readings.append(Reading(
+            id=i, created_at=start + timedelta(seconds=i),
+            hardware_sensor_ref_id=sensor, energy_sensor_ref_id=sensor, network_sensor_ref_id=sensor,
+            cpu_usage=cpu, ram_usage=rng.gauss(60, 10), battery_health=rng.gauss(85, 3),
+            power_watts=power, co2_equiv_g=power * 0.05,
+            network_load_mbps=rng.gauss(40, 8), requests_per_min=rng.gauss(300, 40),
+        ))
+    return readings
+
+
+def payload(i):
+    return {
+        'hardware': {'sensor_id': f'bench_hw_{i % 10}', 'cpu_usage': 40 + i % 20, 'ram_usage': 50,
+                     'battery_health': 90, 'age_years': 2, 'timestamp': i},
+        'energy': {'sensor_id': f'bench_en_{i % 10}', 'power_watts': 100 + i % 7, 'co2_equiv_g': 5},
+        'network': {'sensor_id': f'bench_net_{i % 10}', 'network_load_mbps': 30, 'requests_per_min': 200},
+    }
+
+
+def time_ingest(count, enabled):
+    """Seconds per ingest_reading, rolled back afterwards"""
+    class Rollback(Exception):
+        pass
+
+    anomalies.detector.reset()
+    elapsed = 0.0
+    with override_settings(IOT_ANOMALY_DETECTION=enabled):
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                for i in range(count):
+                    ingest.ingest_reading(payload(i))
+                elapsed = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+    sketches.store.reset()
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Anomaly detector overhead benchmark')
+    parser.add_argument('--readings', type=int, default=100000)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--ingest', type=int, default=300, help='Readings for the full pipeline (0 to skip)')
+    parser.add_argument('--rounds', type=int, default=3, help='Interleaved off/on rounds (best kept)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    readings = synthetic_readings(args.readings, args.sensors, args.seed)
+    detector = anomalies.AnomalyDetector()
+    start = time.perf_counter()
+    alerts = [alert for reading in readings for alert in detector.observe(reading)]
+    elapsed = time.perf_counter() - start
+    metrics = len(detector.thresholds.metrics)
+    print(f'Detector alone: {args.readings:,} readings x {metrics} metrics, {len(detector)} states')
+    print(f'  {elapsed / args.readings * 1e6:.1f} µs/reading '
+          f'({elapsed / args.readings / metrics * 1e6:.2f} µs/metric), {len(alerts)} alerts')
+    kinds = {}
+    for alert in alerts:
+        kinds[alert.kind] = kinds.get(alert.kind, 0) + 1
+    print(f'  by kind: {kinds}')
+
+    if args.ingest:
+        # Interleaved rounds: the pipeline (snapshot broadcasts) dominates and is noisy
+        off, on = float('inf'), float('inf')
+        for _ in range(args.rounds):
+            off = min(off, time_ingest(args.ingest, enabled=False))
+            on = min(on, time_ingest(args.ingest, enabled=True))
+        print(f'ingest_reading ({args.ingest} readings, best of {args.rounds}, rolled back):')
+        print(f'  detection off: {off * 1000:.2f} ms/reading')
+        print(f'  detection on : {on * 1000:.2f} ms/reading  ({(on - off) * 1e6:+.0f} µs)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'archive compressée : taille et vitesse de décodage.
+
+Encodes the raw readings currently in IoTData (every partition) the way
+the retention engine archives them, without writing anything, then
+reports bytes per row against the SQLite table + indexes (dbstat), the
+bits per value of each column and encode / decode throughput.
+
+Usage:
+    python benchmarks/archive_codec.py --segment-rows 4096 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from iot import archive, gorilla, partitions  # noqa: E402
+
+
+def load_rows():
+    columns = archive.SEGMENT_COLUMNS + list(archive.COLUMN_CODECS)
+    rows = []
+    for queryset in partitions.querysets():
+        rows.extend(dict(zip(columns, row)) for row in queryset.order_by('created_at', 'id').values_list(*columns))
+    return rows
+
+
+def table_bytes():
+    """Table + index bytes of every IoTData partition (SQLite dbstat)"""
+    tables = [model._meta.db_table for model in partitions.models_for_range()]
+    placeholders = ', '.join(['%s'] * len(tables))
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({placeholders}) "
+                f"OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN ({placeholders}))",
+                tables * 2,
+            )
+            return cursor.fetchone()[0]
+    except Exception:
+        return None
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive codec size and throughput benchmark')
+    parser.add_argument('--segment-rows', type=int, default=4096)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = load_rows()
+    if not rows:
+        print('No IoTData rows to encode')
+        return
+    window_start = rows[0]['created_at']
+
+    encode_time, built = best_of(args.repeat, lambda: archive.build_segments(rows, window_start, args.segment_rows))
+    blocks = [block for _, segment_blocks in built for block in segment_blocks]
+    encoded = sum(len(block.data) for block in blocks)
+    raw = table_bytes()
+
+    print(f'{len(rows)} rows, {len(built)} segments of up to {args.segment_rows} rows')
+    if raw:
+        print(f'SQLite table + indexes : {raw / len(rows):>8.1f} bytes/row')
+    print(f'Archive blocks         : {encoded / len(rows):>8.1f} bytes/row'
+          + (f'  (ratio {raw / encoded:.1f}x)' if raw else ''))
+    print(f'Encode                 : {len(rows) / encode_time:>10,.0f} rows/s')
+
+    per_column = defaultdict(int)
+    for block in blocks:
+        per_column[(block.column, block.encoding)] += len(block.data)
+    print(f"\n{'column':<26} {'encoding':<8} {'bits/value':>10}")
+    for (column, encoding), size in sorted(per_column.items(), key=lambda item: -item[1]):
+        print(f'{column:<26} {encoding:<8} {size * 8 / len(rows):>10.2f}')
+
+    print(f"\n{'encoding':<8} {'values':>10} {'decode values/s':>16}")
+    by_encoding = defaultdict(list)
+    for (segment, _), block in ((pair, block) for pair in built for block in pair[1]):
+        by_encoding[block.encoding].append((block.data, segment.row_count))
+    for encoding, items in by_encoding.items():
+        values = sum(count for _, count in items)
+        seconds, _ = best_of(args.repeat, lambda: [gorilla.decode(encoding, data, count) for data, count in items])
+        print(f'{encoding:<8} {values:>10} {values / seconds:>16,.0f}')
+
+    readers = [archive.SegmentReader(segment, {b.column: b for b in segment_blocks}) for segment, segment_blocks in built]
+    columns = list(archive.COLUMN_CODECS)
+
+    def decode_rows():
+        for reader in readers:
+            reader.decoded = {}
+        return archive.window_rows(readers, columns)
+
+    seconds, decoded = best_of(args.repeat, decode_rows)
+    print(f'\nFull rows decode (all columns, merged): {len(decoded) / seconds:,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
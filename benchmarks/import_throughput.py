@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'import en masse (manage.py import_iot).
+
+Writes synthetic readings as CSV and NDJSON (nested Node-RED payloads,
+one in three wrapped in a captured request), then imports each file into
+a fresh, migrated throw-away SQLite database, once with per-batch sensor
+state / sketch updates and once with ``defer`` (indexes dropped, derived
+state rebuilt at the end), and reports rows per second.
+
+Usage:
+    python benchmarks/import_throughput.py --rows 200000 --sensors 20
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from iot import importer, models, sketches  # noqa: E402
+
+START = 1746057600  # 2025-05-01 UTC
+CSV_COLUMNS = [
+    'hardware_sensor_id', 'hardware_timestamp', 'age_years', 'cpu_usage', 'ram_usage', 'battery_health',
+    'os', 'win11_compat', 'energy_sensor_id', 'energy_timestamp', 'power_watts', 'active_devices',
+    'overheating', 'co2_equiv_g', 'network_sensor_id', 'network_timestamp', 'network_load_mbps',
+    'requests_per_min', 'cloud_dependency_score',
+]
+
+
+def payloads(rows, sensors, seed):
+    rng = random.Random(seed)
+    for i in range(rows):
+        sensor = f'ESP32_{i % sensors:03d}'
+        timestamp = START + i // sensors * 5
+        yield {
+            'hardware': {
+                'sensor_id': sensor, 'timestamp': timestamp, 'age_years': rng.randint(0, 8),
+                'cpu_usage': rng.randint(0, 100), 'ram_usage': rng.randint(0, 100),
+                'battery_health': round(rng.uniform(40, 100), 1),
+                'os': rng.choice(['Windows 10', 'Windows 11', 'Linux']), 'win11_compat': rng.random() < 0.5,
+            },
+            'energy': {
+                'sensor_id': sensor, 'timestamp': timestamp, 'power_watts': rng.randint(20, 400),
+                'active_devices': rng.randint(1, 10), 'overheating': int(rng.random() < 0.02),
+                'co2_equiv_g': rng.randint(0, 50),
+            },
+            'network': {
+                'sensor_id': sensor, 'timestamp': timestamp, 'network_load_mbps': rng.randint(0, 200),
+                'requests_per_min': rng.randint(0, 1000), 'cloud_dependency_score': rng.randint(0, 100),
+            },
+        }
+
+
+def write_files(directory, rows, sensors, seed):
+    csv_path = os.path.join(directory, 'history.csv')
+    ndjson_path = os.path.join(directory, 'history.ndjson')
+    with open(csv_path, 'w', newline='') as csv_file, open(ndjson_path, 'w') as ndjson_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_COLUMNS)
+        for i, payload in enumerate(payloads(rows, sensors, seed)):
+            flat = {}
+            for family in ('hardware', 'energy', 'network'):
+                for key, value in payload[family].items():
+                    flat[f'{family}_{key}' if key in ('sensor_id', 'timestamp') else key] = value
+            writer.writerow([flat[column] for column in CSV_COLUMNS])
+            record = {'method': 'POST', 'path': '/api/iot-data/', 'body': json.dumps(payload)} if i % 3 == 0 else payload
+            ndjson_file.write(json.dumps(record) + '\n')
+    return {'csv': csv_path, 'ndjson': ndjson_path}
+
+
+def fresh_database(path):
+    connection.close()
+    if os.path.exists(path):
+        os.remove(path)
+    settings.DATABASES['default']['NAME'] = path
+    connection.settings_dict['NAME'] = path
+    call_command('migrate', verbosity=0)
+    # Ids cached for the previous database
+    models._LOOKUP_CACHES.clear()
+    models._RECOMMENDATION_PKS.clear()
+    sketches.store.reset()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import throughput benchmark')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--sensors', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, args.rows, args.sensors, args.seed)
+        database = os.path.join(directory, 'bench.sqlite3')
+        print(f"{'format':>7} {'mode':>10} {'rows':>9} {'seconds':>8} {'rows/s':>9}")
+        for fmt, path in files.items():
+            for defer in (False, True):
+                fresh_database(database)
+                started = time.perf_counter()
+                report = importer.import_file(path, fmt, args.batch_size, defer=defer, rotate=False)
+                elapsed = time.perf_counter() - started
+                assert report['imported'] == args.rows, report
+                mode = 'deferred' if defer else 'per batch'
+                print(f'{fmt:>7} {mode:>10} {report["imported"]:>9,} {elapsed:>8.2f} {args.rows / elapsed:>9,.0f}')
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'ingestion : POST /api/iot-data/ vs protocole ligne TCP vs WebSocket.
+
+1. HTTP: iot_data_post through the Django test client (URL routing,
+   middleware, JSON parsing), one request per reading.
+2. Line protocol: the ingest_server listener in this process, fed over
+   one persistent TCP connection by a separate client process.
+3. WebSocket: ws/ingest/ (IngestConsumer) through the channels test
+   communicator, batches of --ws-batch readings per message, cumulative
+   acks, the client waiting for credits when it has none left.
+
+Both run on a fresh, migrated throw-away SQLite database and report
+readings per second and CPU time (this process) per reading. The test
+and WebSocket clients are in process, so their CPU includes building the
+messages; the line client's CPU is not counted.
+
+Usage:
+    python benchmarks/line_ingest.py --readings 2000 --sensors 20 --batch-size 500 --ws-batch 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import django
+from django.test.utils import override_settings
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from channels.routing import URLRouter  # noqa: E402
+from channels.testing import WebsocketCommunicator  # noqa: E402
+from iot import line_protocol, listener, models, routing, sketches  # noqa: E402
+
+START = 1764547200  # 2025-12-01 UTC
+SENDER = '''
+import socket, sys
+with open(sys.argv[3], 'rb') as handle:
+    data = handle.read()
+with socket.create_connection((sys.argv[1], int(sys.argv[2]))) as sock:
+    sock.sendall(data)
+'''
+
+
+def readings(count, sensors, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield f'ESP32_{i % sensors:03d}', {
+            'age_years': rng.randint(0, 8), 'cpu_usage': rng.randint(0, 100), 'ram_usage': rng.randint(0, 100),
+            'battery_health': round(rng.uniform(40, 100), 1), 'os': rng.choice(['Windows 10', 'Windows 11', 'Linux']),
+            'win11_compat': rng.random() < 0.5, 'power_watts': rng.randint(20, 400),
+            'active_devices': rng.randint(1, 10), 'overheating': int(rng.random() < 0.02),
+            'co2_equiv_g': rng.randint(0, 50), 'network_load_mbps': rng.randint(0, 200),
+            'requests_per_min': rng.randint(0, 1000), 'cloud_dependency_score': rng.randint(0, 100),
+        }, START + i // sensors * 5
+
+
+def fresh_database(path):
+    connection.close()
+    if os.path.exists(path):
+        os.remove(path)
+    settings.DATABASES['default']['NAME'] = path
+    connection.settings_dict['NAME'] = path
+    call_command('migrate', verbosity=0)
+    # Ids cached for the previous database
+    models._LOOKUP_CACHES.clear()
+    models._RECOMMENDATION_PKS.clear()
+    sketches.store.reset()
+
+
+def measure(run, count):
+    wall, cpu = time.perf_counter(), time.process_time()
+    run()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return count / wall, cpu / count * 1e6
+
+
+def run_http(data):
+    # The test client's host
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    client = Client()
+    for sensor, fields, timestamp in data:
+        payload = {f'{family}_sensor_id': sensor for family in ('hardware', 'energy', 'network')}
+        payload.update(fields, hardware_timestamp=timestamp, energy_timestamp=timestamp, network_timestamp=timestamp)
+        response = client.post('/api/iot-data/', json.dumps(payload), content_type='application/json')
+        assert response.status_code == 201, response.content
+
+
+def run_line(path, count, batch_size):
+    async def main():
+        stop = asyncio.Event()
+        bound = []
+
+        def report(stats):
+            if stats.get('stored', 0) + stats.get('failed', 0) >= count:
+                stop.set()
+
+        server = asyncio.create_task(listener.serve(
+            '127.0.0.1', 0, None, batch_size, stats_interval=0.01, report=report, ready=bound.extend, stop=stop))
+        while not bound:
+            await asyncio.sleep(0.01)
+        client = await asyncio.create_subprocess_exec(sys.executable, '-c', SENDER, '127.0.0.1',
+                                                      str(bound[0][1][1]), path)
+        await client.wait()
+        stats = await server
+        assert stats.get('stored') == count, stats
+
+    asyncio.run(main())
+
+
+def run_websocket(data, batch_size, message_size):
+    payloads = []
+    for sensor, fields, timestamp in data:
+        payload = {f'{family}_sensor_id': sensor for family in ('hardware', 'energy', 'network')}
+        payload.update(fields, hardware_timestamp=timestamp, energy_timestamp=timestamp, network_timestamp=timestamp)
+        payloads.append(payload)
+
+    async def main():
+        client = WebsocketCommunicator(URLRouter(routing.websocket_urlpatterns), '/ws/ingest/?ack=cumulative')
+        await client.connect()
+        credits = (await client.receive_json_from())['credits']
+        stored, seq = 0, 0
+        for start in range(0, len(payloads), message_size):
+            chunk = payloads[start:start + message_size]
+            while credits < len(chunk):
+                ack = await client.receive_json_from(timeout=60)
+                credits += ack['credits']
+                stored += ack['stored']
+            await client.send_to(text_data=json.dumps({'readings': chunk}))
+            credits -= len(chunk)
+            seq += 1
+        ack = {'seq': 0}
+        while ack['seq'] < seq:
+            ack = await client.receive_json_from(timeout=60)
+            stored += ack['stored']
+        await client.disconnect()
+        assert stored == len(payloads), stored
+
+    with override_settings(IOT_INGEST_WS_BATCH_SIZE=batch_size):
+        asyncio.run(main())
+    # As ingest_server does on shutdown (under daphne: the periodic flusher)
+    sketches.store.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP vs line protocol ingest benchmark')
+    parser.add_argument('--readings', type=int, default=2000)
+    parser.add_argument('--sensors', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=listener.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--ws-batch', type=int, default=50, help='Readings per WebSocket message')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    data = list(readings(args.readings, args.sensors, args.seed))
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        lines = os.path.join(directory, 'readings.txt')
+        with open(lines, 'w') as handle:
+            handle.writelines(line_protocol.format_line(*reading) + '\n' for reading in data)
+
+        print(f"{'path':>22} {'readings':>9} {'readings/s':>11} {'CPU µs/reading':>15}")
+        fresh_database(database)
+        rate, cpu = measure(lambda: run_http(data), args.readings)
+        print(f"{'POST /api/iot-data/':>22} {args.readings:>9,} {rate:>11,.0f} {cpu:>15,.0f}")
+        fresh_database(database)
+        rate, cpu = measure(lambda: run_line(lines, args.readings, args.batch_size), args.readings)
+        print(f"{f'TCP lines (batch {args.batch_size})':>22} {args.readings:>9,} {rate:>11,.0f} {cpu:>15,.0f}")
+        fresh_database(database)
+        rate, cpu = measure(lambda: run_websocket(data, args.batch_size, args.ws_batch), args.readings)
+        print(f"{f'WebSocket ({args.ws_batch}/msg)':>22} {args.readings:>9,} {rate:>11,.0f} {cpu:>15,.0f}")
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
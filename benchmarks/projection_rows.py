@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la couche de projection : instances de modèle vs tuples.
+
+Reads the same IoTData rows twice: as full model instances (all columns,
+attribute access, what the data builders did before) and through a
+Projection (only the declared columns, values_list tuples, no model
+construction), then reports rows per second for each approach.
+
+Usage:
+    python benchmarks/projection_rows.py --rows 5000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from iot.models import IoTData  # noqa: E402
+from iot import data_utils  # noqa: E402
+
+
+def read_instances(limit, fields):
+    rows = IoTData.objects.order_by('-created_at')[:limit]
+    return [{field: getattr(data, field) for field in fields} for data in rows]
+
+
+def read_projection(limit, projection):
+    return projection.latest(limit)
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Projection vs model instance read benchmark')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    projections = {
+        'dashboard': data_utils.DASHBOARD_FIELDS,
+        'scores': data_utils.SCORES_FIELDS,
+        'history': data_utils.HISTORY_FIELDS,
+    }
+    print(f"{'page':<10} {'rows':>6} {'instances rows/s':>18} {'projection rows/s':>18} {'speedup':>8}")
+    for name, projection in projections.items():
+        instance_time, count = best_of(args.repeat, read_instances, args.rows, projection.fields)
+        projection_time, _ = best_of(args.repeat, read_projection, args.rows, projection)
+        if not count:
+            print('No IoTData rows to read')
+            return
+        print(f'{name:<10} {count:>6} {count / instance_time:>18,.0f} '
+              f'{count / projection_time:>18,.0f} {instance_time / projection_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark des recommandations : règles évaluées à chaque lecture vs cache LRU.
+
+Generates recommendations for stored readings (--source db, the newest
+--rows) or synthetic ones, once by evaluating the rules for every
+reading and once through the feature-bucketed LRU cache, checks both
+give the same documents and reports readings per second and hit rate.
+
+Usage:
+    python benchmarks/recommendations_cache.py --rows 100000 --source synthetic
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from iot import recommendations  # noqa: E402
+from iot.projections import Projection  # noqa: E402
+
+
+def synthetic_rows(count, seed):
+    rng = random.Random(seed)
+    return [{
+        'age_years': rng.randint(0, 8), 'cpu_usage': rng.randint(0, 100),
+        'battery_health': rng.uniform(5, 100), 'win11_compat': rng.random() < 0.3,
+        'power_watts': rng.randint(100, 1500), 'active_devices': rng.randint(0, 80),
+        'overheating': rng.randint(0, 5), 'cloud_dependency_score': rng.randint(0, 100),
+    } for _ in range(count)]
+
+
+def db_rows(count):
+    return Projection(recommendations.FEATURE_FIELDS).latest(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recommendations cache benchmark')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--source', choices=['synthetic', 'db'], default='synthetic')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.seed) if args.source == 'synthetic' else db_rows(args.rows)
+    if not rows:
+        print('No readings')
+        return
+
+    start = time.perf_counter()
+    expected = [recommendations._advise(recommendations.features(row)) for row in rows]
+    uncached = time.perf_counter() - start
+
+    recommendations.reset()
+    start = time.perf_counter()
+    found = [recommendations.for_reading(row) for row in rows]
+    cached = time.perf_counter() - start
+
+    assert expected == found, 'cached and evaluated documents disagree'
+    stats = recommendations.stats()
+    print(f'{len(rows):,} {args.source} readings, {stats["size"]} distinct feature tuples')
+    print(f'  rules every time: {len(rows) / uncached:>10,.0f} readings/s')
+    print(f'  LRU cache       : {len(rows) / cached:>10,.0f} readings/s  '
+          f'({uncached / cached:.1f}x, hit rate {stats["hit_rate"]:.1%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark des rapports hors ligne : 1 processus vs pool de processus.
+
+Writes a synthetic columnar snapshot (no database), then computes the
+daily partial aggregates of every sensor and of the fleet with
+reports.compute for each worker count, and checks every run merges to
+the same result.
+
+Usage:
+    python benchmarks/report_workers.py --rows 5000000 --days 60 --workers 1,2,4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+import numpy as np
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from iot import reports, snapshots  # noqa: E402
+
+START = datetime(2025, 10, 1, tzinfo=timezone.utc)
+
+
+def write_snapshot(path, rows, days, sensors, seed):
+    rng = np.random.default_rng(seed)
+    span_us = days * 86400 * 1000000
+    times = np.datetime64(START.replace(tzinfo=None), 'us') + np.sort(rng.integers(0, span_us, rows)).astype('timedelta64[us]')
+    columns = {'created_at': times}
+    for name in ('hardware_sensor_id', 'energy_sensor_id', 'network_sensor_id'):
+        columns[name] = rng.integers(1, sensors + 1, rows).astype('<i4')
+    for metric in reports.DEFAULT_METRICS:
+        columns[metric] = rng.integers(0, 1000, rows).astype('<i4')
+
+    manifest = {'format': snapshots.FORMAT, 'version': snapshots.VERSION, 'rows': rows, 'columns': {}}
+    for name, values in columns.items():
+        _, dtype, kind = snapshots.COLUMN_TYPES[name]
+        values.astype(dtype).tofile(os.path.join(path, f'{name}.bin'))
+        entry = {'file': f'{name}.bin', 'dtype': dtype, 'kind': kind}
+        if kind == 'category':
+            entry['categories'] = {str(code): f'sensor_{code}' for code in range(1, sensors + 1)}
+        manifest['columns'][name] = entry
+    with open(os.path.join(path, snapshots.MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process pool report benchmark')
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 1}', help='Comma-separated worker counts')
+    parser.add_argument('--days-per-chunk', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        write_snapshot(path, args.rows, args.days, args.sensors, args.seed)
+        end = START + timedelta(days=args.days)
+        print(f'{args.rows:,} readings, {args.days} days, {args.sensors} sensors, {os.cpu_count()} CPU(s)')
+        print(f"{'workers':>8} {'seconds':>8} {'readings/s':>12} {'speedup':>8}")
+        baseline = expected = None
+        for workers in dict.fromkeys(int(n) for n in args.workers.split(',')):
+            started = time.perf_counter()
+            partials, rows, _ = reports.compute(START, end, workers=workers,
+                                                days_per_chunk=args.days_per_chunk, snapshot=path)
+            elapsed = time.perf_counter() - started
+            assert rows == args.rows
+            if expected is None:
+                expected, baseline = partials, elapsed
+            assert partials.keys() == expected.keys(), 'worker counts disagree'
+            for key, metrics in partials.items():
+                for metric, values in metrics.items():
+                    assert np.allclose(values, expected[key][metric]), 'worker counts disagree'
+            print(f'{workers:>8} {elapsed:>8.2f} {args.rows / elapsed:>12,.0f} {baseline / elapsed:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark du moteur de règles : index par seuils vs évaluation naïve.
+
+Compiles random threshold rules (one to three comparisons, fleet-wide or
+scoped to a sensor) without touching the database, then matches
+synthetic readings through the RuleIndex and by evaluating every rule,
+checks both give the same rules and reports readings per second.
+
+Usage:
+    python benchmarks/rules_index.py --rules 1000,5000 --readings 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from iot.rules import CompiledRule, RuleIndex, SENSOR_ATTNAMES  # noqa: E402
+
+# Metric -> (low, high) of the synthetic values
+RANGES = {
+    'cpu_usage': (0, 100),
+    'ram_usage': (0, 100),
+    'battery_health': (40, 100),
+    'age_years': (0, 10),
+    'power_watts': (20, 400),
+    'overheating': (0, 1),
+    'co2_equiv_g': (0, 50),
+    'network_load_mbps': (0, 200),
+    'requests_per_min': (0, 1000),
+}
+OPS = ['>', '>=', '<', '<=', '>', '<']
+
+
+class Reading:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def random_rules(count, sensors, rng):
+    rules = []
+    for i in range(count):
+        parts = []
+        for metric in rng.sample(list(RANGES), rng.choice([1, 1, 2, 3])):
+            low, high = RANGES[metric]
+            if metric == 'overheating':
+                parts.append(f'{metric} == 1')
+            else:
+                # Thresholds in the tails: operator rules rarely match
+                op = rng.choice(OPS)
+                edge = rng.uniform(0.9, 0.999) if '>' in op else rng.uniform(0.001, 0.1)
+                parts.append(f'{metric} {op} {low + (high - low) * edge:.1f}')
+        sensor = rng.randint(1, sensors) if rng.random() < 0.5 else None
+        rules.append(CompiledRule(i, f'rule {i}', ' and '.join(parts), sensor))
+    return rules
+
+
+def random_readings(count, sensors, rng):
+    readings = []
+    for i in range(count):
+        values = {metric: rng.uniform(low, high) for metric, (low, high) in RANGES.items()}
+        values['overheating'] = 1 if rng.random() < 0.02 else 0
+        sensor = rng.randint(1, sensors)
+        readings.append(Reading(id=i, **dict.fromkeys(SENSOR_ATTNAMES, sensor), **values))
+    return readings
+
+
+def naive(rules, reading):
+    return [rule for rule in rules
+            if (rule.sensor is None or getattr(reading, rule.ref_attname) == rule.sensor) and rule.matches(reading)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert rules index benchmark')
+    parser.add_argument('--rules', default='100,1000,5000', help='Comma-separated rule counts')
+    parser.add_argument('--readings', type=int, default=2000)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    readings = random_readings(args.readings, args.sensors, rng)
+    print(f"{'rules':>6} {'naive/s':>10} {'indexed/s':>10} {'speedup':>8} {'candidates':>11} {'matches':>8}")
+    for count in (int(n) for n in args.rules.split(',')):
+        rules = random_rules(count, args.sensors, rng)
+        index = RuleIndex(rules)
+
+        start = time.perf_counter()
+        expected = [naive(rules, reading) for reading in readings]
+        naive_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = [list(index.matching(reading, {reading.hardware_sensor_ref_id})) for reading in readings]
+        index_time = time.perf_counter() - start
+
+        for want, got in zip(expected, found):
+            assert {rule.id for rule in want} == {rule.id for rule in got}, 'index and naive disagree'
+        candidates = sum(len(list(index.candidates(r, {r.hardware_sensor_ref_id}))) for r in readings) / len(readings)
+        matches = sum(len(m) for m in found) / len(readings)
+        print(f'{count:>6} {len(readings) / naive_time:>10,.0f} {len(readings) / index_time:>10,.0f} '
+              f'{naive_time / index_time:>7.1f}x {candidates:>11.1f} {matches:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
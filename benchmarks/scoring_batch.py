@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark du calcul des scores : lecture par lecture vs lots vectorisés.
+
+Scores synthetic IoTData field dicts (no database) one reading at a time,
+as single-row ingest does, then in batches of increasing size through
+scoring.apply_scores, and checks both give the same scores.
+
+Usage:
+    python benchmarks/scoring_batch.py --rows 100000 --batches 100,1000,10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nuit_info.settings')
+django.setup()
+
+from iot import scoring  # noqa: E402
+
+
+def synthetic_rows(count, seed):
+    rng = random.Random(seed)
+    return [{
+        'age_years': rng.randint(0, 8), 'cpu_usage': rng.randint(0, 100),
+        'battery_health': rng.uniform(5, 100), 'win11_compat': rng.random() < 0.3,
+        'power_watts': rng.randint(100, 1500), 'active_devices': rng.randint(0, 80),
+        'overheating': rng.randint(0, 5), 'co2_equiv_g': rng.randint(5, 330),
+        'network_load_mbps': rng.randint(0, 200), 'requests_per_min': rng.randint(0, 2000),
+        'cloud_dependency_score': rng.randint(0, 100),
+    } for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scoring engine batch benchmark')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batches', default='100,1000,10000', help='Comma-separated batch sizes')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.seed)
+    single = [dict(row) for row in rows]
+    start = time.perf_counter()
+    for row in single:
+        scoring.apply_scores([row])
+    single_time = time.perf_counter() - start
+    print(f'{args.rows:,} readings, formula v{scoring.get_version()}')
+    print(f"{'batch':>7} {'readings/s':>12} {'speedup':>8}")
+    print(f"{1:>7} {args.rows / single_time:>12,.0f} {1:>7.1f}x")
+
+    for size in (int(n) for n in args.batches.split(',')):
+        batched = [dict(row) for row in rows]
+        start = time.perf_counter()
+        for offset in range(0, len(batched), size):
+            scoring.apply_scores(batched[offset:offset + size])
+        elapsed = time.perf_counter() - start
+        assert batched == single, 'batched and single-row scores disagree'
+        print(f'{size:>7} {args.rows / elapsed:>12,.0f} {single_time / elapsed:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark du stockage IoTData : chaînes vs identifiants internés.
+
+Builds two throw-away SQLite files with the same synthetic readings, one
+with the original layout (sensor ids and OS stored as strings) and one with
+the interned layout (small integer foreign keys to lookup tables), then
+reports bytes per row (table + indexes, after VACUUM) and scan speed.
+The DDL mirrors what the iot migrations generate before and after 0006.
+
+Usage:
+    python benchmarks/storage_layout.py --rows 200000 --sensors 50
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+
+METRIC_COLUMNS = '''
+    "hardware_timestamp" bigint NOT NULL, "age_years" integer NOT NULL,
+    "cpu_usage" integer NOT NULL, "ram_usage" integer NOT NULL,
+    "battery_health" real NOT NULL, "win11_compat" bool NOT NULL,
+    "energy_timestamp" bigint NOT NULL, "power_watts" integer NOT NULL,
+    "active_devices" integer NOT NULL, "overheating" integer NOT NULL,
+    "co2_equiv_g" integer NOT NULL, "network_timestamp" bigint NOT NULL,
+    "network_load_mbps" integer NOT NULL, "requests_per_min" integer NOT NULL,
+    "cloud_dependency_score" integer NOT NULL, "eco_score" integer NOT NULL,
+    "obsolescence_score" integer NOT NULL, "bigtech_dependency" integer NOT NULL,
+    "co2_savings_kg_year" integer NOT NULL, "created_at" datetime NOT NULL,
+    "recommendations" text NOT NULL
+'''
+METRIC_NAMES = [
+    'hardware_timestamp', 'age_years', 'cpu_usage', 'ram_usage', 'battery_health',
+    'win11_compat', 'energy_timestamp', 'power_watts', 'active_devices', 'overheating',
+    'co2_equiv_g', 'network_timestamp', 'network_load_mbps', 'requests_per_min',
+    'cloud_dependency_score', 'eco_score', 'obsolescence_score', 'bigtech_dependency',
+    'co2_savings_kg_year', 'created_at', 'recommendations',
+]
+
+LAYOUTS = {
+    'strings': {
+        'ddl': [
+            f'''CREATE TABLE "iot_iotdata" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+                "hardware_sensor_id" varchar(50) NOT NULL, "os" varchar(20) NOT NULL,
+                "energy_sensor_id" varchar(50) NOT NULL, "network_sensor_id" varchar(50) NOT NULL,
+                {METRIC_COLUMNS})''',
+            'CREATE INDEX "iot_created_idx" ON "iot_iotdata" ("created_at")',
+            'CREATE INDEX "iot_hw_sensor_time_idx" ON "iot_iotdata" ("hardware_sensor_id", "created_at")',
+            'CREATE INDEX "iot_energy_sensor_time_idx" ON "iot_iotdata" ("energy_sensor_id", "created_at")',
+            'CREATE INDEX "iot_net_sensor_time_idx" ON "iot_iotdata" ("network_sensor_id", "created_at")',
+        ],
+        'key_columns': ['hardware_sensor_id', 'os', 'energy_sensor_id', 'network_sensor_id'],
+        'scan': '''SELECT hardware_sensor_id, AVG(cpu_usage), AVG(power_watts)
+                   FROM iot_iotdata GROUP BY hardware_sensor_id''',
+        'range': '''SELECT created_at, cpu_usage FROM iot_iotdata
+                    WHERE hardware_sensor_id = ? ORDER BY created_at''',
+    },
+    'interned': {
+        'ddl': [
+            'CREATE TABLE "iot_sensoridentifier" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(50) NOT NULL UNIQUE)',
+            'CREATE TABLE "iot_operatingsystem" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(20) NOT NULL UNIQUE)',
+            f'''CREATE TABLE "iot_iotdata" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+                {METRIC_COLUMNS},
+                "hardware_sensor_ref_id" bigint NOT NULL REFERENCES "iot_sensoridentifier" ("id"),
+                "energy_sensor_ref_id" bigint NOT NULL REFERENCES "iot_sensoridentifier" ("id"),
+                "network_sensor_ref_id" bigint NOT NULL REFERENCES "iot_sensoridentifier" ("id"),
+                "os_ref_id" bigint NOT NULL REFERENCES "iot_operatingsystem" ("id"))''',
+            'CREATE INDEX "iot_created_idx" ON "iot_iotdata" ("created_at")',
+            'CREATE INDEX "iot_hw_sensor_ref_time_idx" ON "iot_iotdata" ("hardware_sensor_ref_id", "created_at")',
+            'CREATE INDEX "iot_energy_ref_time_idx" ON "iot_iotdata" ("energy_sensor_ref_id", "created_at")',
+            'CREATE INDEX "iot_net_sensor_ref_time_idx" ON "iot_iotdata" ("network_sensor_ref_id", "created_at")',
+        ],
+        'key_columns': ['hardware_sensor_ref_id', 'os_ref_id', 'energy_sensor_ref_id', 'network_sensor_ref_id'],
+        'scan': '''SELECT s.name, t.cpu, t.power FROM (
+                       SELECT hardware_sensor_ref_id AS ref, AVG(cpu_usage) AS cpu, AVG(power_watts) AS power
+                       FROM iot_iotdata GROUP BY hardware_sensor_ref_id
+                   ) t JOIN iot_sensoridentifier s ON s.id = t.ref''',
+        'range': '''SELECT created_at, cpu_usage FROM iot_iotdata
+                    WHERE hardware_sensor_ref_id = (SELECT id FROM iot_sensoridentifier WHERE name = ?)
+                    ORDER BY created_at''',
+    },
+}
+
+OS_NAMES = ['Windows 10', 'Windows 11', 'Ubuntu 22.04', 'macOS 14', 'Debian 12']
+
+
+def generate_rows(count, sensors, seed):
+    rng = random.Random(seed)
+    start = time.time() - count
+    recommendations = json.dumps({'action': 'upgrade_ram', 'priority': 'medium'})
+    for i in range(count):
+        n = rng.randrange(sensors)
+        cpu = rng.randint(5, 100)
+        ts = int(start + i)
+        created = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i))
+        yield (
+            f'hardware_sensor_{n:03d}', OS_NAMES[n % len(OS_NAMES)],
+            f'energy_sensor_{n:03d}', f'network_sensor_{n:03d}',
+            ts, rng.randint(0, 10), cpu, max(20, cpu - 10), round(rng.uniform(50, 100), 1),
+            n % 2, ts, cpu * 2, rng.randint(1, 12), rng.randint(0, 1), cpu * 3,
+            ts, rng.randint(10, 500), rng.randint(50, 500), rng.randint(0, 100),
+            rng.randint(20, 100), rng.randint(0, 100), rng.randint(0, 100), rng.randint(0, 300),
+            created, recommendations,
+        )
+
+
+def build(layout_name, path, rows):
+    layout = LAYOUTS[layout_name]
+    conn = sqlite3.connect(path)
+    for statement in layout['ddl']:
+        conn.execute(statement)
+
+    columns = layout['key_columns'] + METRIC_NAMES
+    placeholders = ', '.join('?' * len(columns))
+    insert = f'INSERT INTO iot_iotdata ({", ".join(columns)}) VALUES ({placeholders})'
+
+    if layout_name == 'interned':
+        sensor_ids, os_ids = {}, {}
+
+        def intern(cache, table, name):
+            if name not in cache:
+                cache[name] = conn.execute(f'INSERT INTO {table} (name) VALUES (?)', (name,)).lastrowid
+            return cache[name]
+
+        def convert(row):
+            return (
+                intern(sensor_ids, 'iot_sensoridentifier', row[0]),
+                intern(os_ids, 'iot_operatingsystem', row[1]),
+                intern(sensor_ids, 'iot_sensoridentifier', row[2]),
+                intern(sensor_ids, 'iot_sensoridentifier', row[3]),
+            ) + row[4:]
+        rows = (convert(row) for row in rows)
+
+    with conn:
+        conn.executemany(insert, rows)
+    conn.execute('VACUUM')
+    return conn
+
+
+def timed(conn, sql, params=(), repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IoTData storage layout benchmark')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f'{args.rows} rows, {args.sensors} sensors')
+    print(f"{'layout':<10} {'bytes/row':>10} {'full scan':>12} {'rows/s':>14} {'sensor range':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout_name in LAYOUTS:
+            path = os.path.join(tmp, f'{layout_name}.sqlite3')
+            conn = build(layout_name, path, generate_rows(args.rows, args.sensors, args.seed))
+            size = os.path.getsize(path)
+            scan = timed(conn, LAYOUTS[layout_name]['scan'])
+            sensor_range = timed(conn, LAYOUTS[layout_name]['range'], ('hardware_sensor_007',))
+            conn.close()
+            print(f'{layout_name:<10} {size / args.rows:>10.1f} {scan * 1000:>10.1f}ms '
+                  f'{args.rows / scan:>14,.0f} {sensor_range * 1000:>12.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
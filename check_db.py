@@ -7,7 +7,10 @@ cursor.execute('SELECT COUNT(*) FROM iot_iotdata')
 count = cursor.fetchone()[0]
 print('Nombre d\'entrées IoTData:', count)
 
-cursor.execute('SELECT id, hardware_sensor_id, created_at FROM iot_iotdata')
+cursor.execute(
+    'SELECT d.id, s.name, d.created_at FROM iot_iotdata d '
+    'JOIN iot_sensoridentifier s ON s.id = d.hardware_sensor_ref_id'
+)
 rows = cursor.fetchall()
 for row in rows:
     print('Entrée:', row)
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import IoTData
+from .models import AlertRule, AnomalyAlert, ImportCheckpoint, IoTData, Report, RuleAlert, SensorState
 
 # Register your models here.
 admin.site.register(IoTData)
+admin.site.register(SensorState)
+admin.site.register(AnomalyAlert)
+admin.site.register(AlertRule)
+admin.site.register(RuleAlert)
+admin.site.register(Report)
+admin.site.register(ImportCheckpoint)
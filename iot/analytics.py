@@ -0,0 +1,257 @@
+"""
+Statistiques vectorisées (NumPy) sur les métriques IoT.
+
+A metric is loaded once into three aligned arrays (timestamps, sensor
+codes, values) from the raw readings (archive + time partitions), from
+the minute / hour rollups, or from a columnar snapshot, then every
+statistic is computed with array operations: percentiles, moving
+averages, least-squares trends and per-sensor comparisons.
+"""
+import numpy as np
+from django.conf import settings
+from .models import IoTRollup, SensorIdentifier, METRIC_FAMILIES, SENSOR_FIELDS, SENSOR_REF_FIELDS
+
+
+PERCENTILES = (50, 95, 99)
+RESOLUTIONS = ('raw', 'minute', 'hour')
+
+
+class MetricArrays:
+    """Timestamps (datetime64[us]), sensor codes et valeurs alignés"""
+
+    def __init__(self, metric, times, sensors, values):
+        self.metric = metric
+        self.times = times
+        self.sensors = sensors
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def seconds(self):
+        """Seconds since the first point, as float64 (regression input)"""
+        if not len(self):
+            return np.empty(0)
+        return (self.times - self.times[0]) / np.timedelta64(1, 's')
+
+
+def get_max_points():
+    return getattr(settings, 'IOT_ANALYTICS_MAX_POINTS', 2000000)
+
+
+def _family_ref(metric):
+    if metric not in METRIC_FAMILIES:
+        raise ValueError(f'Unknown metric: {metric}')
+    family = METRIC_FAMILIES[metric]
+    return SENSOR_FIELDS[family], f'{SENSOR_REF_FIELDS[family]}_id'
+
+
+def _to_arrays(metric, rows):
+    if not rows:
+        return MetricArrays(metric, np.empty(0, 'datetime64[us]'), np.empty(0, np.int64), np.empty(0))
+    times, sensors, values = zip(*rows)
+    return MetricArrays(
+        metric,
+        np.array([t.replace(tzinfo=None) for t in times], dtype='datetime64[us]'),
+        np.array(sensors, dtype=np.int64),
+        np.array(values, dtype=np.float64),
+    )
+
+
+def load_metric(metric, start=None, end=None, sensor_id=None, resolution='raw', limit=None):
+    """
+    Load one metric as arrays, oldest first.
+    Raw readings come from the archive then each time partition;
+    'minute' / 'hour' read the rollup averages. At most ``limit`` points
+    (IOT_ANALYTICS_MAX_POINTS by default), the most recent ones are dropped.
+    """
+    from itertools import chain, islice
+    from . import archive, partitions
+
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f'Unknown resolution: {resolution}')
+    _, ref = _family_ref(metric)
+    limit = limit or get_max_points()
+    filters = {}
+    if sensor_id is not None:
+        filters[ref] = SensorIdentifier.lookup(sensor_id) or -1
+
+    if resolution == 'raw':
+        sources = [archive.iter_rows(['created_at', ref, metric], start, end, **filters)]
+        for queryset in partitions.querysets(start, end):
+            sources.append(
+                queryset.filter(**filters).order_by('created_at').values_list('created_at', ref, metric)
+                .iterator(chunk_size=10000)
+            )
+    else:
+        queryset = IoTRollup.objects.filter(resolution=resolution, **filters).exclude(**{f'{metric}__isnull': True})
+        if start is not None:
+            queryset = queryset.filter(bucket_start__gte=start)
+        if end is not None:
+            queryset = queryset.filter(bucket_start__lt=end)
+        sources = [queryset.order_by('bucket_start').values_list('bucket_start', ref, metric).iterator(chunk_size=10000)]
+    return _to_arrays(metric, list(islice(chain.from_iterable(sources), limit)))
+
+
+def snapshot_metric(snapshot, metric):
+    """MetricArrays straight from a columnar snapshot (no DB access)"""
+    sensor_column, _ = _family_ref(metric)
+    return MetricArrays(
+        metric,
+        np.asarray(snapshot['created_at']),
+        np.asarray(snapshot[sensor_column], dtype=np.int64),
+        np.asarray(snapshot[metric], dtype=np.float64),
+    )
+
+
+# ==================== STATISTICS ====================
+
+def summary(values, percentiles=PERCENTILES):
+    """Count, mean, std, min, max and percentiles"""
+    if not len(values):
+        return {'count': 0}
+    points = np.percentile(values, percentiles)
+    result = {
+        'count': int(len(values)),
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+    }
+    result.update({f'p{p}': float(v) for p, v in zip(percentiles, points)})
+    return result
+
+
+def moving_average(values, window):
+    """Simple moving average over ``window`` points (len - window + 1 values)"""
+    if window < 1:
+        raise ValueError('window must be >= 1')
+    if len(values) < window:
+        return np.empty(0)
+    cumulative = np.cumsum(np.concatenate(([0.0], values)))
+    return (cumulative[window:] - cumulative[:-window]) / window
+
+
+def linear_trend(seconds, values):
+    """Least-squares line: slope per hour / per day, intercept and r²"""
+    n = len(values)
+    if n < 2 or seconds[-1] == seconds[0]:
+        return None
+    x_mean, y_mean = seconds.mean(), values.mean()
+    dx, dy = seconds - x_mean, values - y_mean
+    sxx = np.dot(dx, dx)
+    slope = np.dot(dx, dy) / sxx
+    syy = np.dot(dy, dy)
+    r2 = (np.dot(dx, dy) ** 2) / (sxx * syy) if syy else 1.0
+    return {
+        'slope_per_hour': float(slope * 3600),
+        'slope_per_day': float(slope * 86400),
+        'intercept': float(y_mean - slope * x_mean),
+        'r2': float(r2),
+    }
+
+
+def grouped_percentiles(groups, values, percentiles=PERCENTILES):
+    """
+    Percentiles of values per group, without a Python loop over groups.
+    Returns (unique groups, array of shape (len(groups), len(percentiles))).
+    """
+    # Sort by value, then stable sort by group (radix on integer codes):
+    # same order as np.lexsort((values, groups)), about twice as fast
+    order = np.argsort(values)
+    order = order[np.argsort(groups[order], kind='stable')]
+    sorted_groups, sorted_values = groups[order], values[order]
+    unique, starts, counts = np.unique(sorted_groups, return_index=True, return_counts=True)
+    # Linear interpolation between closest ranks, as numpy.percentile
+    positions = starts[:, None] + (counts[:, None] - 1) * (np.asarray(percentiles) / 100.0)[None, :]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, (starts + counts - 1)[:, None])
+    fraction = positions - lower
+    result = sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+    return unique, result
+
+
+def per_sensor(arrays, percentiles=PERCENTILES):
+    """Count, mean, percentiles and trend slope of each sensor"""
+    if not len(arrays):
+        return []
+    unique, inverse = np.unique(arrays.sensors, return_inverse=True)
+    counts = np.bincount(inverse)
+    sums = np.bincount(inverse, weights=arrays.values)
+    means = sums / counts
+    variance = np.bincount(inverse, weights=(arrays.values - means[inverse]) ** 2) / counts
+
+    # Per-sensor least squares from grouped sums
+    x = arrays.seconds()
+    sx = np.bincount(inverse, weights=x)
+    sxx = np.bincount(inverse, weights=x * x)
+    sxy = np.bincount(inverse, weights=x * arrays.values)
+    denominator = counts * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = np.where(denominator > 0, (counts * sxy - sx * sums) / denominator, np.nan)
+
+    _, quantiles = grouped_percentiles(arrays.sensors, arrays.values, percentiles)
+    sensors = []
+    for i, code in enumerate(unique):
+        entry = {
+            'sensor_id': SensorIdentifier.name_for(int(code)),
+            'count': int(counts[i]),
+            'mean': float(means[i]),
+            'std': float(np.sqrt(variance[i])),
+            'slope_per_hour': None if np.isnan(slopes[i]) else float(slopes[i] * 3600),
+        }
+        entry.update({f'p{p}': float(v) for p, v in zip(percentiles, quantiles[i])})
+        sensors.append(entry)
+    return sensors
+
+
+def sample_indices(length, points):
+    """Evenly spaced indices to return at most ``points`` values"""
+    if length <= points:
+        return np.arange(length)
+    return np.linspace(0, length - 1, points).astype(np.int64)
+
+
+def iso(times):
+    return [str(t) + 'Z' for t in times.astype('datetime64[us]')]
+
+
+# ==================== API PAYLOADS ====================
+
+def metric_report(metric, start=None, end=None, sensor_id=None, resolution='raw', window=60, points=500):
+    """Summary, trend and moving average of one metric"""
+    arrays = load_metric(metric, start, end, sensor_id, resolution)
+    averaged = moving_average(arrays.values, window)
+    # Each moving average value is stamped with the last point of its window
+    stamps = arrays.times[window - 1:] if len(averaged) else arrays.times[:0]
+    keep = sample_indices(len(averaged), points)
+    return {
+        'metric': metric,
+        'sensor_id': sensor_id,
+        'resolution': resolution,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'first': iso(arrays.times[:1])[0] if len(arrays) else None,
+        'last': iso(arrays.times[-1:])[0] if len(arrays) else None,
+        'truncated': len(arrays) >= get_max_points(),
+        'summary': summary(arrays.values),
+        'trend': linear_trend(arrays.seconds(), arrays.values),
+        'moving_average': {
+            'window': window,
+            'timestamps': iso(stamps[keep]),
+            'values': averaged[keep].tolist(),
+        },
+    }
+
+
+def sensor_comparison(metric, start=None, end=None, resolution='raw'):
+    """Per-sensor statistics of one metric, with the fleet summary"""
+    arrays = load_metric(metric, start, end, resolution=resolution)
+    return {
+        'metric': metric,
+        'resolution': resolution,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'fleet': summary(arrays.values),
+        'sensors': per_sensor(arrays),
+    }
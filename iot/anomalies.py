@@ -0,0 +1,206 @@
+"""
+Détection d'anomalies en continu, par capteur et par métrique.
+
+Each (sensor, metric) pair keeps a constant-size state updated with
+every reading of the ingest pipeline; history is never queried:
+
+- Welford running mean / variance of the values -> 'zscore' alert when a
+  value is more than IOT_ANOMALY_Z standard deviations from the mean
+  (e.g. a power spike);
+- EWMA level and EWMA of the squared steps between consecutive readings
+  -> 'rate' alert when a step exceeds IOT_ANOMALY_RATE_Z times the
+  recent step volatility (sudden jump or drop);
+- run length of identical values -> 'stuck' alert when a normally
+  varying metric repeats its running min or max IOT_ANOMALY_STUCK_READINGS
+  times (e.g. CPU stuck at 100%).
+
+Readings are checked against the state before they update it. No alert
+is raised before IOT_ANOMALY_MIN_SAMPLES readings, and a (sensor,
+metric, kind) alerts at most once per IOT_ANOMALY_COOLDOWN_SECONDS.
+Alerts are stored in AnomalyAlert and pushed to the 'alerts_updates'
+WebSocket group. State lives in process memory and is rebuilt after a
+restart (warm-up).
+"""
+import logging
+import math
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger('iot.anomalies')
+
+DEFAULT_METRICS = ('cpu_usage', 'ram_usage', 'battery_health', 'power_watts', 'co2_equiv_g',
+                   'network_load_mbps', 'requests_per_min')
+
+ALERTS_GROUP = 'alerts_updates'
+
+
+class Thresholds:
+    """Réglages du détecteur (lus une fois depuis settings)"""
+
+    def __init__(self):
+        self.metrics = tuple(getattr(settings, 'IOT_ANOMALY_METRICS', DEFAULT_METRICS))
+        self.z = getattr(settings, 'IOT_ANOMALY_Z', 4.0)
+        self.rate_z = getattr(settings, 'IOT_ANOMALY_RATE_Z', 6.0)
+        self.alpha = getattr(settings, 'IOT_ANOMALY_EWMA_ALPHA', 0.1)
+        self.min_samples = getattr(settings, 'IOT_ANOMALY_MIN_SAMPLES', 30)
+        self.stuck_readings = getattr(settings, 'IOT_ANOMALY_STUCK_READINGS', 30)
+        self.cooldown = getattr(settings, 'IOT_ANOMALY_COOLDOWN_SECONDS', 300)
+
+
+class MetricState:
+    """État O(1) d'une métrique d'un capteur"""
+
+    __slots__ = ('count', 'mean', 'm2', 'ewma', 'step_var', 'last', 'run', 'low', 'high', 'alerted')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = None
+        self.step_var = 0.0
+        self.last = None
+        self.run = 0
+        self.low = math.inf
+        self.high = -math.inf
+        self.alerted = {}
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def check(self, value, thresholds):
+        """Anomalies of value against the current state: [(kind, score)]"""
+        if self.count < thresholds.min_samples:
+            return []
+        found = []
+        std = self.std
+        if std > 0:
+            z = abs(value - self.mean) / std
+            if z > thresholds.z:
+                found.append(('zscore', z))
+        if self.step_var > 0:
+            step_z = abs(value - self.last) / math.sqrt(self.step_var)
+            if step_z > thresholds.rate_z:
+                found.append(('rate', step_z))
+        run = self.run + 1 if value == self.last else 1
+        if (run == thresholds.stuck_readings and std > 0
+                and (value <= self.low or value >= self.high)):
+            found.append(('stuck', float(run)))
+        return found
+
+    def update(self, value, alpha):
+        # Welford
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        # EWMA level and step volatility
+        if self.last is None:
+            self.ewma = value
+        else:
+            step = value - self.last
+            self.ewma += alpha * (value - self.ewma)
+            self.step_var += alpha * (step * step - self.step_var)
+        self.run = self.run + 1 if value == self.last else 1
+        self.last = value
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+
+
+class AnomalyDetector:
+    """États par (capteur, métrique) et production des alertes"""
+
+    def __init__(self, thresholds=None):
+        self.thresholds = thresholds or Thresholds()
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def observe(self, reading):
+        """
+        Check then absorb one reading (IoTData-like object).
+        Returns unsaved AnomalyAlert instances.
+        """
+        from .models import AnomalyAlert, METRIC_FAMILIES, SENSOR_REF_FIELDS
+
+        thresholds = self.thresholds
+        moment = reading.created_at
+        alerts = []
+        with self._lock:
+            for metric in thresholds.metrics:
+                value = getattr(reading, metric)
+                if value is None:
+                    continue
+                value = float(value)
+                sensor = getattr(reading, f'{SENSOR_REF_FIELDS[METRIC_FAMILIES[metric]]}_id')
+                state = self._states.get((sensor, metric))
+                if state is None:
+                    state = self._states[(sensor, metric)] = MetricState()
+                for kind, score in state.check(value, thresholds):
+                    last = state.alerted.get(kind)
+                    if last is not None and (moment - last).total_seconds() < thresholds.cooldown:
+                        continue
+                    state.alerted[kind] = moment
+                    alerts.append(AnomalyAlert(
+                        sensor_ref_id=sensor, metric=metric, kind=kind, value=value,
+                        expected=state.ewma, score=round(score, 3),
+                        reading_id=reading.id, created_at=moment,
+                    ))
+                state.update(value, thresholds.alpha)
+        return alerts
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+
+
+detector = AnomalyDetector()
+
+
+def is_enabled():
+    return getattr(settings, 'IOT_ANOMALY_DETECTION', True)
+
+
+def serialize_alert(alert):
+    return {
+        'id': alert.id,
+        'sensor_id': alert.sensor_id,
+        'metric': alert.metric,
+        'kind': alert.kind,
+        'value': alert.value,
+        'expected': alert.expected,
+        'score': alert.score,
+        'reading_id': alert.reading_id,
+        'created_at': alert.created_at.isoformat(),
+    }
+
+
+def process_reading(reading):
+    """Detect, store and publish the anomalies of one ingested reading"""
+    from .models import AnomalyAlert
+
+    if not is_enabled():
+        return []
+    alerts = detector.observe(reading)
+    if alerts:
+        alerts = AnomalyAlert.objects.bulk_create(alerts)
+        publish(alerts)
+    return alerts
+
+
+def publish(alerts):
+    """Push new alerts to the alerts WebSocket group"""
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+
+    try:
+        async_to_sync(get_channel_layer().group_send)(ALERTS_GROUP, {
+            'type': 'data_update',
+            'data': {'type': 'alerts', 'alerts': [serialize_alert(alert) for alert in alerts]},
+        })
+    except Exception:
+        # Alerts are stored anyway; don't block ingestion
+        logger.exception('Error sending alerts to group %s', ALERTS_GROUP)
@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class IotConfig(AppConfig):
     name = 'iot'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from . import rules
+        # Recompile the alert rules of this process as soon as one changes
+        post_save.connect(rules.on_rule_changed, sender='iot.AlertRule', dispatch_uid='iot_rules_save')
+        post_delete.connect(rules.on_rule_changed, sender='iot.AlertRule', dispatch_uid='iot_rules_delete')
+
+        if getattr(settings, 'IOT_QUERY_PROFILING', False):
+            from django.db.backends.signals import connection_created
+            from . import db_profiling
+            connection_created.connect(db_profiling.on_connection_created, dispatch_uid='iot_query_profiler')
+        if getattr(settings, 'IOT_PROFILER_SIGNAL', None):
+            from . import profiling
+            profiling.install_signal_handler()
@@ -0,0 +1,269 @@
+"""
+Archive froide des lectures brutes.
+
+When the retention engine expires raw readings (and ``IOT_RETENTION
+['archive']`` is not 0), they are moved into ArchiveSegment rows: one per
+retention window and sensor triple, with every IoTData column stored as a
+Gorilla-encoded ArchiveBlock (see ``gorilla``). Sensor refs are constant
+per segment and not stored per row.
+
+Reads are lazy: only the blocks of the requested columns are fetched, and
+a window is only decoded when a page or a series actually reaches it.
+``ArchivedRows`` plugs into the history pagination, ``iter_rows`` into the
+per-sensor series.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+from .models import ArchiveBlock, ArchiveSegment, IoTData, SENSOR_REF_FIELDS
+from . import gorilla
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Constant per segment, stored on ArchiveSegment itself
+SEGMENT_COLUMNS = [IoTData._meta.get_field(ref).attname for ref in SENSOR_REF_FIELDS.values()]
+
+
+def to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def column_codec(field):
+    """(encoding, to_int, from_int) of an IoTData field"""
+    if isinstance(field, models.DateTimeField):
+        return 'dod', to_micros, from_micros
+    if isinstance(field, models.FloatField):
+        return 'xor', None, None
+    if isinstance(field, models.BooleanField):
+        return 'delta', int, bool
+    if field.is_relation and field.null:
+        # Primary keys start at 1: 0 stands for NULL
+        return 'delta', lambda v: v or 0, lambda v: v or None
+    if field.primary_key or isinstance(field, models.BigIntegerField):
+        return 'dod', None, None
+    return 'delta', None, None
+
+
+# Stored column -> (encoding, to_int, from_int)
+COLUMN_CODECS = {
+    field.attname: column_codec(field)
+    for field in IoTData._meta.local_fields
+    if field.attname not in SEGMENT_COLUMNS
+}
+
+
+def get_segment_rows():
+    return getattr(settings, 'IOT_ARCHIVE_SEGMENT_ROWS', 4096)
+
+
+# ==================== WRITE ====================
+
+def build_segments(rows, window_start, segment_rows=None):
+    """
+    Encode rows (dicts of stored columns, sorted by created_at) into
+    unsaved (segment, [blocks]) pairs.
+    """
+    segment_rows = segment_rows or get_segment_rows()
+    key = lambda row: tuple(row[column] for column in SEGMENT_COLUMNS)  # noqa: E731
+    built = []
+    for refs, group in groupby(sorted(rows, key=key), key=key):
+        group = list(group)
+        for offset in range(0, len(group), segment_rows):
+            chunk = group[offset:offset + segment_rows]
+            segment = ArchiveSegment(
+                window_start=window_start,
+                start_time=chunk[0]['created_at'],
+                end_time=chunk[-1]['created_at'],
+                row_count=len(chunk),
+                **dict(zip(SEGMENT_COLUMNS, refs)),
+            )
+            blocks = []
+            for column, (encoding, to_int, _) in COLUMN_CODECS.items():
+                values = [row[column] for row in chunk]
+                if to_int:
+                    values = [to_int(value) for value in values]
+                blocks.append(ArchiveBlock(column=column, encoding=encoding, data=gorilla.encode(encoding, values)))
+            built.append((segment, blocks))
+    return built
+
+
+def archive_queryset(queryset, window_start):
+    """
+    Copy the readings of a queryset (one retention window) into the
+    archive. The caller deletes them in the same transaction, so a window
+    is never archived twice. Returns rows archived.
+    """
+    columns = SEGMENT_COLUMNS + list(COLUMN_CODECS)
+    rows = [dict(zip(columns, row)) for row in queryset.order_by('created_at', 'id').values_list(*columns)]
+    if not rows:
+        return 0
+    built = build_segments(rows, window_start)
+    with transaction.atomic():
+        ArchiveSegment.objects.bulk_create([segment for segment, _ in built])
+        blocks = []
+        for segment, segment_blocks in built:
+            for block in segment_blocks:
+                block.segment = segment
+                blocks.append(block)
+        ArchiveBlock.objects.bulk_create(blocks, batch_size=500)
+    return len(rows)
+
+
+# ==================== READ ====================
+
+class SegmentReader:
+    """Décode les colonnes d'un segment à la demande"""
+
+    def __init__(self, segment, blocks):
+        self.segment = segment
+        self.blocks = blocks
+        self.decoded = {}
+
+    def column(self, name):
+        if name in SEGMENT_COLUMNS:
+            return [getattr(self.segment, name)] * self.segment.row_count
+        if name not in self.decoded:
+            block = self.blocks[name]
+            values = gorilla.decode(block.encoding, block.data, self.segment.row_count)
+            from_int = COLUMN_CODECS[name][2]
+            self.decoded[name] = [from_int(value) for value in values] if from_int else values
+        return self.decoded[name]
+
+
+def load_readers(segments, columns):
+    """SegmentReaders with only the blocks of the requested columns fetched"""
+    segments = list(segments)
+    needed = {'created_at', 'id', *columns} - set(SEGMENT_COLUMNS)
+    blocks = {}
+    for block in ArchiveBlock.objects.filter(segment__in=segments, column__in=needed):
+        blocks.setdefault(block.segment_id, {})[block.column] = block
+    return [SegmentReader(segment, blocks.get(segment.pk, {})) for segment in segments]
+
+
+def window_rows(readers, columns, start=None, end=None, newest_first=False, selection=None):
+    """
+    Rows of overlapping segments merged in time order, as column tuples.
+    Only the rows in ``selection`` (a slice of that order) are built.
+    """
+    order = []
+    for reader in readers:
+        created, ids = reader.column('created_at'), reader.column('id')
+        order.extend((created[i], ids[i], reader, i) for i in range(reader.segment.row_count))
+    order.sort(key=lambda item: (item[0], item[1]), reverse=newest_first)
+    if start is not None or end is not None:
+        order = [
+            item for item in order
+            if (start is None or item[0] >= start) and (end is None or item[0] < end)
+        ]
+    if selection is not None:
+        order = order[selection]
+    return [tuple(reader.column(column)[i] for column in columns) for _, _, reader, i in order]
+
+
+def segments_for(start=None, end=None, where=None, **filters):
+    segments = ArchiveSegment.objects.filter(**filters)
+    if where is not None:
+        segments = segments.filter(where)
+    if start is not None:
+        segments = segments.filter(end_time__gte=start)
+    if end is not None:
+        segments = segments.filter(start_time__lt=end)
+    return segments
+
+
+def iter_rows(columns, start=None, end=None, newest_first=False, where=None, **filters):
+    """
+    Archived rows in time order, one window decoded at a time.
+    ``filters`` (and the Q object ``where``) apply to ArchiveSegment
+    (e.g. hardware_sensor_ref_id=3).
+    """
+    segments = segments_for(start, end, where, **filters).order_by(
+        '-window_start' if newest_first else 'window_start'
+    )
+    for _, window in groupby(segments.iterator(), key=lambda segment: segment.window_start):
+        yield from window_rows(load_readers(window, columns), columns, start, end, newest_first)
+
+
+class ArchivedRows:
+    """
+    Lignes archivées, les plus récentes d'abord (Paginator-compatible).
+    Slicing only decodes the windows it spans.
+    """
+
+    def __init__(self, columns, **filters):
+        self.columns = list(columns)
+        self.filters = filters
+        self._windows = None
+
+    def windows(self):
+        if self._windows is None:
+            self._windows = list(
+                ArchiveSegment.objects.filter(**self.filters)
+                .values('window_start')
+                .annotate(rows=Sum('row_count'))
+                .order_by('-window_start')
+                .values_list('window_start', 'rows')
+            )
+        return self._windows
+
+    def count(self):
+        return sum(rows for _, rows in self.windows())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self.count())
+        rows, offset = [], 0
+        for window_start, size in self.windows():
+            if offset + size > start and offset < stop:
+                segments = ArchiveSegment.objects.filter(window_start=window_start, **self.filters)
+                rows.extend(window_rows(
+                    load_readers(segments, self.columns), self.columns,
+                    newest_first=True, selection=slice(max(start - offset, 0), stop - offset),
+                ))
+            offset += size
+            if offset >= stop:
+                break
+        return rows
+
+
+# ==================== EXPIRY ====================
+
+def prune(cutoff, batch_size=500):
+    """Delete archived segments whose readings are all older than cutoff"""
+    deleted = 0
+    expired = ArchiveSegment.objects.filter(end_time__lt=cutoff)
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            counts = ArchiveSegment.objects.filter(pk__in=ids).delete()[1]
+        deleted += counts.get(ArchiveSegment._meta.label, 0)
+
+
+def stats():
+    """Rows, segments and encoded bytes per column of the archive"""
+    per_column = dict(
+        ArchiveBlock.objects.values('column')
+        .annotate(size=Sum(Length('data')))
+        .values_list('column', 'size')
+    )
+    totals = ArchiveSegment.objects.aggregate(rows=Sum('row_count'), segments=Count('id'))
+    return {
+        'rows': totals['rows'] or 0,
+        'segments': totals['segments'],
+        'bytes': sum(size or 0 for size in per_column.values()),
+        'bytes_per_column': per_column,
+    }
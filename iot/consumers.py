@@ -1,9 +1,19 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
+from django.conf import settings
 from .models import IoTData
 from django.core.serializers.json import DjangoJSONEncoder
 from . import data_utils
+from . import ingest
+from . import tracing
+from .line_protocol import parse_line
+
+logger = logging.getLogger('iot.consumers')
 
 
 class BaseDataConsumer(AsyncWebsocketConsumer):
@@ -36,9 +46,56 @@ class BaseDataConsumer(AsyncWebsocketConsumer):
         """Méthode à surcharger dans les classes filles"""
         return {}
 
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Requêtes du client. Supported:
+        {"action": "series", "sensor_id": ..., "metric": "cpu_usage,ram_usage",
+         "from": ..., "to": ..., "resolution": "raw", "max_points": 500}
+        -> {"type": "series", ...} downsampled with LTTB, or {"type": "error"}
+        """
+        message = {}
+        try:
+            message = json.loads(text_data or '{}')
+            if not isinstance(message, dict):
+                message = {}
+                raise ValueError('Expected a JSON object')
+            if message.get('action') != 'series':
+                raise ValueError(f"Unknown action: {message.get('action')}")
+            data = await sync_to_async(self.get_series)(message)
+            data['type'] = 'series'
+        except (TypeError, ValueError, KeyError) as e:
+            data = {'type': 'error', 'error': str(e)}
+        except Exception:
+            # Keep the dashboard socket open
+            logger.exception('Series request failed: %r', text_data)
+            data = {'type': 'error', 'error': 'Internal error'}
+        if 'request_id' in message:
+            data['request_id'] = message['request_id']
+        await self.send(text_data=json.dumps(data, cls=DjangoJSONEncoder))
+
+    def get_series(self, message):
+        from .views.api_views import parse_time_param
+
+        metrics = message.get('metric') or []
+        if isinstance(metrics, str):
+            metrics = [m for m in metrics.split(',') if m]
+        if not metrics or not message.get('sensor_id'):
+            raise ValueError('sensor_id and metric are required')
+        max_points = int(message.get('max_points') or data_utils.DEFAULT_CHART_POINTS)
+        return data_utils.get_sensor_series(
+            str(message['sensor_id']), metrics,
+            start=parse_time_param(message.get('from')),
+            end=parse_time_param(message.get('to')),
+            resolution=message.get('resolution', 'raw'),
+            max_points=min(max_points, data_utils.MAX_CHART_POINTS),
+        )
+
     async def data_update(self, event):
         """Reçoit les mises à jour depuis le groupe"""
         await self.send(text_data=json.dumps(event['data'], cls=DjangoJSONEncoder))
+        trace = tracing.IngestTrace.from_event(event.get('trace'))
+        if trace:
+            trace.mark('frame_written')
 
 
 class DashboardConsumer(BaseDataConsumer):
@@ -74,3 +131,197 @@ class ScoresConsumer(BaseDataConsumer):
 
     def get_data(self):
         return data_utils.get_scores_data_dict()
+
+
+class FleetConsumer(BaseDataConsumer):
+    group_name = 'fleet_updates'
+
+    def get_data(self):
+        return data_utils.get_fleet_data_dict()
+
+
+class AlertsConsumer(BaseDataConsumer):
+    """Dernières alertes à la connexion, puis chaque nouvelle alerte"""
+    group_name = 'alerts_updates'
+
+    def get_data(self):
+        data = data_utils.get_alerts_data_dict()
+        data['rule_alerts'] = data_utils.get_rule_alerts_data_dict()['alerts']
+        return data
+
+
+class _IngestMessage:
+    """Readings of one client message, until they are acknowledged"""
+    __slots__ = ('seq', 'id', 'payloads', 'rejected', 'stored', 'credits', 'error')
+
+    def __init__(self, seq, client_id=None):
+        self.seq = seq
+        self.id = client_id
+        self.payloads = []  # (index, payload)
+        self.rejected = []  # (index, reason)
+        self.stored = 0
+        self.credits = 0
+        self.error = None
+
+
+class IngestConsumer(AsyncWebsocketConsumer):
+    """
+    Ingestion par WebSocket : ws/ingest/?ack=message|cumulative
+
+    A gateway keeps one connection open and streams readings. A text
+    frame is either one JSON document, {"id": ..., "readings": [...]},
+    {"reading": {...}} or a bare payload as POST /api/iot-data/ takes
+    it, or lines of the ingest_server line protocol. Messages are
+    numbered from 1 in arrival order ("seq") and stored in batches of
+    IOT_INGEST_WS_BATCH_SIZE readings (or after IOT_INGEST_WS_FLUSH_SECONDS)
+    by the same pipeline as HTTP: one INSERT and one broadcast per batch.
+
+    Flow control: the connection starts with IOT_INGEST_WS_CREDITS
+    credits, one per reading sent; a message with more readings than the
+    credits left is refused. Acks return the credits of the readings they
+    cover. With ack=message each message gets its ack; with
+    ack=cumulative one ack per batch covers every message up to its seq.
+    """
+    ACK_MODES = ('message', 'cumulative')
+
+    async def connect(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.ack_mode = query.get('ack', ['message'])[-1]
+        self.credits = getattr(settings, 'IOT_INGEST_WS_CREDITS', 2000)
+        self.batch_size = getattr(settings, 'IOT_INGEST_WS_BATCH_SIZE', 500)
+        self.flush_seconds = getattr(settings, 'IOT_INGEST_WS_FLUSH_SECONDS', 0.05)
+        self.seq = 0
+        self.pending = []
+        self.pending_readings = 0
+        self.lock = asyncio.Lock()
+        self.timer = None
+        await self.accept()
+        if self.ack_mode not in self.ACK_MODES:
+            await self.send_json({'type': 'error', 'error': f'Unknown ack mode: {self.ack_mode}'})
+            await self.close(code=4000)
+            return
+        await self.send_json({
+            'type': 'ready', 'ack': self.ack_mode,
+            'credits': self.credits, 'batch_size': self.batch_size,
+        })
+
+    async def disconnect(self, close_code):
+        if self.timer:
+            self.timer.cancel()
+        # Readings received before the close are stored, without ack
+        await self.flush(reply=False)
+
+    async def send_json(self, data):
+        await self.send(text_data=json.dumps(data, cls=DjangoJSONEncoder))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        self.seq += 1
+        try:
+            message = self.parse(self.seq, text_data if text_data is not None else bytes_data.decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            message = _IngestMessage(self.seq)
+            message.error = str(e)
+        count = len(message.payloads) + len(message.rejected)
+        if count > self.credits:
+            message.error = f'Not enough credits: {count} readings, {self.credits} credits left'
+            message.payloads, message.rejected = [], []
+        else:
+            message.credits = count
+            self.credits -= count
+
+        self.pending.append(message)
+        self.pending_readings += len(message.payloads)
+        if self.pending_readings >= self.batch_size:
+            await self.flush()
+        elif self.timer is None or self.timer.done():
+            self.timer = asyncio.ensure_future(self.flush_later())
+
+    def parse(self, seq, text):
+        """_IngestMessage of a text frame, ValueError if it is not a message"""
+        if text.lstrip().startswith('{'):
+            try:
+                document = json.loads(text)
+            except ValueError:
+                # Several JSON lines: line protocol
+                document = None
+            if document is not None:
+                if 'readings' in document:
+                    readings = document['readings']
+                    if not isinstance(readings, list):
+                        raise ValueError('"readings" must be a list')
+                elif 'reading' in document:
+                    readings = [document['reading']]
+                else:
+                    readings = [document]
+                message = _IngestMessage(seq, document.get('id'))
+                for index, payload in enumerate(readings):
+                    if isinstance(payload, dict):
+                        message.payloads.append((index, payload))
+                    else:
+                        message.rejected.append((index, 'reading is not an object'))
+                return message
+
+        message = _IngestMessage(seq)
+        for index, line in enumerate(text.splitlines()):
+            try:
+                payload = parse_line(line)
+            except ValueError as e:
+                message.rejected.append((index, str(e)))
+                continue
+            if payload is not None:
+                message.payloads.append((index, payload))
+        return message
+
+    async def flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        await self.flush()
+
+    async def flush(self, reply=True):
+        """Store the pending messages in one batch and acknowledge them"""
+        async with self.lock:
+            pending, self.pending, self.pending_readings = self.pending, [], 0
+            if not pending:
+                return
+            payloads = [payload for message in pending for _, payload in message.payloads]
+            failures = {}
+            if payloads:
+                _, failures = await database_sync_to_async(ingest.store_payloads)(payloads)
+            offset = 0
+            for message in pending:
+                for index, _ in message.payloads:
+                    if offset in failures:
+                        message.rejected.append((index, str(failures[offset])))
+                    else:
+                        message.stored += 1
+                    offset += 1
+                message.rejected.sort()
+                self.credits += message.credits
+            if reply:
+                await self.send_acks(pending)
+
+    async def send_acks(self, messages):
+        if self.ack_mode == 'message':
+            for message in messages:
+                ack = {
+                    'type': 'ack', 'seq': message.seq,
+                    'stored': message.stored,
+                    'rejected': [{'index': index, 'error': error} for index, error in message.rejected],
+                    'credits': message.credits,
+                }
+                if message.id is not None:
+                    ack['id'] = message.id
+                if message.error:
+                    ack['error'] = message.error
+                await self.send_json(ack)
+            return
+        rejected = []
+        for message in messages:
+            if message.error:
+                rejected.append({'seq': message.seq, 'error': message.error})
+            rejected += [{'seq': message.seq, 'index': index, 'error': error} for index, error in message.rejected]
+        await self.send_json({
+            'type': 'ack', 'seq': messages[-1].seq,
+            'stored': sum(message.stored for message in messages),
+            'rejected': rejected,
+            'credits': sum(message.credits for message in messages),
+        })
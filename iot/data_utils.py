@@ -3,35 +3,96 @@ Utilitaires pour préparer les données pour les WebSockets et les vues API
 Single source of truth for all data preparation
 """
 import json
-from .models import IoTData
+from itertools import islice
+from django.db.models import Count, Sum
+from .models import (
+    AnomalyAlert, IoTRollup, RuleAlert, SensorIdentifier, SensorState, METRIC_FAMILIES, SENSOR_FIELDS, SENSOR_REF_FIELDS
+)
+from .projections import Projection, serialize_rows
+from . import anomalies, archive, downsampling, partitions, recommendations, rules, sketches
+
+
+# Upper bound on points returned by a single series request
+MAX_SERIES_POINTS = 10000
+# Upper bound on max_points of a downsampled (chart) series
+MAX_CHART_POINTS = 5000
+DEFAULT_CHART_POINTS = 500
+
+
+# ==================== PROJECTIONS ====================
+# Fields each page reads; only these columns are fetched from the DB.
+
+DASHBOARD_FIELDS = Projection([
+    'id', 'hardware_sensor_id', 'cpu_usage', 'ram_usage', 'power_watts',
+    'eco_score', 'co2_equiv_g', 'created_at',
+])
+HARDWARE_FIELDS = Projection([
+    'id', 'hardware_sensor_id', 'cpu_usage', 'ram_usage', 'battery_health',
+    'age_years', 'created_at',
+])
+ENERGY_FIELDS = Projection([
+    'id', 'energy_sensor_id', 'power_watts', 'co2_equiv_g', 'overheating',
+    'active_devices', 'created_at',
+])
+NETWORK_FIELDS = Projection([
+    'id', 'network_sensor_id', 'network_load_mbps', 'requests_per_min',
+    'cloud_dependency_score', 'created_at',
+])
+SCORES_TABLE_FIELDS = [
+    'id', 'hardware_sensor_id', 'eco_score', 'obsolescence_score',
+    'bigtech_dependency', 'co2_savings_kg_year', 'recommendations', 'created_at',
+]
+# Feature columns too: readings stored without recommendations get generated ones
+SCORES_FIELDS = Projection(SCORES_TABLE_FIELDS + list(recommendations.FEATURE_FIELDS))
+HISTORY_FIELDS = Projection([
+    'id', 'hardware_sensor_id', 'cpu_usage', 'ram_usage', 'power_watts',
+    'eco_score', 'co2_equiv_g', 'battery_health', 'age_years', 'overheating',
+    'active_devices', 'network_load_mbps', 'requests_per_min',
+    'cloud_dependency_score', 'obsolescence_score', 'bigtech_dependency',
+    'co2_savings_kg_year', 'created_at',
+])
 
 
 # ==================== HELPER FUNCTIONS ====================
 
 def get_latest_iot_data(limit=8):
     """Récupère les dernières données IoT"""
-    return IoTData.objects.order_by('-created_at')[:limit]
+    readings = []
+    for model in partitions.models_for_range(newest_first=True):
+        readings.extend(model.objects.order_by('-created_at')[:limit - len(readings)])
+        if len(readings) >= limit:
+            break
+    return readings
 
 
-def calculate_averages(all_data, fields):
-    """Calcule les moyennes pour une liste de champs"""
-    if not all_data.exists():
-        return {field: 0 for field in fields}
-    
-    count = all_data.count()
-    averages = {}
-    for field in fields:
-        total = sum(getattr(data, field) for data in all_data)
-        averages[field] = round(total / count, 1)
-    return averages
+def calculate_averages(querysets, fields):
+    """
+    Calcule les moyennes pour une liste de champs (agrégées en SQL).
+    One aggregate per partition, combined as sum / count.
+    """
+    totals = dict.fromkeys(fields, 0)
+    counts = dict.fromkeys(fields, 0)
+    for queryset in querysets:
+        partial = queryset.aggregate(
+            **{f'sum_{field}': Sum(field) for field in fields},
+            **{f'count_{field}': Count(field) for field in fields},
+        )
+        for field in fields:
+            totals[field] += partial[f'sum_{field}'] or 0
+            counts[field] += partial[f'count_{field}']
+    return {
+        field: round(totals[field] / counts[field], 1) if counts[field] else 0
+        for field in fields
+    }
 
 
-def prepare_chart_data(latest_data, field_mappings):
+def prepare_chart_data(latest_rows, field_mappings):
     """Prépare les données pour les graphiques"""
-    labels = [str(data.created_at.strftime('%H:%M:%S')) for data in reversed(latest_data)]
+    rows = list(reversed(latest_rows))
+    labels = [row['created_at'].strftime('%H:%M:%S') for row in rows]
     chart_data = {}
     for key, field in field_mappings.items():
-        chart_data[key] = [getattr(data, field) for data in reversed(latest_data)]
+        chart_data[key] = [row[field] for row in rows]
     return labels, chart_data
 
 
@@ -41,42 +102,37 @@ def prepare_chart_data(latest_data, field_mappings):
 
 def get_dashboard_data_dict():
     """Prépare les données pour le dashboard"""
-    latest_data = get_latest_iot_data()
+    latest_rows = DASHBOARD_FIELDS.latest()
     
-    labels = [str(data.created_at.strftime('%H:%M:%S')) for data in reversed(latest_data)]
-    cpu_data = [data.cpu_usage for data in reversed(latest_data)]
-    ram_data = [data.ram_usage for data in reversed(latest_data)]
-    power_data = [data.power_watts for data in reversed(latest_data)]
-    eco_data = [data.eco_score for data in reversed(latest_data)]
-    co2_data = [data.co2_equiv_g for data in reversed(latest_data)]
+    field_mappings = {
+        'cpu_data': 'cpu_usage',
+        'ram_data': 'ram_usage',
+        'power_data': 'power_watts',
+        'eco_data': 'eco_score',
+        'co2_data': 'co2_equiv_g',
+    }
+    labels, chart_data = prepare_chart_data(latest_rows, field_mappings)
     
-    table_data = [
-        {
-            'id': data.id,
-            'hardware_sensor_id': data.hardware_sensor_id,
-            'cpu_usage': data.cpu_usage,
-            'ram_usage': data.ram_usage,
-            'power_watts': data.power_watts,
-            'eco_score': data.eco_score,
-            'created_at': data.created_at.isoformat(),  # Format ISO pour JavaScript
-        } for data in latest_data
-    ]
+    table_data = serialize_rows(latest_rows, [
+        'id', 'hardware_sensor_id', 'cpu_usage', 'ram_usage', 'power_watts',
+        'eco_score', 'created_at',
+    ])
     
     return {
         'chart_labels': json.dumps(labels),
-        'cpu_data': json.dumps(cpu_data),
-        'ram_data': json.dumps(ram_data),
-        'power_data': json.dumps(power_data),
-        'eco_data': json.dumps(eco_data),
-        'co2_data': json.dumps(co2_data),
+        'cpu_data': json.dumps(chart_data['cpu_data']),
+        'ram_data': json.dumps(chart_data['ram_data']),
+        'power_data': json.dumps(chart_data['power_data']),
+        'eco_data': json.dumps(chart_data['eco_data']),
+        'co2_data': json.dumps(chart_data['co2_data']),
         'latest_data': table_data,
     }
 
 
 def get_hardware_data_dict():
     """Prépare les données pour l'interface hardware"""
-    latest_data = get_latest_iot_data()
-    all_data = IoTData.objects.all()
+    latest_rows = HARDWARE_FIELDS.latest()
+    all_data = partitions.querysets()
     
     avg_fields = ['cpu_usage', 'ram_usage', 'battery_health', 'age_years']
     averages = calculate_averages(all_data, avg_fields)
@@ -87,19 +143,9 @@ def get_hardware_data_dict():
         'battery_data': 'battery_health',
         'age_data': 'age_years'
     }
-    labels, chart_data = prepare_chart_data(latest_data, field_mappings)
+    labels, chart_data = prepare_chart_data(latest_rows, field_mappings)
     
-    table_data = [
-        {
-            'id': data.id,
-            'hardware_sensor_id': data.hardware_sensor_id,
-            'cpu_usage': data.cpu_usage,
-            'ram_usage': data.ram_usage,
-            'battery_health': data.battery_health,
-            'age_years': data.age_years,
-            'created_at': data.created_at.isoformat(),
-        } for data in latest_data
-    ]
+    table_data = serialize_rows(latest_rows)
     
     return {
         'chart_labels': json.dumps(labels),
@@ -112,13 +158,14 @@ def get_hardware_data_dict():
         'avg_ram': averages['ram_usage'],
         'avg_battery': averages['battery_health'],
         'avg_age': averages['age_years'],
+        **sketches.page_percentiles('cpu_usage', 'cpu'),
     }
 
 
 def get_energy_data_dict():
     """Prépare les données pour l'interface energy"""
-    latest_data = get_latest_iot_data()
-    all_data = IoTData.objects.all()
+    latest_rows = ENERGY_FIELDS.latest()
+    all_data = partitions.querysets()
     
     avg_fields = ['power_watts', 'co2_equiv_g', 'overheating', 'active_devices']
     averages = calculate_averages(all_data, avg_fields)
@@ -129,19 +176,9 @@ def get_energy_data_dict():
         'overheating_data': 'overheating',
         'active_devices_data': 'active_devices'
     }
-    labels, chart_data = prepare_chart_data(latest_data, field_mappings)
+    labels, chart_data = prepare_chart_data(latest_rows, field_mappings)
     
-    table_data = [
-        {
-            'id': data.id,
-            'energy_sensor_id': data.energy_sensor_id,
-            'power_watts': data.power_watts,
-            'co2_equiv_g': data.co2_equiv_g,
-            'overheating': data.overheating,
-            'active_devices': data.active_devices,
-            'created_at': data.created_at.isoformat(),
-        } for data in latest_data
-    ]
+    table_data = serialize_rows(latest_rows)
     
     return {
         'chart_labels': json.dumps(labels),
@@ -154,13 +191,14 @@ def get_energy_data_dict():
         'avg_co2': averages['co2_equiv_g'],
         'avg_overheating': averages['overheating'],
         'avg_active': int(averages['active_devices']),
+        **sketches.page_percentiles('power_watts', 'power'),
     }
 
 
 def get_network_data_dict():
     """Prépare les données pour l'interface network"""
-    latest_data = get_latest_iot_data()
-    all_data = IoTData.objects.all()
+    latest_rows = NETWORK_FIELDS.latest()
+    all_data = partitions.querysets()
     
     avg_fields = ['network_load_mbps', 'requests_per_min', 'cloud_dependency_score']
     averages = calculate_averages(all_data, avg_fields)
@@ -170,18 +208,9 @@ def get_network_data_dict():
         'requests_data': 'requests_per_min',
         'cloud_dependency_data': 'cloud_dependency_score'
     }
-    labels, chart_data = prepare_chart_data(latest_data, field_mappings)
+    labels, chart_data = prepare_chart_data(latest_rows, field_mappings)
     
-    table_data = [
-        {
-            'id': data.id,
-            'network_sensor_id': data.network_sensor_id,
-            'network_load_mbps': data.network_load_mbps,
-            'requests_per_min': data.requests_per_min,
-            'cloud_dependency_score': data.cloud_dependency_score,
-            'created_at': data.created_at.isoformat(),
-        } for data in latest_data
-    ]
+    table_data = serialize_rows(latest_rows)
     
     return {
         'chart_labels': json.dumps(labels),
@@ -192,13 +221,14 @@ def get_network_data_dict():
         'avg_network_load': averages['network_load_mbps'],
         'avg_requests': int(averages['requests_per_min']),
         'avg_cloud': averages['cloud_dependency_score'],
+        **sketches.page_percentiles('network_load_mbps', 'network_load'),
     }
 
 
 def get_scores_data_dict():
     """Prépare les données pour l'interface scores"""
-    latest_data = get_latest_iot_data()
-    all_data = IoTData.objects.all()
+    latest_rows = SCORES_FIELDS.latest()
+    all_data = partitions.querysets()
     
     avg_fields = ['eco_score', 'obsolescence_score', 'bigtech_dependency', 'co2_savings_kg_year']
     averages = calculate_averages(all_data, avg_fields)
@@ -209,20 +239,10 @@ def get_scores_data_dict():
         'bigtech_data': 'bigtech_dependency',
         'co2_savings_data': 'co2_savings_kg_year'
     }
-    labels, chart_data = prepare_chart_data(latest_data, field_mappings)
-    
-    table_data = [
-        {
-            'id': data.id,
-            'hardware_sensor_id': data.hardware_sensor_id,
-            'eco_score': data.eco_score,
-            'obsolescence_score': data.obsolescence_score,
-            'bigtech_dependency': data.bigtech_dependency,
-            'co2_savings_kg_year': data.co2_savings_kg_year,
-            'recommendations': data.recommendations,
-            'created_at': data.created_at.isoformat(),
-        } for data in latest_data
-    ]
+    labels, chart_data = prepare_chart_data(latest_rows, field_mappings)
+
+    recommendations.apply_recommendations(latest_rows)
+    table_data = serialize_rows(latest_rows, SCORES_TABLE_FIELDS)
     
     return {
         'chart_labels': json.dumps(labels),
@@ -238,6 +258,67 @@ def get_scores_data_dict():
     }
 
 
+def get_fleet_data_dict():
+    """
+    Prépare l'état courant de tous les capteurs.
+    Reads one SensorState row per sensor, never scans IoTData.
+    """
+    from django.utils import timezone
+
+    now = timezone.now()
+    sensors = []
+    counts = {'online': 0, 'stale': 0, 'offline': 0}
+    for state in SensorState.objects.all():
+        status = state.status(now)
+        counts[status] += 1
+        sensors.append({
+            'sensor_id': state.sensor_id,
+            'status': status,
+            'metrics': state.metrics,
+            'last_reading_id': state.last_reading_id,
+            'first_seen': state.first_seen.isoformat(),
+            'last_seen': state.last_seen.isoformat(),
+            'seconds_since_seen': int((now - state.last_seen).total_seconds()),
+            'reading_count': state.reading_count,
+            'overheating_count': state.overheating_count,
+        })
+
+    return {
+        'sensors': sensors,
+        'total': len(sensors),
+        'status_counts': counts,
+        'generated_at': now.isoformat(),
+    }
+
+
+def get_alerts_data_dict(limit=50, sensor_id=None, metric=None, kind=None):
+    """Prépare les dernières alertes d'anomalie (plus récentes d'abord)"""
+    alerts = AnomalyAlert.objects.all()
+    if sensor_id:
+        alerts = alerts.filter(sensor_ref_id=SensorIdentifier.lookup(sensor_id) or -1)
+    if metric:
+        alerts = alerts.filter(metric=metric)
+    if kind:
+        alerts = alerts.filter(kind=kind)
+    return {
+        'type': 'alerts',
+        'alerts': [anomalies.serialize_alert(alert) for alert in alerts[:limit]],
+    }
+
+
+def get_rule_alerts_data_dict(limit=50, rule_id=None, sensor_id=None):
+    """Prépare les derniers déclenchements de règles (plus récents d'abord)"""
+    alerts = RuleAlert.objects.select_related('rule')
+    if rule_id is not None:
+        alerts = alerts.filter(rule_id=rule_id)
+    if sensor_id:
+        alerts = alerts.filter(sensor_ref_id=SensorIdentifier.lookup(sensor_id) or -1)
+    return {
+        'type': 'rule_alerts',
+        'alerts': [rules.serialize_rule_alert(alert) for alert in alerts[:limit]],
+    }
+
+
 def serialize_iot_data(data):
     """
     Serializes a single IoTData instance into a dictionary.
@@ -283,10 +364,15 @@ def get_paginated_iot_data(page_number=1, limit=8):
     """
     from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
-    # Fetch all data, ordered by newest first
-    queryset = IoTData.objects.all().order_by('-created_at')
+    # Fetch only the table columns, ordered by newest first across partitions,
+    # then the archived readings
+    rows = partitions.PartitionedRows([
+        *(HISTORY_FIELDS.values_list(queryset.order_by('-created_at'))
+          for queryset in partitions.querysets(newest_first=True)),
+        archive.ArchivedRows(HISTORY_FIELDS.columns),
+    ])
     
-    paginator = Paginator(queryset, limit)
+    paginator = Paginator(rows, limit)
     
     try:
         page_obj = paginator.page(page_number)
@@ -306,34 +392,8 @@ def get_paginated_iot_data(page_number=1, limit=8):
             }
         }
 
-    # Serialize the data
-    serialized_data = []
-    for data in page_obj:
-        # We use a simplified serialization for tables to keep it lighter if needed,
-        # but for consistency we can use the full serializer or a specific one.
-        # Let's use the individual getters from existing functions logic to ensure consistency with WebSocket
-        # or just reuse the manual dict creation which is faster than model_to_dict
-        serialized_data.append({
-            'id': data.id,
-            'hardware_sensor_id': data.hardware_sensor_id,
-            'cpu_usage': data.cpu_usage,
-            'ram_usage': data.ram_usage,
-            'power_watts': data.power_watts,
-            'eco_score': data.eco_score,
-            'co2_equiv_g': data.co2_equiv_g,
-            # Add other specific fields needed for other tables (union of all needed fields)
-            'battery_health': data.battery_health,
-            'age_years': data.age_years,
-            'overheating': data.overheating,
-            'active_devices': data.active_devices,
-            'network_load_mbps': data.network_load_mbps,
-            'requests_per_min': data.requests_per_min,
-            'cloud_dependency_score': data.cloud_dependency_score,
-            'obsolescence_score': data.obsolescence_score,
-            'bigtech_dependency': data.bigtech_dependency,
-            'co2_savings_kg_year': data.co2_savings_kg_year,
-            'created_at': data.created_at.isoformat(),
-        })
+    # Serialize the data (union of the fields needed by every table)
+    serialized_data = serialize_rows(HISTORY_FIELDS.decode(row) for row in page_obj)
 
     return {
         'data': serialized_data,
@@ -349,3 +409,79 @@ def get_paginated_iot_data(page_number=1, limit=8):
     }
 
 
+def get_sensor_series(sensor_id, metrics, start=None, end=None, limit=MAX_SERIES_POINTS,
+                      resolution='raw', max_points=None):
+    """
+    Time series of one sensor for the requested metrics.
+    Only the timestamp and metric columns are fetched; the filter and the
+    sort are both served by the (<family>_sensor_ref, created_at) index
+    of each time partition overlapping [start, end), after the archived
+    readings of the range.
+    With resolution 'minute' or 'hour' the points come from the retention
+    rollups (averages) instead of the raw readings.
+    With max_points, up to IOT_DOWNSAMPLE_MAX_INPUT points are read and
+    reduced to max_points with LTTB (shape-preserving) instead of limit.
+    Raises ValueError for unknown metrics or metrics of different families,
+    and for a limit below 1.
+    """
+    if resolution not in ('raw', 'minute', 'hour'):
+        raise ValueError(f'Unknown resolution: {resolution}')
+    if limit < 1:
+        raise ValueError('limit must be >= 1')
+    unknown = [metric for metric in metrics if metric not in METRIC_FAMILIES]
+    if unknown:
+        raise ValueError(f"Unknown metric(s): {', '.join(unknown)}")
+    families = {METRIC_FAMILIES[metric] for metric in metrics}
+    if len(families) != 1:
+        raise ValueError('All metrics must belong to the same sensor family')
+    family = families.pop()
+    sensor_field = SENSOR_FIELDS[family]
+    if max_points is not None:
+        if max_points < downsampling.MIN_POINTS:
+            raise ValueError(f'max_points must be >= {downsampling.MIN_POINTS}')
+        limit = downsampling.get_max_input()
+
+    # Unknown sensor ids match nothing (-1 is never a primary key)
+    sensor_pk = SensorIdentifier.lookup(sensor_id)
+    sensor_filter = {f'{SENSOR_REF_FIELDS[family]}_id': sensor_pk or -1}
+    if resolution == 'raw':
+        archived = archive.iter_rows(['created_at', *metrics], start, end, **sensor_filter)
+        rows = list(islice(archived, limit + 1))
+        sources = partitions.querysets(start, end)
+        time_field = 'created_at'
+    else:
+        queryset = IoTRollup.objects.filter(resolution=resolution)
+        if start is not None:
+            queryset = queryset.filter(bucket_start__gte=start)
+        if end is not None:
+            queryset = queryset.filter(bucket_start__lt=end)
+        sources = [queryset]
+        time_field = 'bucket_start'
+        rows = []
+    # Partitions come oldest first, so their rows concatenate in time order
+    for queryset in sources:
+        if len(rows) > limit:
+            break
+        queryset = queryset.filter(**sensor_filter).order_by(time_field)
+        rows.extend(queryset.values_list(time_field, *metrics)[:limit + 1 - len(rows)])
+        if len(rows) > limit:
+            break
+
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+    source_count = len(rows)
+    rows = downsampling.downsample_rows(rows, max_points)
+    return {
+        'sensor_id': sensor_id,
+        'sensor_field': sensor_field,
+        'resolution': resolution,
+        'metrics': list(metrics),
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'count': len(rows),
+        'source_count': source_count,
+        'downsampled': len(rows) < source_count,
+        'truncated': truncated,
+        'timestamps': [row[0].isoformat() for row in rows],
+        'series': {metric: [row[i + 1] for row in rows] for i, metric in enumerate(metrics)},
+    }
@@ -0,0 +1,183 @@
+"""
+Instrumentation optionnelle des requêtes SQL.
+
+When ``IOT_QUERY_PROFILING`` is enabled, every new DB connection gets an
+execute wrapper that times each query. Queries slower than
+``IOT_SLOW_QUERY_MS`` are logged with their caller, duration and SQLite
+``EXPLAIN QUERY PLAN``; all queries feed a rolling table of fingerprints
+(SQL with literals stripped) ranked by total time.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from django.conf import settings
+
+
+logger = logging.getLogger('iot.db')
+
+# Fingerprints kept in memory before the cheapest ones are evicted
+MAX_FINGERPRINTS = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fingerprint(sql):
+    """Normalise une requête SQL pour regrouper ses exécutions"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def find_caller():
+    """First stack frame from the iot app outside of this module"""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_PACKAGE_DIR) and filename != os.path.abspath(__file__):
+            return f'{os.path.relpath(filename, os.path.dirname(_PACKAGE_DIR))}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+def explain_query_plan(connection, sql, params):
+    """EXPLAIN QUERY PLAN via a raw cursor, bypassing the execute wrappers"""
+    if connection.vendor != 'sqlite':
+        return []
+    if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+        return []
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'explain failed: {e}']
+    finally:
+        cursor.close()
+
+
+class QueryStats:
+    """Statistiques cumulées par empreinte de requête"""
+
+    def __init__(self, max_fingerprints=MAX_FINGERPRINTS, recent_slow=100):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self.fingerprints = {}
+        self.slow_queries = deque(maxlen=recent_slow)
+
+    def record(self, sql, duration_ms):
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self.fingerprints.get(key)
+            if entry is None:
+                if len(self.fingerprints) >= self.max_fingerprints:
+                    cheapest = min(self.fingerprints, key=lambda k: self.fingerprints[k]['total_ms'])
+                    del self.fingerprints[cheapest]
+                entry = self.fingerprints[key] = {
+                    'fingerprint': key,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+
+    def record_slow(self, entry):
+        with self._lock:
+            self.slow_queries.append(entry)
+
+    def top(self, n=20):
+        with self._lock:
+            entries = sorted(self.fingerprints.values(), key=lambda e: e['total_ms'], reverse=True)[:n]
+            entries = [dict(e) for e in entries]
+        for entry in entries:
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 3)
+        return entries
+
+    def recent_slow(self):
+        with self._lock:
+            return list(self.slow_queries)
+
+    def reset(self):
+        with self._lock:
+            self.fingerprints.clear()
+            self.slow_queries.clear()
+
+
+stats = QueryStats()
+
+
+class QueryProfiler:
+    """Execute wrapper Django : chronomètre chaque requête"""
+
+    def __init__(self, threshold_ms=None, log=True):
+        self.threshold_ms = threshold_ms
+        self.log = log
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            stats.record(sql, duration_ms)
+            threshold_ms = self.threshold_ms
+            if threshold_ms is None:
+                threshold_ms = getattr(settings, 'IOT_SLOW_QUERY_MS', 50)
+            if duration_ms >= threshold_ms:
+                self.log_slow_query(sql, params, many, context, duration_ms)
+
+    def log_slow_query(self, sql, params, many, context, duration_ms):
+        caller = find_caller()
+        plan = [] if many else explain_query_plan(context['connection'], sql, params)
+        stats.record_slow({
+            'sql': sql,
+            'duration_ms': round(duration_ms, 3),
+            'caller': caller,
+            'plan': plan,
+            'at': time.time(),
+        })
+        if not self.log:
+            return
+        logger.warning(
+            'Slow query (%.1f ms) from %s: %s | plan: %s',
+            duration_ms, caller, sql, '; '.join(plan) or 'n/a'
+        )
+
+
+def install(connection, threshold_ms=None):
+    """Attach the profiler to a connection (idempotent)"""
+    if not any(isinstance(w, QueryProfiler) for w in connection.execute_wrappers):
+        connection.execute_wrappers.append(QueryProfiler(threshold_ms))
+
+
+def uninstall(connection):
+    connection.execute_wrappers[:] = [
+        w for w in connection.execute_wrappers if not isinstance(w, QueryProfiler)
+    ]
+
+
+def on_connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+def get_query_report(n=None):
+    """Top-N fingerprints by total time plus the most recent slow queries"""
+    n = n or getattr(settings, 'IOT_QUERY_TOP_N', 20)
+    return {
+        'enabled': getattr(settings, 'IOT_QUERY_PROFILING', False),
+        'threshold_ms': getattr(settings, 'IOT_SLOW_QUERY_MS', 50),
+        'top': stats.top(n),
+        'slow_queries': stats.recent_slow(),
+    }
@@ -0,0 +1,83 @@
+"""
+Sous-échantillonnage LTTB (Largest-Triangle-Three-Buckets) des séries.
+
+Keeps the first and last points and, from each of ``max_points - 2``
+equal buckets in between, the point forming the largest triangle with
+the point kept in the previous bucket and the average of the next one.
+Peaks and troughs survive, so a month of readings drawn from ~500 points
+keeps the shape of the full series.
+
+Bucket averages are computed for every bucket at once (cumulative sums);
+only the choice inside each bucket, which depends on the previous
+choice, is a loop over buckets. Several metrics sharing the timestamps
+are downsampled together: triangle areas are normalized by each metric's
+range and summed, so one index set serves every metric.
+"""
+import numpy as np
+from django.conf import settings
+
+
+MIN_POINTS = 3
+
+
+def get_max_input():
+    """Upper bound on the points loaded before downsampling a series"""
+    return getattr(settings, 'IOT_DOWNSAMPLE_MAX_INPUT', 500000)
+
+
+def lttb_indices(x, ys, max_points):
+    """
+    Indices of the points to keep (sorted, at most max_points).
+    x: increasing 1-d array; ys: one 1-d array or a 2-d array (metric, point).
+    NaN values (missing readings) are never preferred.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < MIN_POINTS:
+        raise ValueError(f'max_points must be >= {MIN_POINTS}')
+
+    ys = np.atleast_2d(np.asarray(ys, dtype=np.float64))
+    spans = np.nanmax(ys, axis=1) - np.nanmin(ys, axis=1)
+    spans[~(spans > 0)] = 1.0
+    ys = ys / spans[:, None]
+    x = x - x[0]
+    filled = np.nan_to_num(ys)
+
+    # Bucket b covers [edges[b], edges[b + 1]), first and last points excluded
+    edges = (np.arange(max_points - 1) * ((n - 2) / (max_points - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate((np.zeros((len(ys), 1)), np.cumsum(filled, axis=1)), axis=1)
+    # Average point of the bucket following each bucket (the last point for the last one)
+    next_lo = np.append(edges[1:-1], n - 1)
+    next_hi = np.append(edges[2:], n)
+    sizes = next_hi - next_lo
+    x_avg = (x_sums[next_hi] - x_sums[next_lo]) / sizes
+    y_avg = (y_sums[:, next_hi] - y_sums[:, next_lo]) / sizes
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for b in range(max_points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        dx = x[a] - x_avg[b]
+        dy = y_avg[:, b][:, None] - filled[:, a][:, None]
+        areas = np.abs(dx * (ys[:, lo:hi] - filled[:, a][:, None]) - (x[a] - x[lo:hi]) * dy)
+        areas = np.nan_to_num(areas, nan=-1.0).sum(axis=0)
+        a = lo + int(np.argmax(areas))
+        selected[b + 1] = a
+    return selected
+
+
+def downsample_rows(rows, max_points):
+    """
+    LTTB over (timestamp, value, ...) tuples sorted by timestamp.
+    Every value column is taken into account; None counts as missing.
+    """
+    if max_points is None or len(rows) <= max_points:
+        return rows
+    x = np.array([row[0].timestamp() for row in rows])
+    ys = np.array([row[1:] for row in rows], dtype=np.float64).T
+    return [rows[i] for i in lttb_indices(x, ys, max_points)]
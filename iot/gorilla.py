@@ -0,0 +1,202 @@
+"""
+Encodage de séries temporelles façon Gorilla (Facebook, VLDB 2015).
+
+* ``dod``: delta-of-delta, for regularly spaced integers (timestamps, ids).
+  A steady cadence costs 1 bit per value.
+* ``delta``: plain deltas, for slowly varying integer metrics.
+* ``xor``: XOR with the previous float, storing only the meaningful bits.
+  Repeated values cost 1 bit, close values a few bits.
+
+Integers are zigzag-encoded into buckets selected by a unary prefix:
+``0`` (value 0), ``10`` + 7 bits, ``110`` + 14 bits, ``1110`` + 20 bits,
+``11110`` + 32 bits, ``11111`` + 64 bits. Pure Python, no dependency.
+"""
+import struct
+
+
+# (prefix, prefix length, payload bits), smallest first
+INT_BUCKETS = [
+    (0b10, 2, 7),
+    (0b110, 3, 14),
+    (0b1110, 4, 20),
+    (0b11110, 5, 32),
+    (0b11111, 5, 64),
+]
+
+ENCODINGS = ('dod', 'delta', 'xor')
+
+
+class BitWriter:
+    """Écrit des champs de bits (MSB d'abord) dans un bytearray"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.acc = 0
+        self.acc_bits = 0
+
+    def write(self, value, nbits):
+        self.acc = (self.acc << nbits) | value
+        self.acc_bits += nbits
+        while self.acc_bits >= 8:
+            self.acc_bits -= 8
+            self.buffer.append((self.acc >> self.acc_bits) & 0xFF)
+        self.acc &= (1 << self.acc_bits) - 1
+
+    def getvalue(self):
+        if self.acc_bits:
+            return bytes(self.buffer) + bytes([(self.acc << (8 - self.acc_bits)) & 0xFF])
+        return bytes(self.buffer)
+
+
+class BitReader:
+    """Lit des champs de bits écrits par BitWriter"""
+
+    def __init__(self, data):
+        self.data = bytes(data) + b'\x00' * 9
+        self.pos = 0
+
+    def read(self, nbits):
+        pos = self.pos
+        offset = pos & 7
+        nbytes = (offset + nbits + 7) >> 3
+        chunk = int.from_bytes(self.data[pos >> 3:(pos >> 3) + nbytes], 'big')
+        self.pos = pos + nbits
+        return (chunk >> (nbytes * 8 - offset - nbits)) & ((1 << nbits) - 1)
+
+    def read_bit(self):
+        pos = self.pos
+        self.pos = pos + 1
+        return (self.data[pos >> 3] >> (7 - (pos & 7))) & 1
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63) if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def write_int(writer, value):
+    if value == 0:
+        writer.write(0, 1)
+        return
+    encoded = zigzag(value)
+    for prefix, prefix_bits, payload_bits in INT_BUCKETS:
+        if encoded < (1 << payload_bits):
+            writer.write(prefix, prefix_bits)
+            writer.write(encoded, payload_bits)
+            return
+    raise OverflowError(f'{value} does not fit in 64 bits')
+
+
+def read_int(reader):
+    prefix_bits = 0
+    while prefix_bits < 5 and reader.read_bit():
+        prefix_bits += 1
+    if prefix_bits == 0:
+        return 0
+    payload_bits = INT_BUCKETS[prefix_bits - 1][2]
+    return unzigzag(reader.read(payload_bits))
+
+
+def encode_dod(values):
+    writer = BitWriter()
+    previous, previous_delta = 0, 0
+    for value in values:
+        delta = value - previous
+        write_int(writer, delta - previous_delta)
+        previous, previous_delta = value, delta
+    return writer.getvalue()
+
+
+def decode_dod(data, count):
+    reader = BitReader(data)
+    values = []
+    previous, delta = 0, 0
+    for _ in range(count):
+        delta += read_int(reader)
+        previous += delta
+        values.append(previous)
+    return values
+
+
+def encode_delta(values):
+    writer = BitWriter()
+    previous = 0
+    for value in values:
+        write_int(writer, value - previous)
+        previous = value
+    return writer.getvalue()
+
+
+def decode_delta(data, count):
+    reader = BitReader(data)
+    values = []
+    previous = 0
+    for _ in range(count):
+        previous += read_int(reader)
+        values.append(previous)
+    return values
+
+
+def float_bits(value):
+    return struct.unpack('>Q', struct.pack('>d', value))[0]
+
+
+def bits_float(bits):
+    return struct.unpack('>d', struct.pack('>Q', bits))[0]
+
+
+def encode_xor(values):
+    writer = BitWriter()
+    previous = 0
+    leading, trailing = -1, 0
+    for value in values:
+        bits = float_bits(value)
+        xor = bits ^ previous
+        previous = bits
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        new_leading = min(64 - xor.bit_length(), 31)
+        new_trailing = (xor & -xor).bit_length() - 1
+        if leading >= 0 and new_leading >= leading and new_trailing >= trailing:
+            # Meaningful bits fit in the previous window
+            writer.write(0b10, 2)
+            writer.write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = new_leading, new_trailing
+            meaningful = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            writer.write(meaningful - 1, 6)
+            writer.write(xor >> trailing, meaningful)
+    return writer.getvalue()
+
+
+def decode_xor(data, count):
+    reader = BitReader(data)
+    values = []
+    previous = 0
+    leading, trailing = 0, 0
+    for _ in range(count):
+        if reader.read_bit():
+            if reader.read_bit():
+                leading = reader.read(5)
+                trailing = 64 - leading - (reader.read(6) + 1)
+            previous ^= reader.read(64 - leading - trailing) << trailing
+        values.append(bits_float(previous))
+    return values
+
+
+ENCODERS = {'dod': encode_dod, 'delta': encode_delta, 'xor': encode_xor}
+DECODERS = {'dod': decode_dod, 'delta': decode_delta, 'xor': decode_xor}
+
+
+def encode(encoding, values):
+    return ENCODERS[encoding](values)
+
+
+def decode(encoding, data, count):
+    return DECODERS[encoding](data, count)
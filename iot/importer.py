@@ -0,0 +1,596 @@
+"""
+Import en masse de lectures historiques (CSV / NDJSON).
+
+Records go through the same mapping as POST /api/iot-data/
+(``ingest.build_iot_data_fields``, server-side scores, cached
+recommendations), but a whole batch is converted column by column with
+NumPy and written by one ``executemany`` in one transaction, together
+with the file's ImportCheckpoint: an interrupted import resumes after the
+last committed batch, without duplicates.
+
+Sensor states and quantile sketches are updated after each batch, or
+once at the end with ``defer=True``, which also drops the IoTData
+indexes while loading and rebuilds them afterwards. Anomaly detection,
+alert rules and the WebSocket broadcast only make sense for live
+readings and are not run on imported history.
+
+Input formats:
+- NDJSON: one sensor payload (nested Node-RED or flat) per line, or a
+  captured request whose ``body`` / ``payload`` holds it (object or JSON
+  string);
+- CSV: a header row with the flat payload field names.
+``created_at`` (ISO 8601, UTC if naive) dates a reading; without it the
+hardware timestamp (epoch seconds or milliseconds) is used.
+"""
+import csv
+import gc
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import ingest, partitions, recommendations, scoring, sketches
+from .models import (IoTData, ImportCheckpoint, OperatingSystem, RecommendationSet, SensorIdentifier,
+                     SensorState, METRIC_FAMILIES, SENSOR_REF_FIELDS)
+
+
+FORMATS = ('ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 20000
+
+# Keys of a captured request holding the sensor payload
+CAPTURE_KEYS = ('body', 'payload')
+# Keys of a captured request that date it, when the payload does not
+CAPTURE_TIME_KEYS = ('created_at', 'received_at')
+# Nested payload objects: not columns of a CSV file
+NESTED_KEYS = ('hardware', 'energy', 'network', 'scores')
+
+# Epoch timestamps above this are in milliseconds
+MAX_EPOCH_SECONDS = 1e11
+
+# Field values of an empty payload (the defaults of the mapping)
+DEFAULTS = ingest.build_iot_data_fields({})
+
+# Payload field -> (IoTData column, interned lookup model)
+INTERNED = {
+    'hardware_sensor_id': ('hardware_sensor_ref_id', SensorIdentifier),
+    'energy_sensor_id': ('energy_sensor_ref_id', SensorIdentifier),
+    'network_sensor_id': ('network_sensor_ref_id', SensorIdentifier),
+    'os': ('os_ref_id', OperatingSystem),
+}
+
+# Columns written, in table order
+INSERT_COLUMNS = [field.column for field in IoTData._meta.local_fields if not field.primary_key]
+NUMBER_FIELDS = {
+    field.name: field.get_internal_type() for field in IoTData._meta.local_fields
+    if field.get_internal_type() in ('IntegerField', 'BigIntegerField', 'FloatField')
+}
+BOOLEAN_FIELDS = [field.name for field in IoTData._meta.local_fields if field.get_internal_type() == 'BooleanField']
+# Accepted boolean spellings (BooleanField.to_python, case-insensitive)
+BOOLEANS = {'t': 1, 'true': 1, '1': 1, 'f': 0, 'false': 0, '0': 0}
+
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def unwrap(record):
+    """Sensor payload of an NDJSON record (see module docstring)"""
+    for key in CAPTURE_KEYS:
+        body = record.get(key)
+        if isinstance(body, (str, bytes)):
+            body = json.loads(body)
+        if isinstance(body, dict):
+            for time_key in CAPTURE_TIME_KEYS:
+                if record.get(time_key) and 'created_at' not in body:
+                    body['created_at'] = record[time_key]
+            return body
+    return record
+
+
+# ==================== READING ====================
+
+class Batch:
+    """Records of one transaction, as raw columns keyed by payload field"""
+
+    def __init__(self, records, columns=None, provided=None, created_at=None, rejected=0):
+        self.records = records          # input records consumed
+        self.columns = columns or {}
+        self.provided = provided or {}  # score field -> bool array (sent by the device)
+        self.created_at = created_at
+        self.rejected = rejected
+
+    @property
+    def size(self):
+        return len(self.columns['hardware_timestamp']) if self.columns else 0
+
+
+def ndjson_batch(lines):
+    """Batch of NDJSON lines (payloads or captured requests)"""
+    payloads = []
+    for line in lines:
+        try:
+            payload = unwrap(json.loads(line))
+        except (ValueError, TypeError, AttributeError):
+            continue
+        if isinstance(payload, dict):
+            payloads.append(payload)
+    fields = [ingest.build_iot_data_fields(payload) for payload in payloads]
+    provided = [scoring.provided_scores(payload) for payload in payloads]
+    return Batch(
+        records=len(lines),
+        columns={name: [row[name] for row in fields] for name in DEFAULTS},
+        provided={field: np.array([field in sent for sent in provided], dtype=bool) for field in scoring.SCORE_FIELDS},
+        created_at=[payload.get('created_at') for payload in payloads],
+        rejected=len(lines) - len(payloads),
+    )
+
+
+class _Column(int):
+    """Index of a CSV column, passed through the payload mapping"""
+
+
+def csv_mapping(header):
+    """
+    Payload field -> CSV column index (or constant default), resolved by
+    running ingest.build_iot_data_fields on the header itself.
+    """
+    probe = {name: _Column(i) for i, name in enumerate(header) if name not in NESTED_KEYS}
+    return ingest.build_iot_data_fields(probe)
+
+
+def _csv_batch(rows, header, mapping):
+    width = len(header)
+    valid = [row for row in rows if len(row) == width]
+    n = len(valid)
+    cells = list(zip(*valid)) if valid else [()] * width
+    columns, provided = {}, {}
+    for name, source in mapping.items():
+        if isinstance(source, _Column):
+            default = DEFAULTS[name]
+            values = cells[source]
+            columns[name] = [value if value != '' else default for value in values] if '' in values else values
+        else:
+            columns[name] = [source] * n
+    for field in scoring.SCORE_FIELDS:
+        source = mapping[field]
+        provided[field] = (np.array([value != '' for value in cells[source]], dtype=bool)
+                           if isinstance(source, _Column) else np.zeros(n, dtype=bool))
+    created_at = list(cells[header.index('created_at')]) if 'created_at' in header else None
+    return Batch(len(rows), columns, provided, created_at, rejected=len(rows) - n)
+
+
+def iter_batches(path, fmt, batch_size=DEFAULT_BATCH_SIZE, skip=0):
+    """
+    Batches of the records of a file after the first ``skip`` ones, with
+    the byte offset reached. Blank NDJSON lines are not records.
+    """
+    with open(path, 'rb') as handle:
+        if fmt == 'csv':
+            reader = csv.reader(io.TextIOWrapper(handle, encoding='utf-8-sig', newline=''))
+            header = [name.strip() for name in next(reader, [])]
+            mapping = csv_mapping(header)
+            read = lambda chunk: _csv_batch(chunk, header, mapping)  # noqa: E731
+            records = reader
+        else:
+            read = ndjson_batch
+            records = (line for line in handle if line.strip())
+        for _ in islice(records, skip):
+            pass
+        while True:
+            chunk = list(islice(records, batch_size))
+            if not chunk:
+                return
+            yield read(chunk), handle.tell()
+
+
+# ==================== CONVERSION ====================
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _numbers(values):
+    """float64 array of a column; NaN where a value is not a number"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_to_number(value) for value in values], dtype=np.float64)
+
+
+def _boolean(value):
+    if isinstance(value, str):
+        return BOOLEANS.get(value.strip().lower(), -1)
+    if value in (0, 1):
+        return int(value)
+    return -1
+
+
+def to_epoch(value):
+    """Epoch seconds of a created_at value (ISO 8601 or epoch number)"""
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    else:
+        return value / 1000 if value > MAX_EPOCH_SECONDS else value
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.get_default_timezone())
+    return moment.timestamp()
+
+
+def _db_datetimes(epochs):
+    """Stored form of UTC datetimes (as connection.ops.adapt_datetimefield_value)"""
+    micros = np.rint(epochs * 1e6).astype(np.int64).astype('datetime64[us]')
+    return [text.replace('T', ' ').removesuffix('.000000')
+            for text in np.datetime_as_string(micros, unit='us').tolist()]
+
+
+def _interned(values, model, default='unknown'):
+    names = [default if value is None else str(value) for value in values]
+    ids = {name: model.intern(name) for name in set(names)}
+    return [ids[name] for name in names]
+
+
+def _recommendation_refs(documents, columns, generated):
+    """
+    RecommendationSet ids: the sent document, or the generated one.
+    ``generated`` maps feature tuples to ids across batches.
+    """
+    refs = [None] * len(documents)
+    missing = []
+    for i, document in enumerate(documents):
+        if isinstance(document, str):
+            try:
+                document = json.loads(document)
+            except ValueError:
+                document = None
+        if document:
+            refs[i] = RecommendationSet.intern(document)
+        else:
+            missing.append(i)
+    if missing:
+        keys = recommendations.features_many({field: columns[field][missing] for field in recommendations.FEATURE_FIELDS})
+        for key in set(keys).difference(generated):
+            generated[key] = RecommendationSet.intern(recommendations.advise(key))
+        for i, key in zip(missing, keys):
+            refs[i] = generated[key]
+    return refs
+
+
+def convert(batch, recommendation_refs=None, now=None):
+    """
+    ({IoTData column: values}, rejected count) of a batch.
+    Rows with a non-numeric metric, an invalid boolean or created_at are
+    rejected, as the POST endpoint would fail to store them.
+    """
+    n = batch.size
+    if not n:
+        return {}, batch.rejected
+    raw = batch.columns
+    numbers = {name: _numbers(raw[name]) for name in NUMBER_FIELDS if name not in scoring.SCORE_FIELDS}
+    bad = np.zeros(n, dtype=bool)
+    for values in numbers.values():
+        bad |= ~np.isfinite(values)
+    for name in BOOLEAN_FIELDS:
+        numbers[name] = np.array([_boolean(value) for value in raw[name]], dtype=np.float64)
+        bad |= numbers[name] < 0
+    numbers = {name: np.where(bad, 0, values) for name, values in numbers.items()}
+
+    # Scores: formula, or what the device sent in 'device' mode
+    computed = scoring.compute_scores(numbers)
+    keep_device = scoring.get_mode() == 'device'
+    for field in scoring.SCORE_FIELDS:
+        numbers[field] = computed[field]
+        if keep_device:
+            sent = _numbers(raw[field])
+            bad |= batch.provided[field] & ~np.isfinite(sent)
+            numbers[field] = np.where(batch.provided[field], np.nan_to_num(sent), computed[field])
+
+    # created_at: payload value, else hardware timestamp, else now
+    timestamps = numbers['hardware_timestamp']
+    epochs = np.where(timestamps > MAX_EPOCH_SECONDS, timestamps / 1000, timestamps)
+    epochs[epochs <= 0] = (now or timezone.now()).timestamp()
+    for i, value in enumerate(batch.created_at or ()):
+        if value not in (None, ''):
+            try:
+                epochs[i] = to_epoch(value)
+            except (TypeError, ValueError, OverflowError):
+                bad[i] = True
+
+    columns = {}
+    for name, (column, model) in INTERNED.items():
+        columns[column] = _interned(raw[name], model)
+    columns['recommendations_ref_id'] = _recommendation_refs(
+        raw['recommendations'], numbers, {} if recommendation_refs is None else recommendation_refs)
+    rejected = int(bad.sum())
+    if rejected:
+        keep = np.flatnonzero(~bad)
+        columns = {column: [values[i] for i in keep.tolist()] for column, values in columns.items()}
+        numbers = {name: values[keep] for name, values in numbers.items()}
+        epochs = epochs[keep]
+    for name, kind in NUMBER_FIELDS.items():
+        columns[name] = (numbers[name] if kind == 'FloatField' else np.trunc(numbers[name]).astype(np.int64)).tolist()
+    for name in BOOLEAN_FIELDS:
+        columns[name] = numbers[name].astype(np.int64).tolist()
+    columns['created_at'] = _db_datetimes(epochs)
+    return columns, batch.rejected + rejected
+
+
+# ==================== WRITING ====================
+
+def store_batch(batch, recommendation_refs=None, hours=None, derived=True):
+    """
+    Convert and insert a batch, then (``derived``) fold it into sensor
+    states and sketches. Must run inside a transaction.
+    Returns the (first, last) id range, or None, and the rejected count.
+    """
+    columns, rejected = convert(batch, recommendation_refs)
+    ids = insert_rows(columns)
+    if ids and derived:
+        columns['id'] = list(range(ids[0], ids[1] + 1))
+        update_derived(columns, hours)
+        sketches.store.flush()
+    return ids, rejected
+
+
+def insert_rows(columns):
+    """
+    Insert converted columns into the live table; returns the (first,
+    last) id range. Must run inside the batch transaction: the write lock
+    it holds keeps the ids of one executemany contiguous.
+    """
+    rows = list(zip(*(columns[column] for column in INSERT_COLUMNS))) if columns else []
+    if not rows:
+        return None
+    quote = connection.ops.quote_name
+    table = quote(IoTData._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({", ".join(quote(c) for c in INSERT_COLUMNS)}) '
+            f'VALUES ({", ".join(["%s"] * len(INSERT_COLUMNS))})',
+            rows,
+        )
+        cursor.execute(f'SELECT MAX({quote(IoTData._meta.pk.column)}) FROM {table}')
+        last = cursor.fetchone()[0]
+    return last - len(rows) + 1, last
+
+
+def drop_indexes():
+    """
+    Drop every secondary index of the live table (SQLite only), foreign
+    key indexes included; returns their CREATE statements.
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+            [IoTData._meta.db_table],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    return [sql for _, sql in indexes]
+
+
+def restore_indexes(checkpoint):
+    """Recreate the indexes a deferred import dropped; returns how many"""
+    statements = checkpoint.dropped_indexes
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql.replace(' INDEX ', ' INDEX IF NOT EXISTS ', 1))
+    checkpoint.dropped_indexes = []
+    checkpoint.save(update_fields=['dropped_indexes', 'updated_at'])
+    return len(statements)
+
+
+# ==================== DERIVED STATE ====================
+
+# Stored columns the sensor states and sketches are derived from
+DERIVED_COLUMNS = list(dict.fromkeys([
+    'id', 'created_at', *(f'{ref}_id' for ref in SENSOR_REF_FIELDS.values()),
+    'overheating', *sketches.get_metrics(),
+]))
+
+def _parse_stored(value):
+    return datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc)
+
+
+def update_sensor_states(columns):
+    """
+    Fold a batch of stored readings (DERIVED_COLUMNS, created_at as
+    stored) into SensorState: counts, first / last seen and the metrics of
+    the latest reading, as ingest.update_sensor_state would per reading.
+    """
+    unknown = SensorIdentifier.lookup(ingest.UNKNOWN_SENSOR)
+    created = columns['created_at']
+    refs = {family: np.asarray(columns[f'{ref}_id']) for family, ref in SENSOR_REF_FIELDS.items()}
+    overheated = np.asarray(columns['overheating']) > 0
+    sensors = set().union(*(np.unique(values).tolist() for values in refs.values())) - {unknown}
+    summaries = {}
+    for sensor in sensors:
+        families = {family: values == sensor for family, values in refs.items()}
+        rows = np.flatnonzero(np.logical_or.reduce(list(families.values()))).tolist()
+        latest = max(rows, key=created.__getitem__)
+        summaries[sensor] = {
+            'latest': columns['id'][latest],
+            'families': [family for family, present in families.items() if present[latest]],
+            'first_seen': _parse_stored(min(created[i] for i in rows)),
+            'last_seen': _parse_stored(created[latest]),
+            'count': len(rows),
+            'overheating': int(np.count_nonzero(families['energy'] & overheated)),
+        }
+    latest_metrics = {
+        row['id']: row for row in IoTData.objects.filter(pk__in=[s['latest'] for s in summaries.values()])
+        .values('id', *METRIC_FAMILIES)
+    }
+
+    for sensor, summary in summaries.items():
+        reading = latest_metrics[summary['latest']]
+        metrics = {metric: reading[metric]
+                   for metric, family in METRIC_FAMILIES.items() if family in summary['families']}
+        counts = {
+            'reading_count': F('reading_count') + summary['count'],
+            'overheating_count': F('overheating_count') + summary['overheating'],
+        }
+        latest = {'last_seen': summary['last_seen'], 'metrics': metrics, 'last_reading_id': summary['latest']}
+        states = SensorState.objects.filter(sensor_id=SensorIdentifier.name_for(sensor))
+        if not states.update(**counts):
+            try:
+                with transaction.atomic():
+                    SensorState.objects.create(
+                        sensor_id=SensorIdentifier.name_for(sensor), first_seen=summary['first_seen'],
+                        reading_count=summary['count'], overheating_count=summary['overheating'], **latest
+                    )
+                continue
+            except IntegrityError:
+                # Created concurrently by a live ingest
+                states.update(**counts)
+        states.filter(first_seen__gt=summary['first_seen']).update(first_seen=summary['first_seen'])
+        states.filter(last_seen__lt=summary['last_seen']).update(**latest)
+
+
+def update_derived(columns, hours=None):
+    """
+    Sensor states and sketch deltas of stored readings (DERIVED_COLUMNS).
+    ``hours`` caches floor_hour by stored 'YYYY-MM-DD HH' prefix.
+    """
+    hours = {} if hours is None else hours
+    update_sensor_states(columns)
+    buckets = [hours.get(value[:13]) or hours.setdefault(
+        value[:13], sketches.floor_hour(_parse_stored(value))) for value in columns['created_at']]
+    sketches.record_many(buckets, columns)
+
+
+def apply_derived(ranges, batch_size=DEFAULT_BATCH_SIZE):
+    """Sensor states and sketches of the live rows of [first, last] id ranges"""
+    quote = connection.ops.quote_name
+    # created_at as stored text: no datetime parsing per row
+    selected = [f'CAST({quote(c)} AS TEXT)' if c == 'created_at' else quote(c) for c in DERIVED_COLUMNS]
+    sql = (f'SELECT {", ".join(selected)} FROM {quote(IoTData._meta.db_table)} '
+           f'WHERE {quote(IoTData._meta.pk.column)} BETWEEN %s AND %s')
+    hours = {}
+    for first, last in ranges:
+        for start in range(first, last + 1, batch_size):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [start, min(start + batch_size - 1, last)])
+                rows = cursor.fetchall()
+            if rows:
+                update_derived(dict(zip(DERIVED_COLUMNS, map(list, zip(*rows)))), hours)
+    sketches.store.flush()
+
+
+# ==================== IMPORT ====================
+
+def add_range(ranges, first, last):
+    if ranges and ranges[-1][1] == first - 1:
+        ranges[-1][1] = last
+    else:
+        ranges.append([first, last])
+    return ranges
+
+
+@contextmanager
+def collector_paused():
+    """
+    Batches are millions of short-lived, acyclic objects: collector passes
+    over them would cost more than the parsing itself.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _load(path, fmt, checkpoint, report, batch_size, defer, progress):
+    """Insert the remaining batches of a file, committing the checkpoint with each"""
+    size = os.path.getsize(path) or 1
+    recommendation_refs, hours = {}, {}
+    for batch, offset in iter_batches(path, fmt, batch_size, skip=checkpoint.records):
+        try:
+            with transaction.atomic():
+                ids, rejected = store_batch(batch, recommendation_refs, hours, derived=not defer)
+                imported = ids[1] - ids[0] + 1 if ids else 0
+                if ids and defer:
+                    add_range(checkpoint.pending_ranges, *ids)
+                checkpoint.records += batch.records
+                checkpoint.imported += imported
+                checkpoint.rejected += rejected
+                checkpoint.save()
+        except BaseException:
+            # Deltas of a rolled back batch must not reach the sketches
+            sketches.store.reset()
+            raise
+        report['records'] += batch.records
+        report['imported'] += imported
+        report['rejected'] += rejected
+        if progress:
+            elapsed = time.perf_counter() - report['started']
+            progress(dict(report, seconds=elapsed, fraction=offset / size,
+                          rate=report['imported'] / elapsed if elapsed else 0))
+
+
+def import_file(path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, defer=False, restart=False,
+                rotate=True, progress=None):
+    """
+    Import one file, resuming from its checkpoint. ``progress`` is called
+    after every committed batch with the running report.
+    Returns the report: records, imported, rejected, seconds, ...
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt}')
+    source = os.path.abspath(path)
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+    if restart:
+        checkpoint.records = checkpoint.imported = checkpoint.rejected = 0
+        checkpoint.done = False
+        checkpoint.save()
+    report = {
+        'source': source, 'format': fmt, 'resumed_at': checkpoint.records, 'done_before': checkpoint.done,
+        'records': 0, 'imported': 0, 'rejected': 0, 'indexes_rebuilt': 0, 'partitions': [],
+        'started': time.perf_counter(),
+    }
+    if checkpoint.done:
+        return report
+
+    if defer:
+        checkpoint.dropped_indexes += drop_indexes()
+        checkpoint.save(update_fields=['dropped_indexes', 'updated_at'])
+    else:
+        # Left behind by an interrupted deferred import
+        for other in ImportCheckpoint.objects.exclude(dropped_indexes=[]):
+            report['indexes_rebuilt'] += restore_indexes(other)
+    with collector_paused():
+        try:
+            _load(path, fmt, checkpoint, report, batch_size, defer, progress)
+        finally:
+            if checkpoint.dropped_indexes:
+                report['indexes_rebuilt'] += restore_indexes(checkpoint)
+        with transaction.atomic():
+            if checkpoint.pending_ranges:
+                apply_derived(checkpoint.pending_ranges, batch_size)
+                checkpoint.pending_ranges = []
+            checkpoint.done = True
+            checkpoint.save()
+    if rotate:
+        # Old readings do not belong to the live table
+        report['partitions'] = partitions.rotate()
+    report['seconds'] = time.perf_counter() - report['started']
+    report['total_imported'] = checkpoint.imported
+    return report
@@ -0,0 +1,244 @@
+"""
+Pipeline d'ingestion des lectures IoT.
+Payload mapping, storage, derived state updates and WebSocket broadcast,
+shared by every ingest entry point.
+"""
+import logging
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import IoTData, SensorState, METRIC_FAMILIES, SENSOR_FIELDS
+from . import anomalies
+from . import data_utils
+from . import recommendations
+from . import rules
+from . import scoring
+from . import sketches
+from . import tracing
+
+logger = logging.getLogger('iot.ingest')
+
+
+# Sensor ids used when the sender does not provide one
+UNKNOWN_SENSOR = 'unknown'
+
+# WebSocket groups refreshed after each ingest, with their snapshot builder
+BROADCAST_GROUPS = {
+    'dashboard_updates': data_utils.get_dashboard_data_dict,
+    'hardware_updates': data_utils.get_hardware_data_dict,
+    'energy_updates': data_utils.get_energy_data_dict,
+    'network_updates': data_utils.get_network_data_dict,
+    'scores_updates': data_utils.get_scores_data_dict,
+    'fleet_updates': data_utils.get_fleet_data_dict,
+}
+
+
+def build_iot_data_fields(data):
+    """
+    Map a sensor payload to IoTData field values.
+    Supports both the nested Node-RED format and the flat format.
+    """
+    # Extract nested data structures (from Node-RED format)
+    # Support both nested format and flat format for backwards compatibility
+    hardware_data = data.get('hardware', data)
+    energy_data = data.get('energy', data)
+    network_data = data.get('network', data)
+    scores_data = data.get('scores', data)
+
+    return {
+        # Hardware fields - try nested first, then root
+        'hardware_sensor_id': hardware_data.get('sensor_id', data.get('hardware_sensor_id', UNKNOWN_SENSOR)),
+        'hardware_timestamp': hardware_data.get('timestamp', data.get('hardware_timestamp', 0)),
+        'age_years': hardware_data.get('age_years', data.get('age_years', 0)),
+        'cpu_usage': hardware_data.get('cpu_usage', data.get('cpu_usage', 0)),
+        'ram_usage': hardware_data.get('ram_usage', data.get('ram_usage', 0)),
+        'battery_health': hardware_data.get('battery_health', data.get('battery_health', 0)),
+        'os': hardware_data.get('os', data.get('os', 'unknown')),
+        'win11_compat': hardware_data.get('win11_compat', data.get('win11_compat', False)),
+
+        # Energy fields
+        'energy_sensor_id': energy_data.get('sensor_id', data.get('energy_sensor_id', UNKNOWN_SENSOR)),
+        'energy_timestamp': energy_data.get('timestamp', data.get('energy_timestamp', 0)),
+        'power_watts': energy_data.get('power_watts', data.get('power_watts', 0)),
+        'active_devices': energy_data.get('active_devices', data.get('active_devices', 0)),
+        'overheating': energy_data.get('overheating', data.get('overheating', 0)),
+        'co2_equiv_g': energy_data.get('co2_equiv_g', data.get('co2_equiv_g', 0)),
+
+        # Network fields
+        'network_sensor_id': network_data.get('sensor_id', data.get('network_sensor_id', UNKNOWN_SENSOR)),
+        'network_timestamp': network_data.get('timestamp', data.get('network_timestamp', 0)),
+        'network_load_mbps': network_data.get('network_load_mbps', data.get('network_load_mbps', 0)),
+        'requests_per_min': network_data.get('requests_per_min', data.get('requests_per_min', 0)),
+        'cloud_dependency_score': network_data.get('cloud_dependency_score', data.get('cloud_dependency_score', 0)),
+
+        # Scores from nested object or root (see scoring.apply_scores)
+        'eco_score': scores_data.get('eco_score', 0),
+        'obsolescence_score': scores_data.get('obsolescence_score', 0),
+        'bigtech_dependency': scores_data.get('bigtech_dependency', 0),
+        'co2_savings_kg_year': scores_data.get('co2_savings_kg_year', 0),
+        'recommendations': scores_data.get('recommendations', {}),  # generated if empty
+    }
+
+
+def sensor_metrics(iot_data):
+    """Group the metrics of a reading by the sensor that reported them"""
+    by_sensor = {}
+    for metric, family in METRIC_FAMILIES.items():
+        sensor_id = getattr(iot_data, SENSOR_FIELDS[family])
+        if sensor_id and sensor_id != UNKNOWN_SENSOR:
+            by_sensor.setdefault(sensor_id, {})[metric] = getattr(iot_data, metric)
+    return by_sensor
+
+
+def update_sensor_state(iot_data):
+    """Upsert the SensorState row of every sensor present in a reading"""
+    update_sensor_states([iot_data])
+
+
+def update_sensor_states(readings):
+    """
+    Upsert the SensorState rows of the sensors present in readings (in
+    order): one UPDATE per sensor, whatever the number of readings.
+    """
+    summaries = {}
+    for iot_data in readings:
+        for sensor_id, metrics in sensor_metrics(iot_data).items():
+            summary = summaries.setdefault(sensor_id, {'first_seen': iot_data.created_at, 'count': 0, 'overheating': 0})
+            summary['count'] += 1
+            summary['overheating'] += 1 if metrics.get('overheating') else 0
+            summary['values'] = {
+                'metrics': metrics,
+                'last_reading_id': iot_data.id,
+                'last_seen': iot_data.created_at,
+            }
+
+    for sensor_id, summary in summaries.items():
+        counts = {
+            'reading_count': F('reading_count') + summary['count'],
+            'overheating_count': F('overheating_count') + summary['overheating'],
+        }
+        updated = SensorState.objects.filter(sensor_id=sensor_id).update(**counts, **summary['values'])
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                SensorState.objects.create(
+                    sensor_id=sensor_id,
+                    first_seen=summary['first_seen'],
+                    reading_count=summary['count'],
+                    overheating_count=summary['overheating'],
+                    **summary['values']
+                )
+        except IntegrityError:
+            # Created concurrently by another request
+            SensorState.objects.filter(sensor_id=sensor_id).update(**counts, **summary['values'])
+
+def broadcast_updates(trace=None):
+    """Send fresh snapshots to every WebSocket group"""
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+
+    channel_layer = get_channel_layer()
+
+    # Send data to each WebSocket group
+    for group, builder in BROADCAST_GROUPS.items():
+        try:
+            started = time.time()
+            data_dict = builder()
+            event = {
+                'type': 'data_update',
+                'data': data_dict
+            }
+            if trace:
+                # Each group is timed from its own start, not from the commit
+                group_trace = trace.copy()
+                handed_off = group_trace.mark('snapshot_built', since=started)
+                event['trace'] = group_trace.to_event()
+                # Frames are timed from the hand-off to the channel layer
+                event['trace']['stamps']['group_send'] = handed_off
+            async_to_sync(channel_layer.group_send)(group, event)
+            if trace:
+                group_trace.mark('group_send')
+        except Exception:
+            # Log error but don't block response
+            logger.exception('Error sending WebSocket to group %s', group)
+
+
+def ingest_reading(data):
+    """Store one sensor payload, update derived state and broadcast it"""
+    trace = tracing.start_trace()
+    fields = build_iot_data_fields(data)
+    trace.set_device_timestamp(fields['hardware_timestamp'])
+    scoring.apply_scores([fields], [scoring.provided_scores(data)])
+    recommendations.apply_recommendations([fields])
+
+    iot_data = IoTData.objects.create(**fields)
+    trace.mark('committed')
+
+    update_sensor_state(iot_data)
+    sketches.record(iot_data)
+    anomalies.process_reading(iot_data)
+    rules.process_reading(iot_data)
+    broadcast_updates(trace)
+    return iot_data
+
+
+def create_readings(payloads):
+    """
+    Map, score and store many payloads in one INSERT.
+    Returns the IoTData rows and the ingest trace of the batch.
+    """
+    trace = tracing.start_trace()
+    rows = [build_iot_data_fields(data) for data in payloads]
+    if rows:
+        trace.set_device_timestamp(rows[-1]['hardware_timestamp'])
+    scoring.apply_scores(rows, [scoring.provided_scores(data) for data in payloads])
+    recommendations.apply_recommendations(rows)
+
+    readings = IoTData.objects.bulk_create([IoTData(**fields) for fields in rows])
+    trace.mark('committed')
+    return readings, trace
+
+
+def process_readings(readings, trace=None):
+    """
+    Derived state of stored readings: sensor states (one upsert per
+    sensor), then sketches, anomalies and alert rules per reading, in
+    order, and one broadcast.
+    """
+    update_sensor_states(readings)
+    for iot_data in readings:
+        sketches.record(iot_data)
+        anomalies.process_reading(iot_data)
+        rules.process_reading(iot_data)
+    broadcast_updates(trace)
+
+
+def store_payloads(payloads):
+    """
+    ingest_reading() of many payloads: one INSERT and one broadcast. When
+    the INSERT fails, the payloads are stored one by one, so an invalid
+    reading does not reject the others. Returns the stored IoTData rows and {index: exception}
+    of the payloads that could not be stored.
+    """
+    failures = {}
+    try:
+        readings, trace = create_readings(payloads)
+    except Exception as e:
+        if len(payloads) == 1:
+            return [], {0: e}
+        readings, trace = [], None
+        for index, payload in enumerate(payloads):
+            try:
+                stored, trace = create_readings([payload])
+            except Exception as e:
+                failures[index] = e
+            else:
+                readings += stored
+    if readings:
+        try:
+            process_readings(readings, trace)
+        except Exception:
+            logger.exception('Derived state update failed for %d readings', len(readings))
+    return readings, failures
@@ -0,0 +1,95 @@
+"""
+Protocole ligne compact pour l'ingestion (manage.py ingest_server).
+
+One reading per line:
+
+    <sensor_id> <field>=<value>[,<field>=<value>...] [<timestamp>]
+
+    ESP32_001 cpu_usage=45,ram_usage=60,power_watts=120 1701234567
+    ESP32_002 os="Windows 11",win11_compat=true,battery_health=81.5
+
+Fields are the flat payload names of POST /api/iot-data/. The sensor id
+and the timestamp are given to the family (hardware / energy / network)
+of each field sent, so a line with energy fields only does not report a
+hardware sensor. Values are numbers, t / true / f / false, or JSON
+strings in double quotes. A line starting with ``{`` is a JSON payload,
+nested or flat, as the HTTP endpoint accepts; blank lines and lines
+starting with ``#`` are ignored.
+"""
+import json
+import re
+
+from .models import METRIC_FAMILIES, SENSOR_FIELDS
+
+# Payload field -> family whose sensor id / timestamp the line sets
+FIELD_FAMILIES = {**METRIC_FAMILIES, 'os': 'hardware', 'win11_compat': 'hardware'}
+BOOLEANS = {'t': True, 'true': True, 'f': False, 'false': False}
+
+# Separators outside double-quoted strings
+_PARTS = re.compile(r'(?:"(?:[^"\\]|\\.)*"|[^ "])+')
+_FIELDS = re.compile(r'(?:"(?:[^"\\]|\\.)*"|[^,"])+')
+
+
+def _value(raw):
+    if raw.startswith('"'):
+        return json.loads(raw)
+    boolean = BOOLEANS.get(raw.lower())
+    if boolean is not None:
+        return boolean
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+
+def parse_line(line):
+    """
+    Sensor payload of one line (str), None for a blank or comment line.
+    Raises ValueError on a malformed line.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        payload = json.loads(line)
+        if not isinstance(payload, dict):
+            raise ValueError('JSON line is not an object')
+        return payload
+
+    quoted = '"' in line
+    parts = _PARTS.findall(line) if quoted else line.split()
+    if len(parts) not in (2, 3):
+        raise ValueError('expected "<sensor_id> <field>=<value>[,...] [<timestamp>]"')
+    payload, families = {}, set()
+    for item in (_FIELDS.findall(parts[1]) if quoted else parts[1].split(',')):
+        key, _, raw = item.partition('=')
+        family = FIELD_FAMILIES.get(key)
+        if family is None:
+            raise ValueError(f'unknown field: {key}')
+        try:
+            payload[key] = _value(raw)
+        except ValueError:
+            raise ValueError(f'invalid value for {key}: {raw}')
+        families.add(family)
+    try:
+        timestamp = int(parts[2]) if len(parts) == 3 else None
+    except ValueError:
+        raise ValueError(f'invalid timestamp: {parts[2]}')
+    for family in families:
+        payload[SENSOR_FIELDS[family]] = parts[0]
+        if timestamp is not None:
+            payload[f'{family}_timestamp'] = timestamp
+    return payload
+
+
+def format_line(sensor_id, fields, timestamp=None):
+    """Line of a reading (inverse of parse_line), for senders"""
+    def encode(value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, str):
+            return json.dumps(value)
+        return repr(value)
+
+    line = f"{sensor_id} {','.join(f'{key}={encode(value)}' for key, value in fields.items())}"
+    return f'{line} {timestamp}' if timestamp is not None else line
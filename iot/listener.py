@@ -0,0 +1,205 @@
+"""
+Serveur d'ingestion TCP / UDP (manage.py ingest_server).
+
+Sensors and gateways keep a TCP connection open, or send UDP datagrams,
+carrying one reading per line (see iot.line_protocol): no HTTP request,
+middleware or session per reading. Lines are parsed on the event loop
+and queued; a single writer thread stores them with
+``ingest.store_payloads`` (one INSERT and one WebSocket broadcast per
+batch, sensor states, sketches, anomalies and alert rules per reading).
+
+Back-pressure: when ``max_pending`` readings are queued, TCP connections
+stop being read until the writer catches up, while UDP datagrams are
+dropped (and counted). On TCP, a malformed line is answered with
+``ERR <reason>``; valid lines get no reply.
+"""
+import asyncio
+import logging
+import signal
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from . import ingest, sketches
+from .line_protocol import parse_line
+
+logger = logging.getLogger('iot.listener')
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8089
+DEFAULT_BATCH_SIZE = 500
+# Seconds a partial batch waits for more readings
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_MAX_PENDING = 50000
+# Longest line accepted on TCP (bytes)
+LINE_LIMIT = 64 * 1024
+
+
+class IngestListener:
+    """Queue of parsed readings between the sockets and the writer thread"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(max_pending)
+        self.stats = Counter()
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='iot-ingest-writer')
+        self.writers = set()
+
+    def parse(self, line):
+        """Payload of a raw line, None when blank"""
+        try:
+            payload = parse_line(line.decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            self.stats['rejected'] += 1
+            raise ValueError(str(e)) from None
+        if payload is not None:
+            self.stats['received'] += 1
+        return payload
+
+    # ---------- TCP ----------
+
+    async def handle_connection(self, reader, writer):
+        self.writers.add(writer)
+        self.stats['connections'] += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(b'ERR line too long\n')
+                    break
+                if not line:
+                    break
+                try:
+                    payload = self.parse(line)
+                except ValueError as e:
+                    writer.write(f'ERR {e}\n'.encode())
+                    await writer.drain()
+                    continue
+                if payload is not None:
+                    # Waits while the queue is full: the sender is throttled by TCP
+                    await self.queue.put(payload)
+        except ConnectionError:
+            pass
+        finally:
+            self.stats['connections'] -= 1
+            self.writers.discard(writer)
+            writer.close()
+
+    # ---------- UDP ----------
+
+    def datagram_received(self, data, addr):
+        for line in data.splitlines():
+            try:
+                payload = self.parse(line)
+            except ValueError:
+                continue
+            if payload is None:
+                continue
+            try:
+                self.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.stats['dropped'] += 1
+
+    # ---------- Writer ----------
+
+    def _drain(self, batch):
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    async def write_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            self._drain(batch)
+            if len(batch) < self.batch_size and self.flush_interval:
+                await asyncio.sleep(self.flush_interval)
+                self._drain(batch)
+            await loop.run_in_executor(self.executor, self.store, batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def store(self, payloads):
+        """Writer thread: store a batch, reading by reading if the INSERT fails"""
+        close_old_connections()
+        readings, failures = ingest.store_payloads(payloads)
+        for error in failures.values():
+            logger.error('Reading could not be stored: %s', error)
+        self.stats['stored'] += len(readings)
+        self.stats['failed'] += len(failures)
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.datagram_received(data, addr)
+
+
+async def _report_stats(listener, interval, report):
+    previous, last = 0, time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        stored = listener.stats['stored']
+        report(dict(listener.stats, pending=listener.queue.qsize(), rate=(stored - previous) / (now - last)))
+        previous, last = stored, now
+
+
+async def serve(host=DEFAULT_HOST, tcp_port=DEFAULT_PORT, udp_port=DEFAULT_PORT, batch_size=DEFAULT_BATCH_SIZE,
+                flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING,
+                stats_interval=None, report=None, ready=None, stop=None):
+    """
+    Run the listener until ``stop`` (an asyncio.Event) is set, or SIGINT /
+    SIGTERM. A port of None disables that transport. ``ready`` is called
+    with the bound (transport, address) pairs. Queued readings are stored
+    before returning the final stats.
+    """
+    loop = asyncio.get_running_loop()
+    listener = IngestListener(batch_size, flush_interval, max_pending)
+    stop = stop or asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows, or not the main thread
+            pass
+
+    servers, sockets = [], []
+    if tcp_port is not None:
+        server = await asyncio.start_server(listener.handle_connection, host, tcp_port, limit=LINE_LIMIT)
+        servers.append(server)
+        sockets += [('tcp', sock.getsockname()) for sock in server.sockets]
+    transport = None
+    if udp_port is not None:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(listener), local_addr=(host, udp_port))
+        sockets.append(('udp', transport.get_extra_info('sockname')))
+    if ready:
+        ready(sockets)
+
+    sketches.start_flusher()
+    tasks = [asyncio.create_task(listener.write_batches())]
+    if stats_interval and report:
+        tasks.append(asyncio.create_task(_report_stats(listener, stats_interval, report)))
+    try:
+        await stop.wait()
+    finally:
+        for server in servers:
+            server.close()
+        for writer in list(listener.writers):
+            writer.close()
+        if transport is not None:
+            transport.close()
+        await listener.queue.join()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await loop.run_in_executor(listener.executor, sketches.store.flush)
+        listener.executor.shutdown()
+    return dict(listener.stats)
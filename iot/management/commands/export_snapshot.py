@@ -0,0 +1,54 @@
+"""
+Management command to export IoTData columns to a columnar snapshot.
+The snapshot (one typed array per column + manifest.json) is loaded with
+iot.snapshots.load_snapshot, memory-mapped, without database access.
+Usage: python manage.py export_snapshot snapshots/dec --columns cpu_usage,power_watts
+           --from 2025-12-01 --to 2026-01-01
+"""
+from datetime import datetime, time, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+from iot import snapshots
+
+
+def parse_bound(value):
+    """ISO date or datetime (UTC if naive)"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.min)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Exports IoTData columns to a memory-mappable columnar snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output directory')
+        parser.add_argument('--columns',
+                            help=f"Comma-separated columns (default: {','.join(snapshots.DEFAULT_COLUMNS)})")
+        parser.add_argument('--from', dest='start', help='Start of the range (inclusive), ISO date or datetime')
+        parser.add_argument('--to', dest='end', help='End of the range (exclusive), ISO date or datetime')
+        parser.add_argument('--list-columns', action='store_true', help='List the exportable columns')
+
+    def handle(self, *args, **options):
+        if options['list_columns']:
+            for column, (_, dtype, kind) in snapshots.COLUMN_TYPES.items():
+                self.stdout.write(f'  {column:<26} {dtype:<8} {kind}')
+            return
+
+        columns = options['columns'].split(',') if options['columns'] else None
+        start = parse_bound(options['start']) if options['start'] else None
+        end = parse_bound(options['end']) if options['end'] else None
+        try:
+            manifest = snapshots.export_snapshot(options['path'], columns, start, end)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Columns: {', '.join(manifest['columns'])}")
+        self.stdout.write(f"Range: {manifest['first']} -> {manifest['last']}")
+        self.stdout.write(self.style.SUCCESS(f"Exported {manifest['rows']} rows to {options['path']}"))
@@ -0,0 +1,59 @@
+"""
+Management command to run the TCP / UDP line-protocol ingest listener
+(see iot.listener and iot.line_protocol), next to the HTTP server.
+Usage: python manage.py ingest_server [--port 8089] [--no-udp] [--batch-size 500]
+"""
+import asyncio
+from django.core.management.base import BaseCommand, CommandError
+from iot import listener
+
+
+class Command(BaseCommand):
+    help = 'Accepts sensor readings as a line protocol over persistent TCP connections or UDP datagrams'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=listener.DEFAULT_HOST, help='Address to bind')
+        parser.add_argument('--port', type=int, default=listener.DEFAULT_PORT, help='TCP and UDP port')
+        parser.add_argument('--udp-port', type=int, default=None, help='UDP port, if not --port')
+        parser.add_argument('--no-tcp', dest='tcp', action='store_false', help='Do not listen on TCP')
+        parser.add_argument('--no-udp', dest='udp', action='store_false', help='Do not listen on UDP')
+        parser.add_argument('--batch-size', type=int, default=listener.DEFAULT_BATCH_SIZE,
+                            help='Readings per INSERT / broadcast')
+        parser.add_argument('--flush-interval', type=float, default=listener.DEFAULT_FLUSH_INTERVAL,
+                            help='Seconds a partial batch waits for more readings')
+        parser.add_argument('--max-pending', type=int, default=listener.DEFAULT_MAX_PENDING,
+                            help='Queued readings before TCP is throttled and UDP dropped')
+        parser.add_argument('--stats-interval', type=float, default=10, help='Seconds between stats lines (0: none)')
+
+    def handle(self, *args, **options):
+        if not options['tcp'] and not options['udp']:
+            raise CommandError('Nothing to listen on (--no-tcp and --no-udp)')
+        if options['batch_size'] < 1 or options['max_pending'] < 1:
+            raise CommandError('--batch-size and --max-pending must be positive')
+
+        def ready(sockets):
+            for transport, address in sockets:
+                self.stdout.write(f'Listening on {transport}://{address[0]}:{address[1]}')
+
+        def report(stats):
+            self.stdout.write(
+                f"  {stats.get('stored', 0):>10,} stored  {stats['rate']:>8,.0f}/s  "
+                f"{stats['pending']:>6,} pending  {stats.get('rejected', 0):>6,} rejected  "
+                f"{stats.get('dropped', 0):>6,} dropped  {stats.get('failed', 0):>5,} failed  "
+                f"{stats.get('connections', 0):>4} connections"
+            )
+
+        try:
+            stats = asyncio.run(listener.serve(
+                options['host'],
+                options['port'] if options['tcp'] else None,
+                (options['udp_port'] or options['port']) if options['udp'] else None,
+                options['batch_size'], options['flush_interval'], options['max_pending'],
+                options['stats_interval'], report, ready,
+            ))
+        except OSError as e:
+            raise CommandError(f'Cannot listen: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Stopped: {stats.get('stored', 0):,} readings stored, {stats.get('rejected', 0):,} rejected, "
+            f"{stats.get('dropped', 0):,} dropped, {stats.get('failed', 0):,} failed"
+        ))
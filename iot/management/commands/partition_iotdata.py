@@ -0,0 +1,39 @@
+"""
+Management command to manage the time partitions of IoTData.
+Rotates completed periods out of the live table (default), lists the
+partitions, or drops the ones entirely older than a date.
+Usage: python manage.py partition_iotdata [--list] [--drop-before 2025-01-01]
+"""
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from iot import partitions
+
+
+class Command(BaseCommand):
+    help = 'Rotates, lists or drops the IoTData time partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true',
+                            help='Only list the partitions and their row counts')
+        parser.add_argument('--drop-before', metavar='YYYY-MM-DD',
+                            help='Drop the partitions entirely older than this date (UTC)')
+
+    def handle(self, *args, **options):
+        if options['drop_before']:
+            try:
+                cutoff = datetime.strptime(options['drop_before'], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            except ValueError:
+                raise CommandError('--drop-before expects a date as YYYY-MM-DD')
+            dropped = partitions.drop_partitions_before(cutoff)
+            self.stdout.write(self.style.SUCCESS(f"Dropped {len(dropped)} partition(s): {', '.join(dropped) or '-'}"))
+        elif not options['list']:
+            rotated = partitions.rotate()
+            self.stdout.write(self.style.SUCCESS(f"Rotated into {len(rotated)} partition(s): {', '.join(rotated) or '-'}"))
+
+        self.stdout.write(f'Period: {partitions.get_period()}')
+        for partition in partitions.list_partitions():
+            self.stdout.write(
+                f'  {partition.table}  [{partition.start:%Y-%m-%d}, {partition.end:%Y-%m-%d})  '
+                f'{partition.model.objects.count()} rows'
+            )
+        self.stdout.write(f"  {partitions.IoTData._meta.db_table}  (live)  {partitions.IoTData.objects.count()} rows")
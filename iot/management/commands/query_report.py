@@ -0,0 +1,53 @@
+"""
+Management command to profile the queries issued by the data builders.
+Runs every data_utils builder with the query profiler attached and prints
+the most expensive query fingerprints with their SQLite query plans.
+Usage: python manage.py query_report [--top 10] [--threshold 0]
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from iot import data_utils, db_profiling
+
+
+class Command(BaseCommand):
+    help = 'Profiles the SQL issued by the data_utils builders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help='Number of fingerprints to show')
+        parser.add_argument('--threshold', type=float, default=0,
+                            help='Capture EXPLAIN QUERY PLAN for queries slower than this (ms)')
+
+    def handle(self, *args, **options):
+        builders = [
+            data_utils.get_dashboard_data_dict,
+            data_utils.get_hardware_data_dict,
+            data_utils.get_energy_data_dict,
+            data_utils.get_network_data_dict,
+            data_utils.get_scores_data_dict,
+            lambda: data_utils.get_paginated_iot_data(1, 8),
+        ]
+
+        db_profiling.stats.reset()
+        connection.ensure_connection()
+        # Avoid double counting when IOT_QUERY_PROFILING already installed one
+        db_profiling.uninstall(connection)
+        with connection.execute_wrapper(db_profiling.QueryProfiler(options['threshold'], log=False)):
+            for builder in builders:
+                builder()
+
+        plans = {}
+        for slow in db_profiling.stats.recent_slow():
+            plans.setdefault(db_profiling.fingerprint(slow['sql']), slow)
+
+        for entry in db_profiling.stats.top(options['top']):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{entry['total_ms']:>10.2f} ms total  {entry['count']:>4}x  "
+                f"avg {entry['avg_ms']:.2f} ms  max {entry['max_ms']:.2f} ms"
+            ))
+            self.stdout.write(f"  {entry['fingerprint']}")
+            slow = plans.get(entry['fingerprint'])
+            if slow:
+                self.stdout.write(f"  caller: {slow['caller']}")
+                for step in slow['plan']:
+                    style = self.style.WARNING if step.startswith('SCAN') else str
+                    self.stdout.write(style(f"  plan: {step}"))
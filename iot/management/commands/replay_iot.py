@@ -0,0 +1,73 @@
+"""
+Management command to replay captured ingest traffic (NDJSON payloads or
+captured POST /api/iot-data/ requests) against a running server over
+HTTP, or in process through the live ingest pipeline (batches), at the
+captured pace, faster (--speed 10) or as fast as possible (--speed 0).
+Usage: python manage.py replay_iot capture.ndjson [--speed 10] [--senders 32] [--mode batch] [--url ...]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from iot import replay
+
+
+class Command(BaseCommand):
+    help = 'Replays captured IoT ingest traffic and reports throughput, errors and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture', help='NDJSON capture (payloads or captured requests)')
+        parser.add_argument('--mode', choices=replay.MODES, default='http',
+                            help='POST each reading over HTTP, or store batches through the ingest pipeline in process')
+        parser.add_argument('--url', default=replay.DEFAULT_URL, help='Ingest endpoint (http mode)')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Time scale of the capture: 1 = original pace, 10 = ten times faster, '
+                                 '0 = as fast as possible')
+        parser.add_argument('--senders', type=int, default=replay.DEFAULT_SENDERS, help='Concurrent senders')
+        parser.add_argument('--batch-size', type=int, default=replay.DEFAULT_BATCH_SIZE,
+                            help='Readings per INSERT / broadcast (batch mode)')
+        parser.add_argument('--limit', type=int, default=None, help='Replay only the first N readings')
+        parser.add_argument('--timeout', type=float, default=replay.DEFAULT_TIMEOUT,
+                            help='HTTP timeout in seconds')
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError('--speed must be positive (or 0 for as fast as possible)')
+        if options['senders'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--senders and --batch-size must be positive')
+
+        def progress(report):
+            self.stdout.write(
+                f"  {report['fraction']:6.1%}  {report['readings']:>10,} sent  {report['failed']:>7,} failed  "
+                f"{report['readings_per_second']:>9,.0f} readings/s"
+            )
+
+        self.stdout.write(f"Replaying {options['capture']} ({options['mode']}, speed "
+                          f"{options['speed'] or 'max'}, {options['senders']} senders)")
+        try:
+            report = replay.replay(
+                options['capture'], options['mode'], options['url'], options['speed'], options['senders'],
+                options['batch_size'], options['limit'], options['timeout'], progress,
+            )
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['capture']}: {e}")
+        self.print_report(report)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"  {report['readings']:,} readings in {report['sends']:,} sends over {report['seconds']:.1f}s "
+            f"(captured span {report['captured_seconds']:.1f}s)"
+        )
+        self.stdout.write(
+            f"  Throughput: {report['readings_per_second']:,.0f} readings/s, "
+            f"{report['sends_per_second']:,.0f} sends/s"
+        )
+        for label, key in (('Latency', 'latency_ms'), ('Schedule lag', 'lag_ms')):
+            values = report[key]
+            if values:
+                self.stdout.write(f'  {label} (ms): ' + '  '.join(
+                    f"{'p' + format(p, 'g') if p != 'max' else 'max'} {v:.1f}" for p, v in values.items()
+                ))
+        if report['failed']:
+            self.stdout.write(self.style.ERROR(f"  {report['failed']:,} readings failed:"))
+            for error, count in report['errors'].items():
+                self.stdout.write(f'    {error}: {count:,}')
+        else:
+            self.stdout.write(self.style.SUCCESS('  No errors'))
@@ -0,0 +1,52 @@
+"""
+Management command to recompute the eco / obsolescence / Big Tech / CO2
+scores of stored readings with the server-side formula, e.g. after
+IOT_SCORE_VERSION changed. Only rows whose scores differ are written.
+With IOT_SCORING_MODE = 'device', scores sent by devices would be
+overwritten too: the command refuses to run without --force.
+Usage: python manage.py rescore [--formula 1] [--from 2025-12-01] [--to 2026-01-01] [--dry-run] [--force]
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from iot import scoring
+from iot.management.commands.export_snapshot import parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the scores of stored raw readings with the versioned scoring formula'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formula', type=int, default=None,
+                            help=f'Formula version (default: IOT_SCORE_VERSION), one of {sorted(scoring.FORMULAS)}')
+        parser.add_argument('--from', dest='start', default=None, help='ISO 8601 date or datetime (inclusive)')
+        parser.add_argument('--to', dest='end', default=None, help='ISO 8601 date or datetime (exclusive)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Readings scored and written per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the readings whose scores would change')
+        parser.add_argument('--force', action='store_true',
+                            help="Overwrite the scores sent by devices (IOT_SCORING_MODE = 'device')")
+
+    def handle(self, *args, **options):
+        version = options['formula']
+        if version is not None and version not in scoring.FORMULAS:
+            raise CommandError(f'Unknown score version: {version}')
+        start = parse_bound(options['start']) if options['start'] else None
+        end = parse_bound(options['end']) if options['end'] else None
+
+        started = time.perf_counter()
+        try:
+            report = scoring.rescore(start, end, version, options['batch_size'], options['dry_run'], options['force'])
+        except ValueError as e:
+            raise CommandError(f'{e} (use --force to rescore anyway)')
+        elapsed = time.perf_counter() - started
+        verb = 'Would change' if options['dry_run'] else 'Changed'
+        self.stdout.write(f"Formula version {report['version']}: scanned {report['scanned']} readings")
+        if report['archived_not_rescored']:
+            self.stdout.write(self.style.WARNING(
+                f"{report['archived_not_rescored']} archived readings keep their stored scores"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['changed']} readings in {elapsed:.1f}s "
+            f"({report['scanned'] / elapsed if elapsed else 0:,.0f} readings/s)"
+        ))
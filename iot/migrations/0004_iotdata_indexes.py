@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0003_quizquestion_quizresult'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['created_at'], name='iot_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['hardware_sensor_id', 'created_at'], name='iot_hw_sensor_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['energy_sensor_id', 'created_at'], name='iot_energy_sensor_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['network_sensor_id', 'created_at'], name='iot_net_sensor_time_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q
+
+
+FAMILY_METRICS = {
+    'hardware_sensor_id': [
+        'age_years', 'cpu_usage', 'ram_usage', 'battery_health',
+        'eco_score', 'obsolescence_score', 'bigtech_dependency', 'co2_savings_kg_year',
+    ],
+    'energy_sensor_id': ['power_watts', 'active_devices', 'overheating', 'co2_equiv_g'],
+    'network_sensor_id': ['network_load_mbps', 'requests_per_min', 'cloud_dependency_score'],
+}
+
+
+def backfill_sensor_states(apps, schema_editor):
+    """Build the initial state of every sensor from the existing readings"""
+    IoTData = apps.get_model('iot', 'IoTData')
+    SensorState = apps.get_model('iot', 'SensorState')
+
+    states = {}
+    for sensor_field, metrics in FAMILY_METRICS.items():
+        groups = (
+            IoTData.objects.exclude(**{sensor_field: 'unknown'})
+            .values(sensor_field)
+            .annotate(
+                count=Count('id'),
+                first_seen=Min('created_at'),
+                last_seen=Max('created_at'),
+                last_id=Max('id'),
+                overheating_count=Count('id', filter=Q(overheating__gt=0)),
+            )
+        )
+        for group in groups:
+            sensor_id = group[sensor_field]
+            latest = IoTData.objects.filter(id=group['last_id']).values(*metrics).first()
+            state = states.setdefault(sensor_id, SensorState(
+                sensor_id=sensor_id,
+                metrics={},
+                first_seen=group['first_seen'],
+                last_seen=group['last_seen'],
+                last_reading_id=group['last_id'],
+            ))
+            state.metrics.update(latest)
+            # A sensor reporting several families counts each reading once
+            state.reading_count = max(state.reading_count, group['count'])
+            if sensor_field == 'energy_sensor_id':
+                state.overheating_count = group['overheating_count']
+            state.first_seen = min(state.first_seen, group['first_seen'])
+            if group['last_seen'] >= state.last_seen:
+                state.last_seen = group['last_seen']
+                state.last_reading_id = group['last_id']
+
+    SensorState.objects.bulk_create(states.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0004_iotdata_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorState',
+            fields=[
+                ('sensor_id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('metrics', models.JSONField(default=dict, help_text='Latest metrics reported by this sensor')),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField(db_index=True)),
+                ('reading_count', models.PositiveIntegerField(default=0)),
+                ('overheating_count', models.PositiveIntegerField(default=0)),
+                ('last_reading', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='iot.iotdata')),
+            ],
+            options={
+                'ordering': ['sensor_id'],
+            },
+        ),
+        migrations.RunPython(backfill_sensor_states, migrations.RunPython.noop),
+    ]
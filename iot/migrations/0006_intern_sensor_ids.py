@@ -0,0 +1,165 @@
+# Replaces the sensor id and OS strings of IoTData with small integer
+# foreign keys to lookup tables.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+INTERNED_COLUMNS = [
+    # (old string field, new foreign key, lookup model)
+    ('hardware_sensor_id', 'hardware_sensor_ref', 'SensorIdentifier'),
+    ('energy_sensor_id', 'energy_sensor_ref', 'SensorIdentifier'),
+    ('network_sensor_id', 'network_sensor_ref', 'SensorIdentifier'),
+    ('os', 'os_ref', 'OperatingSystem'),
+]
+
+
+def intern_columns(apps, schema_editor):
+    IoTData = apps.get_model('iot', 'IoTData')
+    for old_field, new_field, model_name in INTERNED_COLUMNS:
+        Lookup = apps.get_model('iot', model_name)
+        names = IoTData.objects.values_list(old_field, flat=True).distinct()
+        for name in names:
+            pk = Lookup.objects.get_or_create(name=name)[0].pk
+            IoTData.objects.filter(**{old_field: name}).update(**{f'{new_field}_id': pk})
+
+
+def restore_columns(apps, schema_editor):
+    IoTData = apps.get_model('iot', 'IoTData')
+    for old_field, new_field, model_name in INTERNED_COLUMNS:
+        Lookup = apps.get_model('iot', model_name)
+        for pk, name in Lookup.objects.values_list('pk', 'name'):
+            IoTData.objects.filter(**{f'{new_field}_id': pk}).update(**{old_field: name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0005_sensorstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorIdentifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OperatingSystem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='hardware_sensor_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier'),
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='energy_sensor_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier'),
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='network_sensor_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier'),
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='os_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.operatingsystem'),
+        ),
+        migrations.RunPython(intern_columns, restore_columns),
+        migrations.RemoveIndex(
+            model_name='iotdata',
+            name='iot_hw_sensor_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='iotdata',
+            name='iot_energy_sensor_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='iotdata',
+            name='iot_net_sensor_time_idx',
+        ),
+        # Defaults let the reverse migration add the columns back to
+        # existing rows before restore_columns fills them
+        migrations.AlterField(
+            model_name='iotdata',
+            name='hardware_sensor_id',
+            field=models.CharField(default='unknown', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='energy_sensor_id',
+            field=models.CharField(default='unknown', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='network_sensor_id',
+            field=models.CharField(default='unknown', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='os',
+            field=models.CharField(default='unknown', max_length=20),
+        ),
+        migrations.RemoveField(
+            model_name='iotdata',
+            name='hardware_sensor_id',
+        ),
+        migrations.RemoveField(
+            model_name='iotdata',
+            name='energy_sensor_id',
+        ),
+        migrations.RemoveField(
+            model_name='iotdata',
+            name='network_sensor_id',
+        ),
+        migrations.RemoveField(
+            model_name='iotdata',
+            name='os',
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='hardware_sensor_ref',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier'),
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='energy_sensor_ref',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier'),
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='network_sensor_ref',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier'),
+        ),
+        migrations.AlterField(
+            model_name='iotdata',
+            name='os_ref',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.operatingsystem'),
+        ),
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['hardware_sensor_ref', 'created_at'], name='iot_hw_sensor_ref_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['energy_sensor_ref', 'created_at'], name='iot_energy_ref_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iotdata',
+            index=models.Index(fields=['network_sensor_ref', 'created_at'], name='iot_net_sensor_ref_time_idx'),
+        ),
+    ]
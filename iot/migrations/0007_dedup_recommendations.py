@@ -0,0 +1,68 @@
+# Stores each distinct recommendations document once and keeps only a
+# reference to it on IoTData.
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def canonical(document):
+    return json.dumps(document, sort_keys=True, separators=(',', ':'))
+
+
+def dedup_recommendations(apps, schema_editor):
+    IoTData = apps.get_model('iot', 'IoTData')
+    RecommendationSet = apps.get_model('iot', 'RecommendationSet')
+
+    ids_by_digest = {}
+    documents = {}
+    rows = IoTData.objects.exclude(recommendations={}).values_list('id', 'recommendations')
+    for row_id, document in rows.iterator(chunk_size=2000):
+        if not document:
+            continue
+        text = canonical(document)
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        documents[digest] = document
+        ids_by_digest.setdefault(digest, []).append(row_id)
+
+    for digest, row_ids in ids_by_digest.items():
+        ref = RecommendationSet.objects.create(digest=digest, document=documents[digest])
+        for start in range(0, len(row_ids), 500):
+            IoTData.objects.filter(id__in=row_ids[start:start + 500]).update(recommendations_ref=ref)
+
+
+def restore_recommendations(apps, schema_editor):
+    IoTData = apps.get_model('iot', 'IoTData')
+    RecommendationSet = apps.get_model('iot', 'RecommendationSet')
+    for ref in RecommendationSet.objects.all():
+        IoTData.objects.filter(recommendations_ref=ref).update(recommendations=ref.document)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0006_intern_sensor_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('document', models.JSONField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='recommendations_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.recommendationset'),
+        ),
+        migrations.RunPython(dedup_recommendations, restore_recommendations),
+        migrations.RemoveField(
+            model_name='iotdata',
+            name='recommendations',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0007_dedup_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IoTRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('bucket_start', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField()),
+                ('age_years', models.FloatField(null=True)),
+                ('cpu_usage', models.FloatField(null=True)),
+                ('ram_usage', models.FloatField(null=True)),
+                ('battery_health', models.FloatField(null=True)),
+                ('power_watts', models.FloatField(null=True)),
+                ('active_devices', models.FloatField(null=True)),
+                ('overheating', models.FloatField(null=True)),
+                ('co2_equiv_g', models.FloatField(null=True)),
+                ('network_load_mbps', models.FloatField(null=True)),
+                ('requests_per_min', models.FloatField(null=True)),
+                ('cloud_dependency_score', models.FloatField(null=True)),
+                ('eco_score', models.FloatField(null=True)),
+                ('obsolescence_score', models.FloatField(null=True)),
+                ('bigtech_dependency', models.FloatField(null=True)),
+                ('co2_savings_kg_year', models.FloatField(null=True)),
+                ('energy_sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+                ('hardware_sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+                ('network_sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'hardware_sensor_ref', 'bucket_start'], name='iot_rollup_hw_idx'), models.Index(fields=['resolution', 'energy_sensor_ref', 'bucket_start'], name='iot_rollup_energy_idx'), models.Index(fields=['resolution', 'network_sensor_ref', 'bucket_start'], name='iot_rollup_net_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'bucket_start', 'hardware_sensor_ref', 'energy_sensor_ref', 'network_sensor_ref'), name='iot_rollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0008_iotrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateTimeField()),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('energy_sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+                ('hardware_sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+                ('network_sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchiveBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('column', models.CharField(max_length=40)),
+                ('encoding', models.CharField(choices=[('dod', 'Delta of delta'), ('delta', 'Delta'), ('xor', 'XOR')], max_length=5)),
+                ('data', models.BinaryField()),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='iot.archivesegment')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivesegment',
+            index=models.Index(fields=['window_start'], name='iot_archive_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivesegment',
+            index=models.Index(fields=['hardware_sensor_ref', 'start_time'], name='iot_archive_hw_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivesegment',
+            index=models.Index(fields=['energy_sensor_ref', 'start_time'], name='iot_archive_energy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivesegment',
+            index=models.Index(fields=['network_sensor_ref', 'start_time'], name='iot_archive_net_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archiveblock',
+            constraint=models.UniqueConstraint(fields=('segment', 'column'), name='iot_archive_block_uniq'),
+        ),
+    ]
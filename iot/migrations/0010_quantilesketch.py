@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0009_archivesegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuantileSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=40)),
+                ('bucket_start', models.DateTimeField(null=True)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('data', models.JSONField(help_text='Serialized DDSketch (see iot.sketches)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sensor_ref', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'sensor_ref', 'bucket_start'), name='iot_sketch_uniq'), models.UniqueConstraint(condition=models.Q(('bucket_start__isnull', True)), fields=('metric', 'sensor_ref'), name='iot_sketch_sensor_uniq'), models.UniqueConstraint(condition=models.Q(('sensor_ref__isnull', True)), fields=('metric', 'bucket_start'), name='iot_sketch_bucket_uniq'), models.UniqueConstraint(condition=models.Q(('bucket_start__isnull', True), ('sensor_ref__isnull', True)), fields=('metric',), name='iot_sketch_global_uniq')],
+            },
+        ),
+    ]
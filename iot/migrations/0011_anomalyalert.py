@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0010_quantilesketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=40)),
+                ('kind', models.CharField(choices=[('zscore', 'Z-score'), ('rate', 'Rate of change'), ('stuck', 'Stuck value')], max_length=6)),
+                ('value', models.FloatField()),
+                ('expected', models.FloatField(help_text='EWMA level of the metric before this reading')),
+                ('score', models.FloatField(help_text='Deviation in standard deviations (readings in a row for stuck)')),
+                ('reading_id', models.BigIntegerField(null=True)),
+                ('created_at', models.DateTimeField()),
+                ('sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['created_at'], name='iot_alert_created_idx'), models.Index(fields=['sensor_ref', 'created_at'], name='iot_alert_sensor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0011_anomalyalert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('expression', models.CharField(help_text="e.g. 'power_watts > 250 for 5 readings' or 'overheating == 1 and age_years > 5'", max_length=255)),
+                ('cooldown_seconds', models.PositiveIntegerField(default=300, help_text='Minimum delay between two alerts')),
+                ('enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sensor_ref', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RuleAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('values', models.JSONField(help_text="Values of the rule's metrics in the triggering reading")),
+                ('reading_id', models.BigIntegerField(null=True)),
+                ('created_at', models.DateTimeField()),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='iot.alertrule')),
+                ('sensor_ref', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['created_at'], name='iot_rulealert_created_idx'), models.Index(fields=['rule', 'created_at'], name='iot_rulealert_rule_idx')],
+            },
+        ),
+    ]
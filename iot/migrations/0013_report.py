@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0012_alertrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateTimeField()),
+                ('metrics', models.JSONField(help_text='{metric: {count, sum, min, max, mean}}')),
+                ('complete', models.BooleanField(default=True)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('sensor_ref', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='iot.sensoridentifier')),
+            ],
+            options={
+                'ordering': ['-period_start', 'sensor_ref'],
+                'indexes': [models.Index(fields=['period', 'sensor_ref', 'period_start'], name='iot_report_sensor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start', 'sensor_ref'), name='iot_report_uniq'), models.UniqueConstraint(condition=models.Q(('sensor_ref__isnull', True)), fields=('period', 'period_start'), name='iot_report_fleet_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iot', '0013_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Absolute path of the imported file', max_length=500, unique=True)),
+                ('records', models.PositiveBigIntegerField(default=0, help_text='Input records consumed (imported or rejected)')),
+                ('imported', models.PositiveBigIntegerField(default=0)),
+                ('rejected', models.PositiveBigIntegerField(default=0)),
+                ('pending_ranges', models.JSONField(default=list, help_text='[[first id, last id], ...] not yet applied')),
+                ('dropped_indexes', models.JSONField(default=list, help_text='CREATE INDEX statements to run when loading ends')),
+                ('done', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
@@ -1,22 +1,213 @@
-from django.db import models
+import hashlib
+import json
+from functools import lru_cache
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 
+# Sensor attribute identifying the source of each metric family
+SENSOR_FIELDS = {
+    'hardware': 'hardware_sensor_id',
+    'energy': 'energy_sensor_id',
+    'network': 'network_sensor_id',
+}
+
+# Interned foreign key storing that sensor in the database (use for queries)
+SENSOR_REF_FIELDS = {
+    'hardware': 'hardware_sensor_ref',
+    'energy': 'energy_sensor_ref',
+    'network': 'network_sensor_ref',
+}
+
+# Numeric metrics and the family (hence sensor column) they belong to.
+# Scores are computed per device, so they follow the hardware sensor.
+METRIC_FAMILIES = {
+    'age_years': 'hardware',
+    'cpu_usage': 'hardware',
+    'ram_usage': 'hardware',
+    'battery_health': 'hardware',
+    'power_watts': 'energy',
+    'active_devices': 'energy',
+    'overheating': 'energy',
+    'co2_equiv_g': 'energy',
+    'network_load_mbps': 'network',
+    'requests_per_min': 'network',
+    'cloud_dependency_score': 'network',
+    'eco_score': 'hardware',
+    'obsolescence_score': 'hardware',
+    'bigtech_dependency': 'hardware',
+    'co2_savings_kg_year': 'hardware',
+}
+
+# Process-wide caches of the lookup tables: {model: (name -> id, id -> name)}
+_LOOKUP_CACHES = {}
+
+# Process-wide cache of RecommendationSet ids: {digest: id}
+_RECOMMENDATION_PKS = {}
+RECOMMENDATION_PKS_SIZE = 4096
+
+
+def cache_on_commit(cache, pairs):
+    """
+    Add pairs to a process-wide cache once the current transaction
+    commits (at once in autocommit): ids of rows created, or only seen,
+    by a transaction that rolls back must not outlive it.
+    """
+    transaction.on_commit(lambda: cache.update(pairs))
+
+
+class LookupName(models.Model):
+    """
+    Table de correspondance nom -> petit entier.
+    Rows are never renamed or deleted, so committed ids are cached for the
+    lifetime of the process and the ingest path only hits the DB for new
+    names.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _cache(cls):
+        return _LOOKUP_CACHES.setdefault(cls, ({}, {}))
+
+    @classmethod
+    def intern(cls, name):
+        """Id of a name, created on first use"""
+        ids, names = cls._cache()
+        pk = ids.get(name)
+        if pk is None:
+            pk = cls.objects.get_or_create(name=name)[0].pk
+            cls._remember([(name, pk)])
+        return pk
+
+    @classmethod
+    def lookup(cls, name):
+        """Id of an existing name, or None (never creates)"""
+        ids, names = cls._cache()
+        pk = ids.get(name)
+        if pk is None:
+            pk = cls.objects.filter(name=name).values_list('pk', flat=True).first()
+            if pk is not None:
+                cls._remember([(name, pk)])
+        return pk
+
+    @classmethod
+    def name_for(cls, pk):
+        """Name of an id; a miss reloads the whole (small) table"""
+        if pk is None:
+            return None
+        ids, names = cls._cache()
+        if pk in names:
+            return names[pk]
+        rows = list(cls.objects.values_list('name', 'pk'))
+        cls._remember(rows)
+        return {row_pk: name for name, row_pk in rows}.get(pk)
+
+    @classmethod
+    def _remember(cls, rows):
+        """Cache (name, id) rows once they are committed"""
+        ids, names = cls._cache()
+        cache_on_commit(ids, rows)
+        cache_on_commit(names, [(pk, name) for name, pk in rows])
+
+    @classmethod
+    def clear_cache(cls):
+        _LOOKUP_CACHES.pop(cls, None)
+
+    def __str__(self):
+        return self.name
+
+
+class SensorIdentifier(LookupName):
+    """Identifiant de capteur interné"""
+
+
+class OperatingSystem(LookupName):
+    """Système d'exploitation interné"""
+
+    name = models.CharField(max_length=20, unique=True)
+
+
+class RecommendationSet(models.Model):
+    """
+    Document de recommandations stocké une seule fois.
+    Rows are content addressed: the SHA-256 of the canonical JSON is the
+    lookup key, so the few sets Node-RED keeps sending are shared by all
+    the readings that reference them.
+    """
+
+    digest = models.CharField(max_length=64, unique=True)
+    document = models.JSONField()
+
+    @staticmethod
+    def canonical(document):
+        return json.dumps(document, sort_keys=True, separators=(',', ':'))
+
+    @classmethod
+    def intern(cls, document):
+        """Id of the stored copy of a document (None for an empty one)"""
+        if not document:
+            return None
+        canonical = cls.canonical(document)
+        digest = hashlib.sha256(canonical.encode()).hexdigest()
+        pk = _RECOMMENDATION_PKS.get(digest)
+        if pk is None:
+            pk = cls.objects.get_or_create(digest=digest, defaults={'document': json.loads(canonical)})[0].pk
+            if len(_RECOMMENDATION_PKS) >= RECOMMENDATION_PKS_SIZE:
+                _RECOMMENDATION_PKS.clear()
+            cache_on_commit(_RECOMMENDATION_PKS, [(digest, pk)])
+        return pk
+
+    @classmethod
+    def document_for(cls, pk):
+        """
+        Decoded document of an id, served from an LRU cache.
+        The returned dict is shared between callers and must not be mutated.
+        """
+        if pk is None:
+            return {}
+        return _recommendation_document(pk)
+
+    def __str__(self):
+        return self.digest[:12]
+
+
+@lru_cache(maxsize=1024)
+def _recommendation_document(pk):
+    return RecommendationSet.objects.values_list('document', flat=True).get(pk=pk)
+
+
+def interned_property(ref_field, lookup_model, default='unknown'):
+    """Expose an interned foreign key as its plain string value"""
+    attname = f'{ref_field}_id'
+
+    def getter(self):
+        return lookup_model.name_for(getattr(self, attname))
+
+    def setter(self, value):
+        setattr(self, attname, lookup_model.intern(default if value is None else str(value)))
+
+    return property(getter, setter)
+
+
 class IoTData(models.Model):
 
     # ---------- HARDWARE ----------
-    hardware_sensor_id = models.CharField(max_length=50)
+    hardware_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
     hardware_timestamp = models.BigIntegerField()
 
     age_years = models.IntegerField()
     cpu_usage = models.IntegerField()
     ram_usage = models.IntegerField()
     battery_health = models.FloatField()
-    os = models.CharField(max_length=20)
+    os_ref = models.ForeignKey(OperatingSystem, on_delete=models.PROTECT, related_name='+')
     win11_compat = models.BooleanField()
 
     # ---------- ENERGY ----------
-    energy_sensor_id = models.CharField(max_length=50)
+    energy_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
     energy_timestamp = models.BigIntegerField()
 
     power_watts = models.IntegerField()
@@ -25,7 +216,7 @@ class IoTData(models.Model):
     co2_equiv_g = models.IntegerField()
 
     # ---------- NETWORK ----------
-    network_sensor_id = models.CharField(max_length=50)
+    network_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
     network_timestamp = models.BigIntegerField()
 
     network_load_mbps = models.IntegerField()
@@ -37,15 +228,397 @@ class IoTData(models.Model):
     obsolescence_score = models.IntegerField()
     bigtech_dependency = models.IntegerField()
     co2_savings_kg_year = models.IntegerField()
-    recommendations = models.JSONField(default=dict, blank=True)
+    recommendations_ref = models.ForeignKey(
+        RecommendationSet,
+        on_delete=models.PROTECT,
+        related_name='+',
+        null=True,
+        blank=True
+    )
 
     # ---------- TIMESTAMP ENREGISTREMENT ----------
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # String views of the interned columns, readable and assignable
+    # (IoTData(hardware_sensor_id='ESP32_001') interns the name)
+    hardware_sensor_id = interned_property('hardware_sensor_ref', SensorIdentifier)
+    energy_sensor_id = interned_property('energy_sensor_ref', SensorIdentifier)
+    network_sensor_id = interned_property('network_sensor_ref', SensorIdentifier)
+    os = interned_property('os_ref', OperatingSystem)
+
+    @property
+    def recommendations(self):
+        return RecommendationSet.document_for(self.recommendations_ref_id)
+
+    @recommendations.setter
+    def recommendations(self, value):
+        self.recommendations_ref_id = RecommendationSet.intern(value)
+
+    class Meta:
+        indexes = [
+            # Latest readings (ORDER BY created_at DESC LIMIT n)
+            models.Index(fields=['created_at'], name='iot_created_idx'),
+            # Per-sensor time series: filter on the sensor, sort on time
+            models.Index(fields=['hardware_sensor_ref', 'created_at'], name='iot_hw_sensor_ref_time_idx'),
+            models.Index(fields=['energy_sensor_ref', 'created_at'], name='iot_energy_ref_time_idx'),
+            models.Index(fields=['network_sensor_ref', 'created_at'], name='iot_net_sensor_ref_time_idx'),
+        ]
+
     def __str__(self):
         return f"IoT Data {self.id} - {self.created_at}"
 
 
+class IoTRollup(models.Model):
+    """
+    Moyennes d'IoTData par intervalle (minute / heure) et par capteurs.
+    Written by the retention engine when raw readings are downsampled;
+    metric columns hold the average over ``sample_count`` readings.
+    """
+
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+    ]
+
+    resolution = models.CharField(max_length=6, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    hardware_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    energy_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    network_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    sample_count = models.PositiveIntegerField()
+
+    age_years = models.FloatField(null=True)
+    cpu_usage = models.FloatField(null=True)
+    ram_usage = models.FloatField(null=True)
+    battery_health = models.FloatField(null=True)
+    power_watts = models.FloatField(null=True)
+    active_devices = models.FloatField(null=True)
+    overheating = models.FloatField(null=True)
+    co2_equiv_g = models.FloatField(null=True)
+    network_load_mbps = models.FloatField(null=True)
+    requests_per_min = models.FloatField(null=True)
+    cloud_dependency_score = models.FloatField(null=True)
+    eco_score = models.FloatField(null=True)
+    obsolescence_score = models.FloatField(null=True)
+    bigtech_dependency = models.FloatField(null=True)
+    co2_savings_kg_year = models.FloatField(null=True)
+
+    hardware_sensor_id = interned_property('hardware_sensor_ref', SensorIdentifier)
+    energy_sensor_id = interned_property('energy_sensor_ref', SensorIdentifier)
+    network_sensor_id = interned_property('network_sensor_ref', SensorIdentifier)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['resolution', 'bucket_start', 'hardware_sensor_ref', 'energy_sensor_ref', 'network_sensor_ref'],
+                name='iot_rollup_bucket_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'hardware_sensor_ref', 'bucket_start'], name='iot_rollup_hw_idx'),
+            models.Index(fields=['resolution', 'energy_sensor_ref', 'bucket_start'], name='iot_rollup_energy_idx'),
+            models.Index(fields=['resolution', 'network_sensor_ref', 'bucket_start'], name='iot_rollup_net_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resolution} rollup {self.bucket_start} ({self.sample_count} readings)"
+
+
+class ArchiveSegment(models.Model):
+    """
+    Lectures brutes archivées d'un trio de capteurs, stockées en colonnes.
+    One segment holds the readings of one retention window for one sensor
+    triple, sorted by time; each IoTData column is an ArchiveBlock.
+    """
+
+    window_start = models.DateTimeField()
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    hardware_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    energy_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    network_sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    row_count = models.PositiveIntegerField()
+
+    hardware_sensor_id = interned_property('hardware_sensor_ref', SensorIdentifier)
+    energy_sensor_id = interned_property('energy_sensor_ref', SensorIdentifier)
+    network_sensor_id = interned_property('network_sensor_ref', SensorIdentifier)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['window_start'], name='iot_archive_window_idx'),
+            models.Index(fields=['hardware_sensor_ref', 'start_time'], name='iot_archive_hw_idx'),
+            models.Index(fields=['energy_sensor_ref', 'start_time'], name='iot_archive_energy_idx'),
+            models.Index(fields=['network_sensor_ref', 'start_time'], name='iot_archive_net_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archive {self.start_time} - {self.end_time} ({self.row_count} readings)"
+
+
+class ArchiveBlock(models.Model):
+    """Une colonne d'un ArchiveSegment, encodée (delta-of-delta, delta ou XOR)"""
+
+    ENCODING_CHOICES = [
+        ('dod', 'Delta of delta'),
+        ('delta', 'Delta'),
+        ('xor', 'XOR'),
+    ]
+
+    segment = models.ForeignKey(ArchiveSegment, on_delete=models.CASCADE, related_name='blocks')
+    column = models.CharField(max_length=40)
+    encoding = models.CharField(max_length=5, choices=ENCODING_CHOICES)
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['segment', 'column'], name='iot_archive_block_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.column} ({self.encoding}, {len(self.data)} bytes)"
+
+
+class QuantileSketch(models.Model):
+    """
+    Sketch de quantiles (DDSketch) d'une métrique, fusionnable.
+    sensor_ref NULL covers every sensor; bucket_start NULL covers all
+    history, otherwise one hour (the hour rollup boundaries).
+    """
+
+    metric = models.CharField(max_length=40)
+    sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+', null=True)
+    bucket_start = models.DateTimeField(null=True)
+    count = models.PositiveBigIntegerField(default=0)
+    data = models.JSONField(help_text="Serialized DDSketch (see iot.sketches)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # NULLs are distinct in unique constraints: one partial constraint per scope
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'sensor_ref', 'bucket_start'], name='iot_sketch_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['metric', 'sensor_ref'], condition=models.Q(bucket_start__isnull=True),
+                name='iot_sketch_sensor_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['metric', 'bucket_start'], condition=models.Q(sensor_ref__isnull=True),
+                name='iot_sketch_bucket_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['metric'], condition=models.Q(sensor_ref__isnull=True, bucket_start__isnull=True),
+                name='iot_sketch_global_uniq',
+            ),
+        ]
+
+    @property
+    def sensor_id(self):
+        return SensorIdentifier.name_for(self.sensor_ref_id)
+
+    def __str__(self):
+        scope = self.sensor_id or 'all sensors'
+        period = self.bucket_start or 'all time'
+        return f"{self.metric} / {scope} / {period} ({self.count} values)"
+
+
+class AnomalyAlert(models.Model):
+    """
+    Anomalie détectée à l'ingestion sur une métrique d'un capteur.
+    reading_id is the IoTData id (no foreign key: readings move between
+    time partitions and the archive).
+    """
+
+    KIND_CHOICES = [
+        ('zscore', 'Z-score'),
+        ('rate', 'Rate of change'),
+        ('stuck', 'Stuck value'),
+    ]
+
+    sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    metric = models.CharField(max_length=40)
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    value = models.FloatField()
+    expected = models.FloatField(help_text="EWMA level of the metric before this reading")
+    score = models.FloatField(help_text="Deviation in standard deviations (readings in a row for stuck)")
+    reading_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField()
+
+    sensor_id = interned_property('sensor_ref', SensorIdentifier)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['created_at'], name='iot_alert_created_idx'),
+            models.Index(fields=['sensor_ref', 'created_at'], name='iot_alert_sensor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.metric} {self.kind} ({self.value})"
+
+
+class AlertRule(models.Model):
+    """
+    Règle d'alerte définie par un opérateur (see iot.rules for the syntax).
+    A rule follows the sensor of its first metric's family; sensor_ref
+    restricts it to that sensor, NULL applies it to the whole fleet.
+    """
+
+    name = models.CharField(max_length=100)
+    expression = models.CharField(
+        max_length=255,
+        help_text="e.g. 'power_watts > 250 for 5 readings' or 'overheating == 1 and age_years > 5'"
+    )
+    sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+', null=True, blank=True)
+    cooldown_seconds = models.PositiveIntegerField(default=300, help_text="Minimum delay between two alerts")
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    @property
+    def sensor_id(self):
+        return SensorIdentifier.name_for(self.sensor_ref_id)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .rules import parse_expression
+
+        try:
+            parse_expression(self.expression)
+        except ValueError as e:
+            raise ValidationError({'expression': str(e)})
+
+    def __str__(self):
+        return f"{self.name}: {self.expression}"
+
+
+class RuleAlert(models.Model):
+    """Déclenchement d'une AlertRule, avec les valeurs qui l'ont provoqué"""
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='alerts')
+    sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+')
+    values = models.JSONField(help_text="Values of the rule's metrics in the triggering reading")
+    reading_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField()
+
+    sensor_id = interned_property('sensor_ref', SensorIdentifier)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['created_at'], name='iot_rulealert_created_idx'),
+            models.Index(fields=['rule', 'created_at'], name='iot_rulealert_rule_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.rule.name} on {self.sensor_id} at {self.created_at}"
+
+
+class Report(models.Model):
+    """
+    Rapport agrégé (jour ou mois) d'un capteur, ou de la flotte si
+    sensor_ref est NULL. Written by ``manage.py generate_reports``;
+    ``complete`` is False while the period was only partly covered.
+    """
+
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('month', 'Month'),
+    ]
+
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    sensor_ref = models.ForeignKey(SensorIdentifier, on_delete=models.PROTECT, related_name='+', null=True)
+    metrics = models.JSONField(help_text="{metric: {count, sum, min, max, mean}}")
+    complete = models.BooleanField(default=True)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-period_start', 'sensor_ref']
+        # NULLs are distinct in unique constraints: the fleet scope gets its own
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'sensor_ref'], name='iot_report_uniq'),
+            models.UniqueConstraint(
+                fields=['period', 'period_start'], condition=models.Q(sensor_ref__isnull=True),
+                name='iot_report_fleet_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'sensor_ref', 'period_start'], name='iot_report_sensor_idx'),
+        ]
+
+    @property
+    def sensor_id(self):
+        return SensorIdentifier.name_for(self.sensor_ref_id)
+
+    def __str__(self):
+        return f"{self.period} {self.period_start:%Y-%m-%d} / {self.sensor_id or 'fleet'}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Avancement d'un import en masse (``manage.py import_iot``) par fichier.
+    Updated in the transaction of every batch, so ``records`` is exactly
+    the number of input records already handled. ``pending_ranges`` lists
+    the id ranges whose sensor states and sketches were deferred, and
+    ``dropped_indexes`` the live table indexes to rebuild.
+    """
+
+    source = models.CharField(max_length=500, unique=True, help_text="Absolute path of the imported file")
+    records = models.PositiveBigIntegerField(default=0, help_text="Input records consumed (imported or rejected)")
+    imported = models.PositiveBigIntegerField(default=0)
+    rejected = models.PositiveBigIntegerField(default=0)
+    pending_ranges = models.JSONField(default=list, help_text="[[first id, last id], ...] not yet applied")
+    dropped_indexes = models.JSONField(default=list, help_text="CREATE INDEX statements to run when loading ends")
+    done = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"{self.source} ({self.imported} readings{', done' if self.done else ''})"
+
+
+class SensorState(models.Model):
+    """Dernier état connu de chaque capteur, mis à jour à chaque ingestion"""
+
+    sensor_id = models.CharField(max_length=50, primary_key=True)
+    metrics = models.JSONField(default=dict, help_text="Latest metrics reported by this sensor")
+    last_reading = models.ForeignKey(
+        IoTData,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField(db_index=True)
+    reading_count = models.PositiveIntegerField(default=0)
+    overheating_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['sensor_id']
+
+    def status(self, now=None):
+        """online / stale / offline depending on the time since last_seen"""
+        from django.conf import settings
+        from django.utils import timezone
+
+        age = ((now or timezone.now()) - self.last_seen).total_seconds()
+        if age < getattr(settings, 'IOT_SENSOR_STALE_SECONDS', 60):
+            return 'online'
+        if age < getattr(settings, 'IOT_SENSOR_OFFLINE_SECONDS', 300):
+            return 'stale'
+        return 'offline'
+
+    def __str__(self):
+        return f"{self.sensor_id} ({self.reading_count} readings)"
+
+
 class QuizQuestion(models.Model):
     """Model for storing quiz questions in the database"""
     
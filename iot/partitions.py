@@ -0,0 +1,311 @@
+"""
+Partitionnement temporel d'IoTData.
+
+``iot_iotdata`` is the live partition: every insert lands there, since
+``created_at`` is set at insert time. Completed periods (one per month by
+default, see ``IOT_PARTITION_PERIOD``) are rotated out into tables named
+``iot_iotdata_p<YYYYMM>`` (or ``p<YYYYMMDD>`` with daily periods):
+
+* the live table is renamed, which costs nothing whatever its size, and
+  an empty one is created in its place;
+* rows of the current period written before the rotation are copied back;
+* the renamed table becomes the partition and gets its own indexes.
+
+Reads go through ``querysets()`` / ``models_for_range()``, which only
+return the partitions overlapping the requested time range, and dropping
+expired data is a ``DROP TABLE`` (``drop_partition``). SQLite only: on
+other backends rotation is a no-op and everything stays in the live table.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import connection, models
+from django.utils import timezone
+from .models import IoTData, SensorState, SENSOR_REF_FIELDS
+
+
+logger = logging.getLogger('iot.partitions')
+
+TABLE_PREFIX = f'{IoTData._meta.db_table}_p'
+STAGING_TABLE = f'{IoTData._meta.db_table}_rotating'
+
+KEY_FORMATS = {'month': '%Y%m', 'day': '%Y%m%d'}
+
+# Partition models live in their own registry: they are created at
+# runtime and must stay invisible to migrations and system checks
+partition_apps = Apps()
+_models = {}
+
+# (schema_version, [Partition]) of the last introspection
+_partitions_cache = (None, [])
+
+
+class Partition:
+    """Table d'une période close : [start, end)"""
+
+    def __init__(self, key):
+        self.key = key
+        self.table = f'{TABLE_PREFIX}{key}'
+        fmt = KEY_FORMATS['day'] if len(key) == 8 else KEY_FORMATS['month']
+        self.start = datetime.strptime(key, fmt).replace(tzinfo=dt_timezone.utc)
+        self.end = next_period(self.start, 'day' if len(key) == 8 else 'month')
+
+    @property
+    def model(self):
+        return table_model(self.table)
+
+    def overlaps(self, start=None, end=None):
+        return (start is None or self.end > start) and (end is None or self.start < end)
+
+    def __repr__(self):
+        return f'<Partition {self.table} [{self.start:%Y-%m-%d}, {self.end:%Y-%m-%d})>'
+
+
+def get_period():
+    return getattr(settings, 'IOT_PARTITION_PERIOD', 'month')
+
+
+def period_start(value, period=None):
+    value = value.astimezone(dt_timezone.utc)
+    if (period or get_period()) == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start, period=None):
+    if (period or get_period()) == 'day':
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def table_model(table):
+    """Unmanaged model with the IoTData fields, bound to another table"""
+    if table not in _models:
+        attrs = {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {
+                'app_label': 'iot',
+                'db_table': table,
+                'managed': False,
+                'apps': partition_apps,
+            }),
+        }
+        for field in IoTData._meta.local_fields:
+            attrs[field.name] = field.clone()
+            if field.is_relation:
+                # The (ref, created_at) indexes of the partition cover the FKs
+                attrs[field.name].db_index = False
+                if field.related_model._meta.model_name not in partition_apps.all_models['iot']:
+                    # Lookup tables are shared with the main registry
+                    partition_apps.register_model('iot', field.related_model)
+        # Interned string views (hardware_sensor_id, os, recommendations...)
+        for name, value in vars(IoTData).items():
+            if isinstance(value, property):
+                attrs[name] = value
+        name = 'IoTData' + ''.join(part.capitalize() for part in table.split('_')[2:])
+        _models[table] = type(name, (models.Model,), attrs)
+    return _models[table]
+
+
+def list_partitions():
+    """Closed partitions, oldest first (re-read whenever the schema changes)"""
+    global _partitions_cache
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA schema_version')
+        version = cursor.fetchone()[0]
+        if _partitions_cache[0] == version:
+            return _partitions_cache[1]
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s",
+            [f'{TABLE_PREFIX}%'],
+        )
+        keys = [name[len(TABLE_PREFIX):] for (name,) in cursor.fetchall()]
+    partitions = sorted((Partition(key) for key in keys if key.isdigit()), key=lambda p: p.start)
+    _partitions_cache = (version, partitions)
+    return partitions
+
+
+def models_for_range(start=None, end=None, newest_first=False):
+    """Models of the partitions overlapping [start, end), live table included"""
+    found = [p.model for p in list_partitions() if p.overlaps(start, end)] + [IoTData]
+    return found[::-1] if newest_first else found
+
+
+def querysets(start=None, end=None, newest_first=False):
+    """One queryset per partition, already restricted to [start, end)"""
+    bounds = {}
+    if start is not None:
+        bounds['created_at__gte'] = start
+    if end is not None:
+        bounds['created_at__lt'] = end
+    return [model.objects.filter(**bounds) for model in models_for_range(start, end, newest_first)]
+
+
+def latest_reading():
+    """Most recent reading, whichever partition holds it"""
+    for model in models_for_range(newest_first=True):
+        reading = model.objects.order_by('-created_at').first()
+        if reading is not None:
+            return reading
+    return None
+
+
+class PartitionedRows:
+    """
+    Concaténation paginable de querysets (Paginator-compatible).
+    Counts are taken once per partition; a slice only queries the
+    partitions it actually spans.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = list(querysets)
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [qs.count() for qs in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self.count())
+        rows, offset = [], 0
+        for queryset, size in zip(self.querysets, self.counts()):
+            if offset + size > start and offset < stop:
+                rows.extend(queryset[max(start - offset, 0):stop - offset])
+            offset += size
+            if offset >= stop:
+                break
+        return rows
+
+
+def partition_indexes(table):
+    """(name, columns) of the indexes of a partition table"""
+    indexes = [(f'{table}_created', ['created_at'])]
+    for ref_field in SENSOR_REF_FIELDS.values():
+        column = IoTData._meta.get_field(ref_field).column
+        indexes.append((f'{table}_{column}_time', [column, 'created_at']))
+    return indexes
+
+
+def create_partition_indexes(editor, table):
+    quote = editor.quote_name
+    for name, columns in partition_indexes(table):
+        editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} '
+            f'({", ".join(quote(c) for c in columns)})'
+        )
+
+
+def rotate(now=None):
+    """
+    Move completed periods out of the live table into their partitions.
+    Returns the keys of the partitions written (empty if nothing to do).
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    period = get_period()
+    boundary = period_start(now or timezone.now(), period)
+    oldest = IoTData.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if oldest is None or oldest >= boundary:
+        return []
+
+    live = IoTData._meta.db_table
+    columns = [field.column for field in IoTData._meta.local_fields]
+    written = []
+    # Keep foreign keys of other tables pointing at the live table name
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA legacy_alter_table = ON')
+    try:
+        with connection.schema_editor() as editor:
+            quote = editor.quote_name
+            column_list = ', '.join(quote(c) for c in columns)
+            adapt = connection.ops.adapt_datetimefield_value
+
+            editor.execute(f'ALTER TABLE {quote(live)} RENAME TO {quote(STAGING_TABLE)}')
+            # Index names are global: free them for the new live table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                    [STAGING_TABLE],
+                )
+                for (name,) in cursor.fetchall():
+                    editor.execute(f'DROP INDEX {quote(name)}')
+            editor.create_model(IoTData)
+            # Ids keep increasing across partitions
+            editor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) '
+                'SELECT %s, seq FROM sqlite_sequence WHERE name = %s',
+                [live, STAGING_TABLE],
+            )
+            editor.execute(
+                f'INSERT INTO {quote(live)} ({column_list}) SELECT {column_list} '
+                f'FROM {quote(STAGING_TABLE)} WHERE created_at >= %s',
+                [adapt(boundary)],
+            )
+            editor.execute(f'DELETE FROM {quote(STAGING_TABLE)} WHERE created_at >= %s', [adapt(boundary)])
+
+            existing = {p.key for p in list_partitions()}
+            staged = table_model(STAGING_TABLE).objects
+            start = period_start(oldest, period)
+            periods = []
+            while start < boundary:
+                end = next_period(start, period)
+                if staged.filter(created_at__gte=start, created_at__lt=end).exists():
+                    periods.append((start, end))
+                start = end
+
+            for start, end in periods:
+                key = start.strftime(KEY_FORMATS[period])
+                table = f'{TABLE_PREFIX}{key}'
+                if len(periods) == 1 and key not in existing:
+                    editor.execute(f'ALTER TABLE {quote(STAGING_TABLE)} RENAME TO {quote(table)}')
+                else:
+                    if key not in existing:
+                        editor.create_model(table_model(table))
+                    editor.execute(
+                        f'INSERT INTO {quote(table)} ({column_list}) SELECT {column_list} '
+                        f'FROM {quote(STAGING_TABLE)} WHERE created_at >= %s AND created_at < %s',
+                        [adapt(start), adapt(end)],
+                    )
+                create_partition_indexes(editor, table)
+                written.append(key)
+            editor.execute(f'DROP TABLE IF EXISTS {quote(STAGING_TABLE)}')
+
+            # Readings that left the live table are no longer valid FK targets
+            SensorState.objects.exclude(last_reading__isnull=True).exclude(
+                last_reading_id__in=IoTData.objects.values('id')
+            ).update(last_reading=None)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA legacy_alter_table = OFF')
+
+    logger.info('Rotated IoTData into partitions %s', written)
+    return written
+
+
+def drop_partition(partition):
+    """Delete a whole period at once"""
+    with connection.schema_editor() as editor:
+        editor.execute(f'DROP TABLE {editor.quote_name(partition.table)}')
+    logger.info('Dropped partition %s', partition.table)
+
+
+def drop_partitions_before(cutoff):
+    """Drop every partition entirely older than cutoff, returns their keys"""
+    dropped = []
+    for partition in list_partitions():
+        if partition.end <= cutoff:
+            drop_partition(partition)
+            dropped.append(partition.key)
+    return dropped
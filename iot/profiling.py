@@ -0,0 +1,155 @@
+"""
+Profileur statistique par échantillonnage, activable à chaud.
+
+A background thread periodically samples ``sys._current_frames()`` and
+counts collapsed stacks (``frame;frame;frame count``), the input format of
+flamegraph.pl / speedscope. Only stacks that go through one of the focus
+modules (ingest view, data builders, consumers by default) are kept.
+
+Nothing runs while the profiler is stopped: no thread, no trace hook.
+It can be toggled with ``IOT_PROFILER_SIGNAL`` (e.g. ``kill -USR2 <pid>``)
+or through the staff-only ``/api/metrics/profiler/`` endpoint.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+
+
+DEFAULT_FOCUS = (
+    'iot.views.api_views',
+    'iot.data_utils',
+    'iot.consumers',
+)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{code.co_name}:{frame.f_lineno}'
+
+
+class SamplingProfiler:
+    """Échantillonne les piles de tous les threads à intervalle fixe"""
+
+    def __init__(self, interval=0.005, focus=DEFAULT_FOCUS, output_dir=None):
+        self.interval = interval
+        self.focus = tuple(focus or ())
+        self.output_dir = output_dir
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _in_focus(self, frames):
+        if not self.focus:
+            return True
+        return any(f.f_globals.get('__name__', '').startswith(self.focus) for f in frames)
+
+    def sample(self):
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            if not self._in_focus(frames):
+                continue
+            stack = ';'.join(frame_label(f) for f in reversed(frames))
+            self.samples[stack] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return False
+            self.samples = Counter()
+            self.sample_count = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='iot-sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop sampling and write the collapsed stacks, returns the file path"""
+        with self._lock:
+            if not self.running:
+                return None
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            return self.dump()
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common())
+
+    def dump(self):
+        output_dir = self.output_dir or getattr(settings, 'IOT_PROFILE_DIR', 'profiles')
+        os.makedirs(output_dir, exist_ok=True)
+        filename = time.strftime('profile-%Y%m%d-%H%M%S.folded', time.localtime(self.started_at))
+        path = os.path.join(output_dir, filename)
+        with open(path, 'w') as f:
+            f.write(self.collapsed() + '\n')
+        return path
+
+    def status(self):
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'focus': list(self.focus),
+            'started_at': self.started_at,
+            'samples': self.sample_count,
+            'distinct_stacks': len(self.samples),
+        }
+
+
+_profiler = None
+
+
+def get_profiler():
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(
+            interval=getattr(settings, 'IOT_PROFILER_INTERVAL_MS', 5) / 1000,
+            focus=getattr(settings, 'IOT_PROFILER_FOCUS', DEFAULT_FOCUS),
+        )
+    return _profiler
+
+
+def toggle():
+    """Start the profiler, or stop it and return the written file"""
+    profiler = get_profiler()
+    if profiler.running:
+        return profiler.stop()
+    profiler.start()
+    return None
+
+
+def _handle_signal(signum, frame):
+    # Sampling and file writes happen off the signal handler
+    threading.Thread(target=toggle, daemon=True).start()
+
+
+def install_signal_handler():
+    """Toggle the profiler on IOT_PROFILER_SIGNAL (main thread only)"""
+    signal_name = getattr(settings, 'IOT_PROFILER_SIGNAL', None)
+    if not signal_name or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(getattr(signal, signal_name), _handle_signal)
+    return True
@@ -0,0 +1,70 @@
+"""
+Couche de requêtes par projection.
+
+Pages and APIs declare the fields they need; only those columns are
+fetched with ``values_list`` and rows come back as plain dicts, without
+building ``IoTData`` instances. Interned columns (sensor ids, OS,
+recommendations) are decoded through the in-process lookup caches.
+"""
+from .models import IoTData, OperatingSystem, RecommendationSet, SensorIdentifier
+from . import partitions
+
+
+# Logical field -> (stored column, decoder)
+DECODED_FIELDS = {
+    'hardware_sensor_id': ('hardware_sensor_ref_id', SensorIdentifier.name_for),
+    'energy_sensor_id': ('energy_sensor_ref_id', SensorIdentifier.name_for),
+    'network_sensor_id': ('network_sensor_ref_id', SensorIdentifier.name_for),
+    'os': ('os_ref_id', OperatingSystem.name_for),
+    'recommendations': ('recommendations_ref_id', RecommendationSet.document_for),
+}
+
+
+class Projection:
+    """Ensemble de champs IoTData lus sous forme de tuples"""
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.columns = [DECODED_FIELDS[f][0] if f in DECODED_FIELDS else f for f in self.fields]
+        self.decoders = [
+            (index, DECODED_FIELDS[field][1])
+            for index, field in enumerate(self.fields)
+            if field in DECODED_FIELDS
+        ]
+
+    def values_list(self, queryset=None):
+        """Queryset yielding the raw (undecoded) column tuples"""
+        if queryset is None:
+            queryset = IoTData.objects.all()
+        return queryset.values_list(*self.columns)
+
+    def decode(self, row):
+        """Raw column tuple -> {field: value} with interned columns resolved"""
+        if self.decoders:
+            row = list(row)
+            for index, decoder in self.decoders:
+                row[index] = decoder(row[index])
+        return dict(zip(self.fields, row))
+
+    def fetch(self, queryset=None):
+        return [self.decode(row) for row in self.values_list(queryset)]
+
+    def latest(self, limit=8):
+        """Newest readings first, served by the created_at index of each partition"""
+        rows = []
+        for model in partitions.models_for_range(newest_first=True):
+            rows.extend(self.values_list(model.objects.order_by('-created_at'))[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+        return [self.decode(row) for row in rows]
+
+
+def serialize_rows(rows, fields=None):
+    """JSON-ready copies of projected rows (datetimes as ISO 8601)"""
+    serialized = []
+    for row in rows:
+        item = {field: row[field] for field in (fields or row)}
+        if 'created_at' in item:
+            item['created_at'] = item['created_at'].isoformat()
+        serialized.append(item)
+    return serialized
@@ -0,0 +1,190 @@
+"""
+Recommandations générées côté serveur pour la page scores.
+
+Readings whose sender does not provide ``recommendations`` get a
+document derived from their metrics, in the same {eco, obsolescence,
+dependency} shape Node-RED sends. Advice only depends on a few bucketed
+features (age band, CPU band, battery band, Windows 11 compatibility,
+watts per device, overheating, cloud dependency), so documents are
+memoized per feature tuple in an LRU cache (IOT_RECOMMENDATIONS_CACHE_SIZE)
+and most readings never evaluate the rules again. ``stats()`` reports
+the cache hit rate (/api/metrics/recommendations/).
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+
+# Reading fields the features are computed from
+FEATURE_FIELDS = (
+    'age_years', 'cpu_usage', 'battery_health', 'win11_compat',
+    'power_watts', 'active_devices', 'overheating', 'cloud_dependency_score',
+)
+
+# Band edges: band i covers [edges[i-1], edges[i])
+AGE_BANDS = (2, 4, 6)                # years
+CPU_BANDS = (20, 60, 85)             # %
+BATTERY_BANDS = (50, 80)             # % health
+WATTS_BANDS = (15, 30, 50)           # watts per active device
+CLOUD_BANDS = (40, 70)               # cloud dependency score
+
+Features = namedtuple('Features', 'age cpu battery win11 watts overheating cloud')
+
+
+def get_cache_size():
+    return getattr(settings, 'IOT_RECOMMENDATIONS_CACHE_SIZE', 4096)
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def band(value, edges):
+    return bisect_right(edges, _number(value))
+
+
+def features(row):
+    """Bucketed features of a reading (dict with FEATURE_FIELDS)"""
+    devices = max(_number(row.get('active_devices')), 1)
+    return Features(
+        age=band(row.get('age_years'), AGE_BANDS),
+        cpu=band(row.get('cpu_usage'), CPU_BANDS),
+        battery=band(row.get('battery_health'), BATTERY_BANDS),
+        win11=bool(row.get('win11_compat')),
+        watts=band(_number(row.get('power_watts')) / devices, WATTS_BANDS),
+        overheating=_number(row.get('overheating')) > 0,
+        cloud=band(row.get('cloud_dependency_score'), CLOUD_BANDS),
+    )
+
+
+def features_many(columns):
+    """features() of a batch: ``columns`` maps FEATURE_FIELDS to numeric sequences"""
+    c = {field: np.asarray(columns[field], dtype=np.float64) for field in FEATURE_FIELDS}
+    devices = np.maximum(c['active_devices'], 1)
+    bands = [
+        (np.searchsorted(AGE_BANDS, c['age_years'], side='right'), len(AGE_BANDS) + 1),
+        (np.searchsorted(CPU_BANDS, c['cpu_usage'], side='right'), len(CPU_BANDS) + 1),
+        (np.searchsorted(BATTERY_BANDS, c['battery_health'], side='right'), len(BATTERY_BANDS) + 1),
+        (c['win11_compat'] != 0, 2),
+        (np.searchsorted(WATTS_BANDS, c['power_watts'] / devices, side='right'), len(WATTS_BANDS) + 1),
+        (c['overheating'] > 0, 2),
+        (np.searchsorted(CLOUD_BANDS, c['cloud_dependency_score'], side='right'), len(CLOUD_BANDS) + 1),
+    ]
+    # One integer per feature tuple, one Features per distinct value
+    codes = np.zeros(len(devices), dtype=np.int64)
+    for values, size in bands:
+        codes = codes * size + values
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    tuples = []
+    for code in distinct.tolist():
+        values = []
+        for _, size in reversed(bands):
+            code, value = divmod(code, size)
+            values.append(value)
+        age, cpu, battery, win11, watts, overheating, cloud = reversed(values)
+        tuples.append(Features(age, cpu, battery, bool(win11), watts, bool(overheating), cloud))
+    return [tuples[i] for i in inverse.tolist()]
+
+
+# ==================== RULES ====================
+
+def eco_advice(f):
+    if f.watts >= 3:
+        advice = ["🔴 Impact énergétique élevé. Réduire les appareils actifs et les pics de charge."]
+    elif f.watts >= 1:
+        advice = ["🟠 Consommation modérée. Optimiser l'utilisation réseau et éviter la surchauffe."]
+    else:
+        advice = ["🟢 Consommation maîtrisée."]
+    if f.overheating:
+        advice.append("Surchauffe détectée : vérifier la ventilation et dépoussiérer.")
+    if f.cpu == 0:
+        advice.append("CPU presque inactif : activer la mise en veille automatique.")
+    elif f.cpu == 3:
+        advice.append("CPU saturé : identifier les processus gourmands avant d'envisager un remplacement.")
+    return ' '.join(advice)
+
+
+def obsolescence_advice(f):
+    if f.age >= 3 or f.battery == 0:
+        advice = ["🔥 Matériel très obsolète. Risque élevé de panne ou de remplacement imposé."]
+    elif f.age == 2 or f.battery == 1:
+        advice = ["⚠️ Défaillances futures probables. Prévoir l'entretien plutôt qu'un remplacement."]
+    else:
+        advice = ["🟢 Matériel en état acceptable."]
+    if f.battery == 0:
+        advice.append("Batterie dégradée : la remplacer prolonge la vie de l'appareil.")
+    if not f.win11:
+        advice.append("Non compatible Windows 11 : migrer vers Linux pour prolonger la vie du matériel.")
+    return ' '.join(advice)
+
+
+def dependency_advice(f):
+    if f.cloud >= 2:
+        return "🟥 Forte dépendance aux plateformes Big Tech. Risque de lock-in et coûts élevés."
+    if f.cloud == 1:
+        return "🟨 Dépendance notable. Utiliser davantage d'outils open-source."
+    return "🟩 Faible dépendance : continuer à privilégier les outils libres et l'hébergement local."
+
+
+def _advise(key):
+    return {
+        'eco': eco_advice(key),
+        'obsolescence': obsolescence_advice(key),
+        'dependency': dependency_advice(key),
+    }
+
+
+# Built on first use so IOT_RECOMMENDATIONS_CACHE_SIZE is read from settings
+_cache = None
+
+
+def _cached():
+    global _cache
+    if _cache is None:
+        _cache = lru_cache(maxsize=get_cache_size())(_advise)
+    return _cache
+
+
+def advise(key):
+    """
+    Document of a feature tuple, from the LRU cache.
+    The returned dict is shared between callers and must not be mutated.
+    """
+    return _cached()(key)
+
+
+def for_reading(row):
+    """Recommendations document of one reading"""
+    return advise(features(row))
+
+
+def apply_recommendations(rows):
+    """Fill the recommendations of IoTData field dicts that have none"""
+    for row in rows:
+        if not row.get('recommendations'):
+            row['recommendations'] = for_reading(row)
+    return rows
+
+
+def stats():
+    """Hit / miss counters of the LRU cache"""
+    info = _cached().cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 4) if lookups else None,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+    }
+
+
+def reset():
+    """Empty the cache and its counters"""
+    _cached().cache_clear()
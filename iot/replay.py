@@ -0,0 +1,239 @@
+"""
+Rejeu de trafic d'ingestion capturé (manage.py replay_iot).
+
+Reads a capture (NDJSON: sensor payloads, or captured requests with the
+payload in ``body`` / ``payload``, as accepted by import_iot) and plays it
+back with many concurrent senders:
+- over HTTP, one POST /api/iot-data/ per reading (keep-alive connection
+  per sender);
+- or in process through the live ingest pipeline (``ingest.store_payloads``:
+  one INSERT and one broadcast per ``batch_size`` readings, sensor states,
+  sketches, anomalies and alert rules as on the server), without HTTP.
+
+Readings keep their captured spacing (``received_at`` / ``created_at`` of
+the capture, else the payload's, else the hardware timestamp), divided by
+``speed``; ``speed=0`` sends as fast as the senders can. Each send is
+timed: the report gives throughput, errors and latency percentiles, plus
+how late sends started against the schedule (senders saturated).
+"""
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from . import importer, ingest
+
+MODES = ('http', 'batch')
+DEFAULT_URL = 'http://127.0.0.1:8000/api/iot-data/'
+DEFAULT_SENDERS = 16
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_TIMEOUT = 10
+PERCENTILES = (50, 90, 99, 99.9)
+# Captured requests that are not ingest calls are skipped
+INGEST_PATH = '/api/iot-data/'
+
+
+def _capture_time(record, payload):
+    for key in importer.CAPTURE_TIME_KEYS:
+        for source in (record, payload):
+            if source.get(key):
+                return importer.to_epoch(source[key])
+    timestamp = ingest.build_iot_data_fields(payload)['hardware_timestamp']
+    return importer.to_epoch(timestamp) if timestamp else None
+
+
+def load(path, limit=None):
+    """
+    (seconds since the first reading, JSON body) of every ingest payload
+    of a capture, in time order. Readings without any time keep the one
+    of the previous reading.
+    """
+    readings = []
+    last = None
+    with open(path, 'rb') as handle:
+        for line in handle:
+            if limit is not None and len(readings) >= limit:
+                break
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if record.get('method', 'POST') != 'POST' or record.get('path', INGEST_PATH) != INGEST_PATH:
+                    continue
+                payload = importer.unwrap(dict(record))
+                moment = _capture_time(record, payload)
+            except (ValueError, TypeError, AttributeError, OverflowError):
+                continue
+            if not isinstance(payload, dict):
+                continue
+            payload.pop('created_at', None)
+            last = moment if moment is not None else last
+            readings.append((last, json.dumps(payload).encode()))
+    first = min((moment for moment, _ in readings if moment is not None), default=0)
+    readings = [(moment - first if moment is not None else 0.0, body) for moment, body in readings]
+    readings.sort(key=lambda reading: reading[0])
+    return readings
+
+
+class HttpSender:
+    """POST one JSON body per send over a keep-alive connection"""
+
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host, self.port = parts.hostname, parts.port
+        self.path = parts.path + (f'?{parts.query}' if parts.query else '')
+        self.timeout = timeout
+        self.connection = None
+
+    def __call__(self, bodies):
+        """(error label or None, readings failed)"""
+        for retry in (True, False):
+            reused = self.connection is not None
+            if not reused:
+                self.connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request('POST', self.path, bodies[0], {'Content-Type': 'application/json'})
+                response = self.connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                # The server may close an idle keep-alive connection: reconnect once
+                if retry and reused and isinstance(e, (http.client.RemoteDisconnected, ConnectionError)):
+                    continue
+                return type(e).__name__, 1
+            if response.will_close:
+                self.close()
+            return (None, 0) if 200 <= response.status < 300 else (f'HTTP {response.status}', 1)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class BatchSender:
+    """Store the bodies of one send through the live ingest pipeline, in process"""
+
+    # SQLite has one writer: concurrent senders would fail with "database
+    # is locked" instead of queueing as the server's writers do
+    sqlite_lock = threading.Lock()
+
+    def __call__(self, bodies):
+        """(error label or None, readings failed)"""
+        from django.db import connection
+
+        lock = self.sqlite_lock if connection.vendor == 'sqlite' else nullcontext()
+        with lock:
+            _, failures = ingest.store_payloads([json.loads(body) for body in bodies])
+        if not failures:
+            return None, 0
+        error = next(iter(failures.values()))
+        return f'{type(error).__name__}: {error}'[:120], len(failures)
+
+    def close(self):
+        from django.db import connection
+
+        connection.close()
+
+
+def schedule(readings, per_send=1, speed=1.0):
+    """(due offset in seconds, bodies) of each send: the last reading of a group is due"""
+    sends = []
+    for start in range(0, len(readings), per_send):
+        group = readings[start:start + per_send]
+        sends.append((group[-1][0] / speed if speed else 0.0, [body for _, body in group]))
+    return sends
+
+
+def run(sends, make_sender, senders=DEFAULT_SENDERS, progress=None):
+    """
+    Play sends with ``senders`` threads, each taking the next send and
+    waiting for its due time. Returns the report (see summarize).
+    """
+    pending = iter(sends)
+    lock = threading.Lock()
+    latencies, lags, errors = [], [], Counter()
+    counts = {'readings': 0, 'failed': 0}
+    started = time.perf_counter()
+
+    def sender():
+        send = make_sender()
+        try:
+            while True:
+                with lock:
+                    item = next(pending, None)
+                if item is None:
+                    return
+                due, bodies = item
+                delay = started + due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                began = time.perf_counter()
+                error, failed = send(bodies)
+                ended = time.perf_counter()
+                with lock:
+                    latencies.append(ended - began)
+                    lags.append(max(0.0, began - started - due))
+                    counts['readings'] += len(bodies)
+                    counts['failed'] += failed
+                    if error:
+                        errors[error] += failed
+        finally:
+            send.close()
+
+    threads = [threading.Thread(target=sender, name=f'replay-{i}', daemon=True) for i in range(senders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(timeout=1)
+            if not progress:
+                continue
+            with lock:
+                report = summarize(latencies, lags, errors, counts, time.perf_counter() - started)
+            progress(dict(report, fraction=report['sends'] / len(sends) if sends else 1))
+    return summarize(latencies, lags, errors, counts, time.perf_counter() - started)
+
+
+def summarize(latencies, lags, errors, counts, seconds):
+    """Throughput, errors, latency and schedule lag percentiles (ms)"""
+    def percentiles(values):
+        if not values:
+            return {}
+        return dict(zip(PERCENTILES, (np.percentile(np.asarray(values), PERCENTILES) * 1000).tolist()),
+                    max=max(values) * 1000)
+
+    return {
+        'sends': len(latencies),
+        'readings': counts['readings'],
+        'failed': counts['failed'],
+        'errors': dict(errors.most_common()),
+        'seconds': seconds,
+        'readings_per_second': counts['readings'] / seconds if seconds else 0,
+        'sends_per_second': len(latencies) / seconds if seconds else 0,
+        'latency_ms': percentiles(latencies),
+        'lag_ms': percentiles(lags),
+    }
+
+
+def replay(path, mode='http', url=DEFAULT_URL, speed=1.0, senders=DEFAULT_SENDERS,
+           batch_size=DEFAULT_BATCH_SIZE, limit=None, timeout=DEFAULT_TIMEOUT, progress=None):
+    """Load a capture and play it back; returns the report with the captured span"""
+    if mode not in MODES:
+        raise ValueError(f'Unknown mode: {mode}')
+    readings = load(path, limit)
+    if mode == 'http':
+        sends = schedule(readings, 1, speed)
+        make_sender = lambda: HttpSender(url, timeout)  # noqa: E731
+    else:
+        sends = schedule(readings, batch_size, speed)
+        make_sender = BatchSender
+    report = run(sends, make_sender, senders, progress)
+    report['captured_seconds'] = readings[-1][0] if readings else 0
+    return report
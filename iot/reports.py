@@ -0,0 +1,418 @@
+"""
+Rapports journaliers et mensuels (CO2, puissance, scores) par capteur et
+pour la flotte, calculés hors ligne.
+
+``manage.py generate_reports`` splits [start, end) into day chunks (and
+optionally the sensors into groups), computes mergeable partial
+aggregates (count, sum, min, max per day, sensor and metric) for each
+chunk in a ProcessPoolExecutor, merges them, derives the monthly reports
+from the daily partials and stores the result as Report rows: the API
+only reads finished reports.
+
+Workers read the raw readings (archive + time partitions) over their own
+read-only database connection, or a columnar snapshot (memory-mapped).
+This module imports no model at load time so spawned workers can
+unpickle its functions before Django is set up.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+
+
+DEFAULT_METRICS = ('power_watts', 'co2_equiv_g', 'eco_score', 'obsolescence_score',
+                   'bigtech_dependency', 'co2_savings_kg_year')
+PERIODS = ('day', 'month')
+
+# Sensor code of the fleet-wide partials (SensorIdentifier ids start at 1)
+FLEET = 0
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Time window and sensor ids (None: every sensor) of one unit of work
+Chunk = namedtuple('Chunk', 'start end sensors')
+
+
+def get_metrics():
+    return tuple(getattr(settings, 'IOT_REPORT_METRICS', DEFAULT_METRICS))
+
+
+def get_workers():
+    return getattr(settings, 'IOT_REPORT_WORKERS', None) or os.cpu_count() or 1
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return month_start(month_start(value) + timedelta(days=32))
+
+
+def period_end(period, start):
+    return start + timedelta(days=1) if period == 'day' else next_month(start)
+
+
+def ref_columns(metrics):
+    """{metric: stored sensor column} of the family of each metric"""
+    from .models import METRIC_FAMILIES, SENSOR_REF_FIELDS
+
+    unknown = [metric for metric in metrics if metric not in METRIC_FAMILIES]
+    if unknown:
+        raise ValueError(f"Unknown metric(s): {', '.join(unknown)}")
+    return {metric: f'{SENSOR_REF_FIELDS[METRIC_FAMILIES[metric]]}_id' for metric in metrics}
+
+
+# ==================== PARTIAL AGGREGATES ====================
+
+def _reduce(keys, values):
+    """Group values by key: (keys, counts, sums, mins, maxs)"""
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return (
+        keys[starts],
+        np.diff(np.r_[starts, len(keys)]),
+        np.add.reduceat(values, starts),
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+    )
+
+
+def partial_aggregates(times, refs, values, sensors=None):
+    """
+    Partial aggregates of a chunk.
+    ``times`` is datetime64[us], ``refs`` / ``values`` map each metric to
+    its sensor codes / float values; only sensors in ``sensors`` (all if
+    None) are counted, fleet included, so chunks never overlap.
+    Returns {(day number, sensor code or FLEET): {metric: [count, sum, min, max]}}.
+    """
+    partial = {}
+    if not len(times):
+        return partial
+    days = times.astype('datetime64[D]').astype(np.int64)
+    for metric, metric_values in values.items():
+        codes = refs[metric].astype(np.int64)
+        keep = ~np.isnan(metric_values)
+        if sensors is not None:
+            keep &= np.isin(codes, sensors)
+        metric_days, codes, metric_values = days[keep], codes[keep], metric_values[keep]
+        if not len(metric_values):
+            continue
+        width = int(codes.max()) + 1
+        groups = [
+            (lambda key: (key // width, key % width), metric_days * width + codes),
+            (lambda key: (key, FLEET), metric_days),
+        ]
+        for split, keys in groups:
+            for key, count, total, low, high in zip(*(column.tolist() for column in _reduce(keys, metric_values))):
+                partial.setdefault(split(key), {})[metric] = [count, total, low, high]
+    return partial
+
+
+def merge_partials(target, partial):
+    """Merge a partial into target (in place) and return target"""
+    for key, metrics in partial.items():
+        into = target.setdefault(key, {})
+        for metric, (count, total, low, high) in metrics.items():
+            if metric in into:
+                current = into[metric]
+                into[metric] = [current[0] + count, current[1] + total, min(current[2], low), max(current[3], high)]
+            else:
+                into[metric] = [count, total, low, high]
+    return target
+
+
+def _naive_us(value):
+    return np.datetime64(value.astimezone(dt_timezone.utc).replace(tzinfo=None), 'us')
+
+
+# ==================== WORKERS ====================
+
+def _read_only(sender, connection, **kwargs):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA query_only = ON')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY')
+
+
+def init_worker():
+    """Pool initializer: set Django up if needed, read-only connections"""
+    import django
+    from django.apps import apps
+    from django.db.backends.signals import connection_created
+
+    if not apps.ready:
+        django.setup()
+    connection_created.connect(_read_only)
+
+
+def db_chunk(chunk, metrics):
+    """Partial aggregates of a chunk read from the database: (partial, rows)"""
+    from django.db.models import Q
+    from . import archive, partitions
+
+    refs = ref_columns(metrics)
+    columns = ['created_at', *sorted(set(refs.values())), *metrics]
+    where = None
+    if chunk.sensors is not None:
+        where = Q()
+        for ref in set(refs.values()):
+            where |= Q(**{f'{ref}__in': chunk.sensors})
+
+    rows = list(archive.iter_rows(columns, chunk.start, chunk.end, where=where))
+    for queryset in partitions.querysets(chunk.start, chunk.end):
+        if where is not None:
+            queryset = queryset.filter(where)
+        rows.extend(queryset.values_list(*columns))
+    if not rows:
+        return {}, 0
+
+    data = dict(zip(columns, zip(*rows)))
+    times = np.array([_naive_us(value) for value in data['created_at']], dtype='datetime64[us]')
+    partial = partial_aggregates(
+        times,
+        {metric: np.array(data[refs[metric]], dtype=np.int64) for metric in metrics},
+        {metric: np.array(data[metric], dtype=np.float64) for metric in metrics},
+        np.array(chunk.sensors) if chunk.sensors is not None else None,
+    )
+    if chunk.sensors is None:
+        return partial, len(rows)
+    owned = _owned_rows([
+        np.array([value or 0 for value in data[ref]], dtype=np.int64) for ref in sorted(set(refs.values()))
+    ], chunk.sensors)
+    return partial, owned
+
+
+def _owned_rows(refs, sensors):
+    """
+    Rows a sensor-group chunk counts as read. A row whose sensors fall in
+    several groups is read by each of them; it is counted once, by the
+    group of its first sensor (refs: one id array per sensor column, 0
+    for none).
+    """
+    owners = np.zeros(len(refs[0]), dtype=np.int64)
+    for values in reversed(refs):
+        owners = np.where(values > 0, values, owners)
+    return int(np.isin(owners, sensors).sum())
+
+
+def snapshot_chunk(path, chunk, metrics, sensor_columns):
+    """Partial aggregates of a chunk read from a columnar snapshot: (partial, rows)"""
+    from .snapshots import load_snapshot
+
+    snapshot = load_snapshot(path)
+    times = snapshot['created_at']
+    selected = np.flatnonzero((times >= _naive_us(chunk.start)) & (times < _naive_us(chunk.end)))
+    partial = partial_aggregates(
+        times[selected],
+        {metric: snapshot[sensor_columns[metric]][selected] for metric in metrics},
+        {metric: snapshot[metric][selected].astype(np.float64) for metric in metrics},
+        np.array(chunk.sensors) if chunk.sensors is not None else None,
+    )
+    if chunk.sensors is None:
+        return partial, len(selected)
+    return partial, _owned_rows(
+        [np.asarray(snapshot[column][selected]) for column in sorted(set(sensor_columns.values()))], chunk.sensors)
+
+
+# ==================== PLANNING ====================
+
+def plan_chunks(start, end, days_per_chunk=1, sensor_groups=1, sensors=()):
+    """Chunks covering [start, end): day windows x sensor groups"""
+    sensors = sorted(sensors)
+    groups = [None]
+    if sensor_groups > 1 and sensors:
+        groups = [tuple(sensors[i::sensor_groups]) for i in range(min(sensor_groups, len(sensors)))]
+    chunks = []
+    window = start
+    while window < end:
+        window_end = min(window + timedelta(days=days_per_chunk), end)
+        chunks.extend(Chunk(window, window_end, group) for group in groups)
+        window = window_end
+    return chunks
+
+
+def snapshot_sensor_columns(snapshot, metrics):
+    """{metric: snapshot sensor column}, checking the snapshot has every column"""
+    from .models import METRIC_FAMILIES, SENSOR_FIELDS
+
+    sensor_columns = {metric: SENSOR_FIELDS[METRIC_FAMILIES[metric]] for metric in metrics}
+    missing = sorted({'created_at', *sensor_columns.values(), *metrics} - set(snapshot.columns))
+    if missing:
+        raise ValueError(f"Snapshot lacks column(s): {', '.join(missing)}")
+    return sensor_columns
+
+
+def compute(start, end, metrics=None, workers=None, days_per_chunk=1, sensor_groups=1, snapshot=None):
+    """
+    Merged day partials of [start, end), chunks spread over ``workers``
+    processes (inline when 1). Returns (partials, rows read, chunk count).
+    """
+    from django.db import connections
+    from .models import SensorIdentifier
+    from .snapshots import load_snapshot
+
+    metrics = tuple(metrics or get_metrics())
+    ref_columns(metrics)
+    workers = workers or get_workers()
+
+    if snapshot:
+        loaded = load_snapshot(snapshot)
+        sensor_columns = snapshot_sensor_columns(loaded, metrics)
+        sensors = set()
+        for column in set(sensor_columns.values()):
+            sensors.update(loaded.categories(column))
+        task, args = snapshot_chunk, (snapshot,)
+        extra = (metrics, sensor_columns)
+    else:
+        sensors = SensorIdentifier.objects.values_list('pk', flat=True)
+        task, args, extra = db_chunk, (), (metrics,)
+
+    chunks = plan_chunks(start, end, days_per_chunk, sensor_groups, sensors)
+    partials, rows = {}, 0
+    if workers == 1:
+        results = (task(*args, chunk, *extra) for chunk in chunks)
+        for partial, count in results:
+            merge_partials(partials, partial)
+            rows += count
+        return partials, rows, len(chunks)
+
+    # Never hand an open connection over to forked workers
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [pool.submit(task, *args, chunk, *extra) for chunk in chunks]
+        for future in futures:
+            partial, count = future.result()
+            merge_partials(partials, partial)
+            rows += count
+    return partials, rows, len(chunks)
+
+
+# ==================== REPORTS ====================
+
+def finalize(metrics):
+    """[count, sum, min, max] -> JSON-ready {count, sum, min, max, mean}"""
+    return {
+        metric: {
+            'count': count,
+            'sum': round(total, 3),
+            'min': low,
+            'max': high,
+            'mean': round(total / count, 3),
+        }
+        for metric, (count, total, low, high) in sorted(metrics.items())
+    }
+
+
+def available_since():
+    """Time of the oldest raw reading still stored (archive or partitions)"""
+    from .models import ArchiveSegment
+    from . import partitions
+
+    candidates = [ArchiveSegment.objects.order_by('start_time').values_list('start_time', flat=True).first()]
+    for model in partitions.models_for_range():
+        oldest = model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if oldest is not None:
+            candidates.append(oldest)
+            break
+    candidates = [value for value in candidates if value is not None]
+    return min(candidates) if candidates else None
+
+
+def build_reports(partials, start, end, periods=PERIODS, covered_from=None):
+    """
+    Unsaved Report rows from merged day partials. A period is complete
+    when [start, end) covers it, from ``covered_from`` (oldest raw
+    reading) on.
+    """
+    from .models import Report
+
+    grouped = {period: {} for period in periods}
+    for (day, sensor), metrics in partials.items():
+        day_start = EPOCH + timedelta(days=day)
+        for period in periods:
+            key = (day_start if period == 'day' else month_start(day_start), sensor)
+            merge_partials(grouped[period], {key: metrics})
+
+    first = max(start, covered_from) if covered_from else start
+    reports = []
+    for period, groups in grouped.items():
+        for (period_start, sensor), metrics in groups.items():
+            reports.append(Report(
+                period=period,
+                period_start=period_start,
+                sensor_ref_id=None if sensor == FLEET else sensor,
+                metrics=finalize(metrics),
+                complete=first <= period_start and period_end(period, period_start) <= end,
+            ))
+    return reports
+
+
+def store_reports(reports):
+    """
+    Replace the stored reports of the same periods. An existing complete
+    report is never replaced by an incomplete one (expired raw data).
+    Returns (stored, kept).
+    """
+    from django.db import transaction
+    from .models import Report
+
+    key = lambda report: (report.period, report.period_start, report.sensor_ref_id)  # noqa: E731
+    stored, kept = [], 0
+    with transaction.atomic():
+        for period in {report.period for report in reports}:
+            batch = [report for report in reports if report.period == period]
+            existing = list(Report.objects.filter(period=period, period_start__in={r.period_start for r in batch}))
+            complete = {key(report) for report in existing if report.complete}
+            replace = [report for report in batch if report.complete or key(report) not in complete]
+            kept += len(batch) - len(replace)
+            replaced = {key(report) for report in replace}
+            Report.objects.filter(pk__in=[report.pk for report in existing if key(report) in replaced]).delete()
+            stored.extend(Report.objects.bulk_create(replace))
+    return len(stored), kept
+
+
+def generate(start, end, periods=PERIODS, **options):
+    """Compute, build and store the reports of [start, end)"""
+    partials, rows, chunks = compute(start, end, **options)
+    reports = build_reports(partials, start, end, periods, available_since())
+    stored, kept = store_reports(reports)
+    return {'rows': rows, 'chunks': chunks, 'stored': stored, 'kept': kept}
+
+
+def serialize_report(report):
+    return {
+        'period': report.period,
+        'period_start': report.period_start.isoformat(),
+        'sensor_id': report.sensor_id,
+        'complete': report.complete,
+        'generated_at': report.generated_at.isoformat(),
+        'metrics': report.metrics,
+    }
+
+
+def list_reports(period='day', sensor_id=None, start=None, end=None, limit=100):
+    """Stored reports, newest first; sensor_id None gives the fleet reports"""
+    from .models import Report, SensorIdentifier
+
+    if period not in PERIODS:
+        raise ValueError(f'Unknown period: {period}')
+    reports = Report.objects.filter(period=period)
+    if sensor_id is None:
+        reports = reports.filter(sensor_ref__isnull=True)
+    else:
+        reports = reports.filter(sensor_ref_id=SensorIdentifier.lookup(sensor_id) or -1)
+    if start is not None:
+        reports = reports.filter(period_start__gte=start)
+    if end is not None:
+        reports = reports.filter(period_start__lt=end)
+    return {
+        'period': period,
+        'sensor_id': sensor_id,
+        'reports': [serialize_report(report) for report in reports.order_by('-period_start')[:limit]],
+    }
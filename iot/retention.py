@@ -0,0 +1,340 @@
+"""
+Moteur de rétention et de sous-échantillonnage.
+
+Policies come from ``IOT_RETENTION`` (days, ``None`` = keep forever)::
+
+    IOT_RETENTION = {'raw': 7, 'minute': 90, 'hour': None}
+
+Readings older than the raw retention are averaged into minute rollups,
+moved to the compressed archive (kept ``archive`` days, 0 = no archive),
+then deleted; minute rollups older than their retention are folded into
+hour rollups, then deleted. Work is split into windows (an hour of raw
+readings, a day of minute rollups), and windows into batches of at most
+``batch_size`` rows by primary key. Each batch is one short transaction
+that merges its rollups (existing buckets are merged with a weighted
+average), archives and deletes exactly the rows it folded, so an
+interrupted run never counts a reading twice, and the SQLite write lock
+is only held for one batch. Time partitions of IoTData that are entirely
+past the raw retention are emptied the same way, then dropped.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+from .models import IoTData, IoTRollup, QuantileSketch, METRIC_FAMILIES
+from . import archive, partitions
+
+
+logger = logging.getLogger('iot.retention')
+
+METRICS = list(METRIC_FAMILIES)
+SENSOR_REFS = ['hardware_sensor_ref', 'energy_sensor_ref', 'network_sensor_ref']
+
+DEFAULT_POLICY = {'raw': 7, 'archive': 0, 'minute': 90, 'hour': None}
+
+# Downsampling works on this much history at a time (one transaction each)
+WINDOW = timedelta(days=1)
+RAW_WINDOW = timedelta(hours=1)
+
+
+def get_policy():
+    return {**DEFAULT_POLICY, **getattr(settings, 'IOT_RETENTION', {})}
+
+
+def cutoff_for(days, now, truncate):
+    """Start of the first complete bucket still inside the retention"""
+    if days is None:
+        return None
+    return truncate(now - timedelta(days=days))
+
+
+def floor_minute(value):
+    return value.replace(second=0, microsecond=0)
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def merge_rollups(resolution, groups, window_start, window_end):
+    """
+    Upsert aggregated groups into rollups of a resolution.
+    Buckets that already exist (from an earlier batch of the window, or
+    late readings folded by a later run) are merged with a count-weighted
+    average.
+    """
+    if not groups:
+        return 0
+    existing = {
+        (r.bucket_start, r.hardware_sensor_ref_id, r.energy_sensor_ref_id, r.network_sensor_ref_id): r
+        for r in IoTRollup.objects.filter(
+            resolution=resolution,
+            bucket_start__gte=window_start,
+            bucket_start__lt=window_end,
+        )
+    }
+    to_create, to_update = [], []
+    for group in groups:
+        key = (group['bucket'],) + tuple(group[f'{ref}_id'] for ref in SENSOR_REFS)
+        rollup = existing.get(key)
+        if rollup is None:
+            to_create.append(IoTRollup(
+                resolution=resolution,
+                bucket_start=group['bucket'],
+                sample_count=group['sample_count'],
+                **{f'{ref}_id': group[f'{ref}_id'] for ref in SENSOR_REFS},
+                **{metric: group[metric] for metric in METRICS},
+            ))
+            continue
+        total = rollup.sample_count + group['sample_count']
+        for metric in METRICS:
+            old, new = getattr(rollup, metric), group[metric]
+            if old is None or new is None:
+                merged = new if old is None else old
+            else:
+                merged = (old * rollup.sample_count + new * group['sample_count']) / total
+            setattr(rollup, metric, merged)
+        rollup.sample_count = total
+        to_update.append(rollup)
+
+    IoTRollup.objects.bulk_create(to_create, batch_size=500)
+    IoTRollup.objects.bulk_update(to_update, METRICS + ['sample_count'], batch_size=500)
+    return len(groups)
+
+
+def delete_rows(queryset):
+    """Rows of the queryset's model deleted (cascades not counted)"""
+    return queryset.delete()[1].get(queryset.model._meta.label, 0)
+
+
+def delete_in_batches(queryset, batch_size, pause=0.0):
+    """
+    Delete a queryset by primary key batches, each in its own transaction
+    (call it outside of any transaction for the lock to be released).
+    """
+    deleted = 0
+    for batch in iter_batches(queryset, batch_size):
+        with transaction.atomic():
+            deleted += delete_rows(batch)
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def iter_batches(queryset, batch_size):
+    """Consecutive primary key ranges of a queryset, at most batch_size rows each"""
+    last = None
+    while True:
+        remaining = queryset if last is None else queryset.filter(pk__gt=last)
+        ids = list(remaining.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        last = ids[-1]
+        yield queryset.filter(pk__gte=ids[0], pk__lte=last)
+
+
+def iter_windows(queryset, field, cutoff, window=WINDOW):
+    """Windows from the oldest row of a queryset up to the cutoff"""
+    oldest = queryset.filter(**{f'{field}__lt': cutoff}).order_by(field).values_list(field, flat=True).first()
+    if oldest is None:
+        return
+    start = floor_hour(oldest)
+    while start < cutoff:
+        end = min(start + window, cutoff)
+        yield start, end
+        # Skip the empty windows up to the next row
+        following = (
+            queryset.filter(**{f'{field}__gte': end, f'{field}__lt': cutoff})
+            .order_by(field).values_list(field, flat=True).first()
+        )
+        if following is None:
+            return
+        start = max(end, floor_hour(following))
+
+
+def downsample_raw(cutoff, batch_size, dry_run=False, pause=0.0, archive_raw=False):
+    """
+    Raw readings older than cutoff -> minute rollups (and the archive if
+    archive_raw), then delete them. Partitions entirely older than cutoff
+    are emptied batch by batch, then dropped.
+    """
+    report = {
+        'raw_rolled_up': 0, 'minute_buckets_written': 0, 'raw_archived': 0,
+        'raw_deleted': 0, 'partitions_dropped': [],
+    }
+    sources = [(p.model, p) for p in partitions.list_partitions() if p.start < cutoff] + [(IoTData, None)]
+    for model, partition in sources:
+        expired = partition is not None and partition.end <= cutoff
+        limit = min(cutoff, partition.end) if partition else cutoff
+        for start, end in iter_windows(model.objects.all(), 'created_at', limit, RAW_WINDOW):
+            window = model.objects.filter(created_at__gte=start, created_at__lt=end)
+            for batch in iter_batches(window, batch_size):
+                groups = list(
+                    batch.annotate(bucket=TruncMinute('created_at'))
+                    .values('bucket', *[f'{ref}_id' for ref in SENSOR_REFS])
+                    .annotate(sample_count=Count('id'), **{metric: Avg(metric) for metric in METRICS})
+                )
+                report['raw_rolled_up'] += sum(g['sample_count'] for g in groups)
+                if dry_run:
+                    continue
+                # Rows of expired partitions are deleted too, so a run
+                # interrupted before the DROP does not fold them again
+                with transaction.atomic():
+                    report['minute_buckets_written'] += merge_rollups('minute', groups, start, end)
+                    if archive_raw:
+                        report['raw_archived'] += archive.archive_queryset(batch, start)
+                    report['raw_deleted'] += delete_rows(batch)
+                if pause:
+                    time.sleep(pause)
+        if expired and not dry_run:
+            partitions.drop_partition(partition)
+            report['partitions_dropped'].append(partition.key)
+    return report
+
+
+def downsample_minutes(cutoff, batch_size, dry_run=False, pause=0.0):
+    """Minute rollups older than cutoff -> hour rollups, then delete them"""
+    report = {'minute_rolled_up': 0, 'hour_buckets_written': 0, 'minute_deleted': 0}
+    minutes = IoTRollup.objects.filter(resolution='minute')
+    for start, end in iter_windows(minutes, 'bucket_start', cutoff):
+        window = minutes.filter(bucket_start__gte=start, bucket_start__lt=end)
+        for batch in iter_batches(window, batch_size):
+            groups = list(
+                batch.annotate(bucket=TruncHour('bucket_start'))
+                .values('bucket', *[f'{ref}_id' for ref in SENSOR_REFS])
+                .annotate(
+                    total_count=Sum('sample_count'),
+                    minute_rows=Count('id'),
+                    **{f'{metric}__weighted': Sum(F(metric) * F('sample_count')) for metric in METRICS}
+                )
+            )
+            for group in groups:
+                group['sample_count'] = group.pop('total_count')
+                for metric in METRICS:
+                    weighted = group.pop(f'{metric}__weighted')
+                    group[metric] = None if weighted is None else weighted / group['sample_count']
+            report['minute_rolled_up'] += sum(g.pop('minute_rows') for g in groups)
+            if dry_run:
+                continue
+            with transaction.atomic():
+                report['hour_buckets_written'] += merge_rollups('hour', groups, start, end)
+                report['minute_deleted'] += delete_rows(batch)
+            if pause:
+                time.sleep(pause)
+    return report
+
+
+def prune_hours(cutoff, batch_size, dry_run=False, pause=0.0):
+    """Hour rollups and the hourly quantile sketches expire together"""
+    expired = IoTRollup.objects.filter(resolution='hour', bucket_start__lt=cutoff)
+    sketches = QuantileSketch.objects.filter(bucket_start__lt=cutoff)
+    if dry_run:
+        return {'hour_deleted': expired.count(), 'sketch_buckets_deleted': sketches.count()}
+    return {
+        'hour_deleted': delete_in_batches(expired, batch_size, pause),
+        'sketch_buckets_deleted': delete_in_batches(sketches, batch_size, pause),
+    }
+
+
+def incremental_vacuum(max_pages=None):
+    """
+    Return free pages to the filesystem (SQLite, auto_vacuum=INCREMENTAL).
+    Returns the number of pages freed, or None if the DB is not in
+    incremental mode (see enable_incremental_vacuum).
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:
+            return None
+        cursor.execute('PRAGMA freelist_count')
+        before = cursor.fetchone()[0]
+        # Each step of the pragma frees one page: executescript runs it to
+        # completion where cursor.execute() would stop after the first one
+        connection.connection.executescript(f'PRAGMA incremental_vacuum({int(max_pages or 0)});')
+        cursor.execute('PRAGMA freelist_count')
+        return before - cursor.fetchone()[0]
+
+
+def enable_incremental_vacuum():
+    """One-off switch to auto_vacuum=INCREMENTAL (rewrites the whole file)"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def enforce_retention(now=None, batch_size=5000, dry_run=False, pause=0.0, vacuum_pages=None):
+    """Apply every retention policy once and report what was done"""
+    started = time.perf_counter()
+    now = now or timezone.now()
+    policy = get_policy()
+    report = {'dry_run': dry_run, 'policy': policy}
+    if not dry_run:
+        report['partitions_rotated'] = partitions.rotate(now)
+
+    raw_cutoff = cutoff_for(policy['raw'], now, floor_minute)
+    if raw_cutoff:
+        report.update(downsample_raw(raw_cutoff, batch_size, dry_run, pause, archive_raw=policy['archive'] != 0))
+    # 0 disables the archive, it does not purge it
+    archive_cutoff = cutoff_for(policy['archive'] or None, now, floor_hour)
+    if archive_cutoff:
+        expired = archive.segments_for(end=archive_cutoff).filter(end_time__lt=archive_cutoff)
+        report['archive_segments_deleted'] = expired.count() if dry_run else archive.prune(archive_cutoff)
+    minute_cutoff = cutoff_for(policy['minute'], now, floor_hour)
+    if minute_cutoff:
+        report.update(downsample_minutes(minute_cutoff, batch_size, dry_run, pause))
+    hour_cutoff = cutoff_for(policy['hour'], now, floor_hour)
+    if hour_cutoff:
+        report.update(prune_hours(hour_cutoff, batch_size, dry_run, pause))
+
+    if not dry_run:
+        report['pages_freed'] = incremental_vacuum(vacuum_pages)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+class RetentionScheduler(threading.Thread):
+    """Thread démon appliquant la rétention à intervalle régulier"""
+
+    def __init__(self, interval):
+        super().__init__(name='iot-retention', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        from django.db import close_old_connections
+
+        while not self._stop_event.wait(self.interval):
+            try:
+                report = enforce_retention(
+                    batch_size=getattr(settings, 'IOT_RETENTION_BATCH_SIZE', 5000),
+                    pause=getattr(settings, 'IOT_RETENTION_BATCH_PAUSE', 0.05),
+                )
+                logger.info('Retention applied: %s', report)
+            except Exception:
+                logger.exception('Retention run failed')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """Start the in-process scheduler if IOT_RETENTION_INTERVAL_SECONDS is set"""
+    global _scheduler
+    interval = getattr(settings, 'IOT_RETENTION_INTERVAL_SECONDS', None)
+    if not interval or _scheduler is not None:
+        return None
+    _scheduler = RetentionScheduler(interval)
+    _scheduler.start()
+    return _scheduler
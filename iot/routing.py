@@ -7,4 +7,7 @@ websocket_urlpatterns = [
     re_path(r'^ws/energy/$', consumers.EnergyConsumer.as_asgi()),
     re_path(r'^ws/network/$', consumers.NetworkConsumer.as_asgi()),
     re_path(r'^ws/scores/$', consumers.ScoresConsumer.as_asgi()),
+    re_path(r'^ws/fleet/$', consumers.FleetConsumer.as_asgi()),
+    re_path(r'^ws/alerts/$', consumers.AlertsConsumer.as_asgi()),
+    re_path(r'^ws/ingest/$', consumers.IngestConsumer.as_asgi()),
 ]
@@ -0,0 +1,389 @@
+"""
+Moteur de règles d'alerte à seuils, indexé par métrique.
+
+Rule syntax: comparisons joined by ``and``, with an optional hold::
+
+    power_watts > 250 for 5 readings
+    overheating == 1 and age_years > 5
+    cpu_usage >= 95 and ram_usage >= 90 for 3 readings
+
+Operators are > >= < <= == !=; each side is a metric of IoTData and a
+number. ``for N readings`` requires N consecutive matching readings of
+the rule's sensor (the sensor of its first metric's family).
+
+Rules are compiled into one index per scope (fleet-wide, or one sensor)
+and per metric. Every rule is filed under one anchor comparison, its
+first one that is not ``!=``: ``>``/``>=`` thresholds in a sorted list
+where the matching rules are a prefix, ``<``/``<=`` in one where they are
+a suffix, ``==`` in a dict. A reading bisects each list once and only
+fully evaluates the rules whose anchor matched, instead of every rule.
+
+Per (rule, sensor) state: consecutive matches (hold) and whether the
+rule already fired. A rule fires once when its hold is reached, then
+again only after its condition cleared and cooldown_seconds elapsed
+(debounce). Alerts are stored in RuleAlert and pushed to the alerts
+WebSocket group. Rules reload on save / delete in this process and
+every IOT_RULES_RELOAD_SECONDS from the database for the others.
+"""
+import logging
+import operator
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+logger = logging.getLogger('iot.rules')
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+COMPARISON_RE = re.compile(r'^\s*([a-z_][a-z0-9_]*)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$')
+HOLD_RE = re.compile(r'\s+for\s+(\d+)\s+readings?\s*$', re.IGNORECASE)
+
+
+class Comparison:
+    __slots__ = ('metric', 'op', 'threshold', 'test')
+
+    def __init__(self, metric, op, threshold):
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.test = OPERATORS[op]
+
+    def __repr__(self):
+        return f'{self.metric} {self.op} {self.threshold:g}'
+
+
+def parse_expression(expression):
+    """(comparisons, hold) of a rule expression; raises ValueError"""
+    from .models import METRIC_FAMILIES
+
+    hold = 1
+    match = HOLD_RE.search(expression)
+    if match:
+        hold = int(match.group(1))
+        if hold < 1:
+            raise ValueError('Hold must be at least 1 reading')
+        expression = expression[:match.start()]
+    comparisons = []
+    for part in re.split(r'\s+and\s+', expression.strip(), flags=re.IGNORECASE):
+        match = COMPARISON_RE.match(part)
+        if not match:
+            raise ValueError(f'Invalid comparison: {part!r} (expected "<metric> <op> <number>")')
+        metric, op, threshold = match.groups()
+        if metric not in METRIC_FAMILIES:
+            raise ValueError(f'Unknown metric: {metric}')
+        comparisons.append(Comparison(metric, op, float(threshold)))
+    return comparisons, hold
+
+
+class CompiledRule:
+    __slots__ = ('id', 'name', 'sensor', 'ref_attname', 'comparisons', 'hold', 'cooldown', 'metrics')
+
+    def __init__(self, rule_id, name, expression, sensor=None, cooldown=300):
+        from .models import METRIC_FAMILIES, SENSOR_REF_FIELDS
+
+        self.id = rule_id
+        self.name = name
+        self.sensor = sensor
+        self.comparisons, self.hold = parse_expression(expression)
+        self.ref_attname = f'{SENSOR_REF_FIELDS[METRIC_FAMILIES[self.comparisons[0].metric]]}_id'
+        self.cooldown = cooldown
+        self.metrics = list(dict.fromkeys(c.metric for c in self.comparisons))
+
+    @property
+    def anchor(self):
+        for comparison in self.comparisons:
+            if comparison.op != '!=':
+                return comparison
+        return None
+
+    def matches(self, reading):
+        for comparison in self.comparisons:
+            value = getattr(reading, comparison.metric)
+            if value is None or not comparison.test(value, comparison.threshold):
+                return False
+        return True
+
+
+class MetricIndex:
+    """Règles d'une métrique classées par seuil de leur comparaison d'ancrage"""
+
+    def __init__(self):
+        self._above = []   # (threshold, inclusive, rule) for > / >=
+        self._below = []   # (threshold, inclusive, rule) for < / <=
+        self.equal = {}    # threshold -> [rule]
+
+    def add(self, comparison, rule):
+        if comparison.op in ('>', '>='):
+            self._above.append((comparison.threshold, comparison.op == '>=', rule))
+        elif comparison.op in ('<', '<='):
+            self._below.append((comparison.threshold, comparison.op == '<=', rule))
+        else:
+            self.equal.setdefault(comparison.threshold, []).append(rule)
+
+    def freeze(self):
+        for entries in (self._above, self._below):
+            entries.sort(key=lambda entry: entry[0])
+        self.above_keys = [entry[0] for entry in self._above]
+        self.below_keys = [entry[0] for entry in self._below]
+
+    def match(self, value):
+        """Rules whose anchor comparison holds for value"""
+        # threshold < value always matches '>' / '>=', equality only '>='
+        end = bisect_left(self.above_keys, value)
+        for _, _, rule in self._above[:end]:
+            yield rule
+        while end < len(self._above) and self.above_keys[end] == value:
+            if self._above[end][1]:
+                yield self._above[end][2]
+            end += 1
+        # threshold > value always matches '<' / '<=', equality only '<='
+        start = bisect_right(self.below_keys, value)
+        for _, _, rule in self._below[start:]:
+            yield rule
+        start -= 1
+        while start >= 0 and self.below_keys[start] == value:
+            if self._below[start][1]:
+                yield self._below[start][2]
+            start -= 1
+        yield from self.equal.get(value, ())
+
+
+class RuleIndex:
+    """Index de toutes les règles : {scope: {metric: MetricIndex}}"""
+
+    def __init__(self, rules):
+        self.rules = {rule.id: rule for rule in rules}
+        self.scopes = {}
+        self.unanchored = {}  # scope -> [rule] (only '!=' comparisons)
+        for rule in rules:
+            anchor = rule.anchor
+            if anchor is None:
+                self.unanchored.setdefault(rule.sensor, []).append(rule)
+                continue
+            metrics = self.scopes.setdefault(rule.sensor, {})
+            if anchor.metric not in metrics:
+                metrics[anchor.metric] = MetricIndex()
+            metrics[anchor.metric].add(anchor, rule)
+        for metrics in self.scopes.values():
+            for index in metrics.values():
+                index.freeze()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, reading, sensors):
+        """Rules whose anchor matches the reading (fleet-wide + its sensors)"""
+        seen = set()
+        for scope in (None, *sensors):
+            for rule in self.unanchored.get(scope, ()):
+                if rule.id not in seen:
+                    seen.add(rule.id)
+                    yield rule
+            for metric, index in self.scopes.get(scope, {}).items():
+                value = getattr(reading, metric)
+                if value is None:
+                    continue
+                for rule in index.match(value):
+                    if rule.id not in seen:
+                        seen.add(rule.id)
+                        yield rule
+
+    def matching(self, reading, sensors):
+        """Rules fully matched by the reading, in their own sensor scope"""
+        for rule in self.candidates(reading, sensors):
+            if rule.sensor is not None and getattr(reading, rule.ref_attname) != rule.sensor:
+                continue
+            if rule.matches(reading):
+                yield rule
+
+
+class RuleState:
+    __slots__ = ('streak', 'fired', 'last_fired')
+
+    def __init__(self):
+        self.streak = 0
+        self.fired = False
+        self.last_fired = None
+
+
+SENSOR_ATTNAMES = ('hardware_sensor_ref_id', 'energy_sensor_ref_id', 'network_sensor_ref_id')
+
+
+class RulesEngine:
+    """Règles compilées + état hold / debounce par (règle, capteur)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._states = {}   # (rule id, sensor pk) -> RuleState
+        self._active = {}   # sensor pk -> {rule id} with a streak or a fired state
+
+    def load(self, rules):
+        """Replace the compiled rules (CompiledRule list); keeps surviving states"""
+        index = RuleIndex(rules)
+        with self._lock:
+            self._index = index
+            self._states = {key: state for key, state in self._states.items() if key[0] in index.rules}
+            for rule_ids in self._active.values():
+                rule_ids.intersection_update(index.rules)
+
+    def invalidate(self):
+        self._signature = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        """Recompile from AlertRule when the table changed"""
+        from django.db.models import Count, Max
+        from .models import AlertRule
+
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < get_reload_seconds():
+            return
+        self._checked_at = now
+        signature = AlertRule.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        signature = (signature['count'], signature['updated'])
+        if signature == self._signature and self._index is not None:
+            return
+        rules = []
+        for rule in AlertRule.objects.filter(enabled=True):
+            try:
+                rules.append(CompiledRule(rule.id, rule.name, rule.expression, rule.sensor_ref_id, rule.cooldown_seconds))
+            except ValueError:
+                # Invalid expression saved without validation: ignored
+                continue
+        self.load(rules)
+        self._signature = signature
+
+    def evaluate(self, reading, moment=None):
+        """
+        Run the rules a reading can match and update hold / debounce state.
+        Returns [(CompiledRule, sensor pk)] of the rules that fire.
+        """
+        moment = moment or reading.created_at
+        sensors = {getattr(reading, attname) for attname in SENSOR_ATTNAMES}
+        fired = []
+        with self._lock:
+            index = self._index
+            if index is None or not len(index):
+                return fired
+            matched = set()
+            for rule in index.matching(reading, sensors):
+                sensor = getattr(reading, rule.ref_attname)
+                matched.add((rule.id, sensor))
+                state = self._states.get((rule.id, sensor))
+                if state is None:
+                    state = self._states[(rule.id, sensor)] = RuleState()
+                    self._active.setdefault(sensor, set()).add(rule.id)
+                state.streak += 1
+                if (state.streak >= rule.hold and not state.fired
+                        and (state.last_fired is None
+                             or (moment - state.last_fired).total_seconds() >= rule.cooldown)):
+                    state.fired = True
+                    state.last_fired = moment
+                    fired.append((rule, sensor))
+            # Rules of this reading's sensors that did not match: hold and debounce reset
+            for sensor in sensors:
+                active = self._active.get(sensor)
+                if not active:
+                    continue
+                for rule_id in list(active):
+                    rule = index.rules.get(rule_id)
+                    if rule is None or getattr(reading, rule.ref_attname) != sensor or (rule_id, sensor) in matched:
+                        continue
+                    state = self._states[(rule_id, sensor)]
+                    state.streak = 0
+                    state.fired = False
+                    if state.last_fired is None:
+                        del self._states[(rule_id, sensor)]
+                        active.discard(rule_id)
+        return fired
+
+    def process(self, reading):
+        """Evaluate, store and publish the rule alerts of one reading"""
+        from .models import RuleAlert
+
+        self._refresh()
+        fired = self.evaluate(reading)
+        if not fired:
+            return []
+        alerts = RuleAlert.objects.bulk_create([
+            RuleAlert(
+                rule_id=rule.id, sensor_ref_id=sensor, reading_id=reading.id, created_at=reading.created_at,
+                values={metric: getattr(reading, metric) for metric in rule.metrics},
+            )
+            for rule, sensor in fired
+        ])
+        names = {rule.id: rule.name for rule, _ in fired}
+        publish(alerts, names)
+        return alerts
+
+
+engine = RulesEngine()
+
+
+def get_reload_seconds():
+    return getattr(settings, 'IOT_RULES_RELOAD_SECONDS', 10)
+
+
+def serialize_rule(rule):
+    return {
+        'id': rule.id,
+        'name': rule.name,
+        'expression': rule.expression,
+        'sensor_id': rule.sensor_id,
+        'cooldown_seconds': rule.cooldown_seconds,
+        'enabled': rule.enabled,
+        'created_at': rule.created_at.isoformat(),
+        'updated_at': rule.updated_at.isoformat(),
+    }
+
+
+def serialize_rule_alert(alert, rule_name=None):
+    return {
+        'id': alert.id,
+        'rule_id': alert.rule_id,
+        'rule': rule_name if rule_name is not None else alert.rule.name,
+        'sensor_id': alert.sensor_id,
+        'values': alert.values,
+        'reading_id': alert.reading_id,
+        'created_at': alert.created_at.isoformat(),
+    }
+
+
+def publish(alerts, names):
+    """Push rule alerts to the alerts WebSocket group"""
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+    from .anomalies import ALERTS_GROUP
+
+    try:
+        async_to_sync(get_channel_layer().group_send)(ALERTS_GROUP, {
+            'type': 'data_update',
+            'data': {
+                'type': 'rule_alerts',
+                'alerts': [serialize_rule_alert(alert, names[alert.rule_id]) for alert in alerts],
+            },
+        })
+    except Exception:
+        # Alerts are stored anyway; don't block ingestion
+        logger.exception('Error sending rule alerts to group %s', ALERTS_GROUP)
+
+
+def process_reading(reading):
+    return engine.process(reading)
+
+
+def on_rule_changed(sender, **kwargs):
+    engine.invalidate()
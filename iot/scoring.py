@@ -0,0 +1,197 @@
+"""
+Calcul des scores côté serveur (éco, obsolescence, dépendance Big Tech,
+économies de CO2).
+
+Scores used to be taken from the payload and defaulted to 0 when the
+device omitted them. They are now derived from the hardware, energy and
+network fields by a versioned formula (``FORMULAS``, current version
+``IOT_SCORE_VERSION``) that works on whole columns with NumPy: ingest
+scores its one-row batch, bulk paths and ``manage.py rescore`` score
+thousands of rows per call.
+
+``IOT_SCORING_MODE``:
+- 'server' (default): the formula always sets the four scores;
+- 'device': scores sent by the device are kept, missing ones computed.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+
+SCORE_FIELDS = ('eco_score', 'obsolescence_score', 'bigtech_dependency', 'co2_savings_kg_year')
+
+INPUT_FIELDS = (
+    'age_years', 'cpu_usage', 'battery_health', 'win11_compat',
+    'power_watts', 'active_devices', 'overheating', 'co2_equiv_g',
+    'network_load_mbps', 'requests_per_min', 'cloud_dependency_score',
+)
+
+MODES = ('server', 'device')
+
+# Grid carbon intensity (kg CO2 / kWh) and hours per year
+GRID_KG_PER_KWH = 0.06
+HOURS_PER_YEAR = 24 * 365
+# Draw of an efficient device: anything above is avoidable
+EFFICIENT_WATTS = 15
+# Share of the idle draw that sleep / power management would save
+IDLE_SAVINGS = 0.3
+
+
+def formula_v1(c):
+    """
+    Version 1. ``c`` maps INPUT_FIELDS to float64 arrays; returns the
+    four scores as float arrays (eco / obsolescence / bigtech in 0..100,
+    higher eco is better, higher obsolescence is worse). Energy readings
+    cover ``active_devices`` devices, so they are compared per device.
+    """
+    devices = np.maximum(c['active_devices'], 1)
+    watts_per_device = c['power_watts'] / devices
+    eco = (100
+           - np.minimum(watts_per_device, 50)
+           - np.minimum(c['co2_equiv_g'] / devices, 20)
+           - np.minimum(5 * c['overheating'], 15)
+           - np.minimum(c['network_load_mbps'] / 20, 10)
+           - np.minimum(c['cloud_dependency_score'] / 10, 10))
+    obsolescence = (np.minimum(c['age_years'] * 10, 50)
+                    + np.clip(100 - c['battery_health'], 0, 60) / 2
+                    + 20 * (c['win11_compat'] == 0))
+    bigtech = (0.7 * c['cloud_dependency_score']
+               + 0.3 * np.minimum(c['requests_per_min'] / 20, 100))
+    # Avoidable watts: draw above an efficient device, plus part of the idle draw
+    idle = 1 - np.clip(c['cpu_usage'], 0, 100) / 100
+    avoidable = (np.maximum(watts_per_device - EFFICIENT_WATTS, 0) * devices
+                 + np.maximum(c['power_watts'], 0) * idle * IDLE_SAVINGS)
+    savings = avoidable * HOURS_PER_YEAR / 1000 * GRID_KG_PER_KWH
+    return {
+        'eco_score': np.clip(eco, 0, 100),
+        'obsolescence_score': np.clip(obsolescence, 0, 100),
+        'bigtech_dependency': np.clip(bigtech, 0, 100),
+        'co2_savings_kg_year': savings,
+    }
+
+
+# Version -> formula. Add a new version instead of editing a released one,
+# then run `manage.py rescore` to bring history up to date.
+FORMULAS = {
+    1: formula_v1,
+}
+
+
+def get_version():
+    return getattr(settings, 'IOT_SCORE_VERSION', max(FORMULAS))
+
+
+def get_mode():
+    mode = getattr(settings, 'IOT_SCORING_MODE', 'server')
+    if mode not in MODES:
+        raise ValueError(f'Unknown IOT_SCORING_MODE: {mode}')
+    return mode
+
+
+def _matrix(columns, fields):
+    """Payload columns -> one float64 row per field (missing or invalid -> 0)"""
+    try:
+        matrix = np.array([columns[field] for field in fields], dtype=np.float64)
+    except (TypeError, ValueError):
+        matrix = np.array([[_to_float(value) for value in columns[field]] for field in fields])
+    return np.nan_to_num(matrix, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compute_scores(columns, version=None):
+    """
+    Scores of a batch. ``columns`` maps every INPUT_FIELDS name to a
+    sequence of values (one per reading); returns {score: int64 array}.
+    """
+    version = version or get_version()
+    if version not in FORMULAS:
+        raise ValueError(f'Unknown score version: {version}')
+    scores = FORMULAS[version](dict(zip(INPUT_FIELDS, _matrix(columns, INPUT_FIELDS))))
+    return {field: np.rint(values).astype(np.int64) for field, values in scores.items()}
+
+
+def provided_scores(data):
+    """Score fields present in a sensor payload (nested 'scores' or root)"""
+    scores_data = data.get('scores', data)
+    return {field for field in SCORE_FIELDS if scores_data.get(field) is not None}
+
+
+def apply_scores(rows, provided=None, version=None):
+    """
+    Set the scores of IoTData field dicts in place, in one vectorized pass.
+    ``provided`` (one set per row, see provided_scores) lists the scores
+    the device sent: kept in 'device' mode, overwritten in 'server' mode.
+    """
+    if not rows:
+        return rows
+    scores = compute_scores({field: [row[field] for row in rows] for field in INPUT_FIELDS}, version)
+    columns = {field: values.tolist() for field, values in scores.items()}
+    keep_device = provided is not None and get_mode() == 'device'
+    for i, row in enumerate(rows):
+        kept = provided[i] if keep_device else ()
+        for field in SCORE_FIELDS:
+            if field not in kept:
+                row[field] = columns[field][i]
+    return rows
+
+
+# ==================== RESCORE ====================
+
+def rescore_queryset(queryset, version=None, batch_size=5000, dry_run=False):
+    """
+    Recompute the scores of one table's readings by primary key batches
+    and write back only the rows whose scores changed.
+    Returns (rows scanned, rows changed).
+    """
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    assignments = ', '.join(f'{connection.ops.quote_name(field)} = %s' for field in SCORE_FIELDS)
+    sql = f'UPDATE {table} SET {assignments} WHERE {connection.ops.quote_name(model._meta.pk.column)} = %s'
+
+    scanned = changed = 0
+    last_pk = 0
+    columns = ('pk', *SCORE_FIELDS, *INPUT_FIELDS)
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list(*columns)[:batch_size])
+        if not rows:
+            return scanned, changed
+        last_pk = rows[-1][0]
+        scanned += len(rows)
+        values = dict(zip(columns, zip(*rows)))
+        scores = compute_scores(values, version)
+        stored = _matrix(values, SCORE_FIELDS)
+        new = np.array([scores[field] for field in SCORE_FIELDS])
+        indices = np.flatnonzero((new != stored).any(axis=0))
+        changed += len(indices)
+        if dry_run or not len(indices):
+            continue
+        params = [[*new[:, i].tolist(), values['pk'][i]] for i in indices.tolist()]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+def rescore(start=None, end=None, version=None, batch_size=5000, dry_run=False, force=False):
+    """
+    Apply the formula ``version`` (IOT_SCORE_VERSION by default) to the
+    raw readings of [start, end), every time partition included.
+    Archived segments and rollup averages are left as they are.
+    In 'device' mode, which scores came from the devices is not stored:
+    overwriting them all needs ``force`` (a dry run does not).
+    """
+    from . import archive, partitions
+
+    if get_mode() == 'device' and not (force or dry_run):
+        raise ValueError("IOT_SCORING_MODE is 'device': rescoring would overwrite the scores sent by devices")
+    report = {'version': version or get_version(), 'scanned': 0, 'changed': 0}
+    for queryset in partitions.querysets(start, end):
+        scanned, changed = rescore_queryset(queryset, version, batch_size, dry_run)
+        report['scanned'] += scanned
+        report['changed'] += changed
+    report['archived_not_rescored'] = sum(archive.segments_for(start, end).values_list('row_count', flat=True))
+    return report
@@ -0,0 +1,207 @@
+"""
+Génération de données synthétiques en masse (manage.py seed_iot).
+
+Readings follow the patterns of ``IoTDataSimulator.generate_realistic_data``
+(send_test_iot_data.py) across a fleet of sensors and a time span: CPU
+higher during office hours, RAM and power following the CPU, CO2 following
+the power, overheating when the CPU-driven temperature passes 75 °C. Each
+sensor keeps its own hardware (age, OS, Windows 11 compatibility, battery
+wear, connected devices, cloud dependency) for the whole span.
+
+Values are drawn with NumPy, a block of BLOCK_SIZE readings at a time from
+a generator seeded by (seed, block): the same arguments always produce the
+same rows. Blocks then take the bulk import path (``importer.store_batch``:
+server-side scores and cached recommendations), with the
+IoTData indexes dropped while loading and sensor states / sketches derived
+at the end.
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import importer, partitions, scoring
+from .models import ImportCheckpoint, OperatingSystem, SensorIdentifier
+
+BLOCK_SIZE = importer.DEFAULT_BATCH_SIZE
+DEFAULT_SENSORS = 50
+DEFAULT_DAYS = 30
+
+SENSOR_PREFIX = 'ESP32_SEED'
+OFFICE_HOURS = (9, 18)
+# Older machines cannot run Windows 11
+RECENT_OS = (['Windows 11', 'Windows 10', 'Linux', 'macOS'], [0.5, 0.2, 0.2, 0.1])
+LEGACY_OS = (['Windows 10', 'Linux'], [0.7, 0.3])
+WIN11_MAX_AGE = 4
+# °C above the simulator's CPU-driven temperature, per year of age
+HEAT_PER_YEAR = 0.8
+
+
+def sensor_name(index):
+    return f'{SENSOR_PREFIX}_{index:04d}'
+
+
+def fleet(sensors, seed):
+    """Per-sensor constants, as arrays indexed by sensor"""
+    rng = np.random.default_rng([seed, 0])
+    age_years = rng.integers(6, 97, sensors) // 12
+    legacy = age_years > WIN11_MAX_AGE
+    os_names = np.where(
+        legacy,
+        rng.choice(LEGACY_OS[0], sensors, p=LEGACY_OS[1]),
+        rng.choice(RECENT_OS[0], sensors, p=RECENT_OS[1]),
+    )
+    return {
+        'name': [sensor_name(i) for i in range(sensors)],
+        'age_years': age_years,
+        'os': os_names.tolist(),
+        'win11_compat': (~legacy & (os_names != 'macOS')).astype(np.int64),
+        'battery_health': np.clip(100 - age_years * 5 - rng.uniform(0, 10, sensors), 40, 100),
+        'active_devices': rng.integers(3, 13, sensors),
+        'cloud_dependency_score': rng.uniform(30, 85, sensors),
+        # Busy machines stay busy
+        'cpu_offset': rng.normal(0, 5, sensors),
+    }
+
+
+def local_offset(moment):
+    """UTC offset (seconds) of the default time zone, for office hours"""
+    return moment.astimezone(timezone.get_default_timezone()).utcoffset().total_seconds()
+
+
+def generate(block, rows, sensors, start, interval, seed, profile, offset):
+    """
+    Raw payload columns of readings [block * BLOCK_SIZE, ...) as an
+    importer.Batch: row i is sensor i % sensors at step i // sensors.
+    """
+    rng = np.random.default_rng([seed, 1, block])
+    first = block * BLOCK_SIZE
+    index = np.arange(first, min(first + BLOCK_SIZE, rows))
+    n = len(index)
+    sensor = index % sensors
+    epochs = start + (index // sensors) * interval + rng.uniform(0, interval * 0.5, n)
+    timestamps = epochs.astype(np.int64)
+
+    local = timestamps + int(offset)
+    hour = local // 3600 % 24
+    weekday = (local // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+    office = (hour >= OFFICE_HOURS[0]) & (hour <= OFFICE_HOURS[1]) & (weekday < 5)
+
+    # CPU plus élevé pendant les heures de bureau, RAM / puissance corrélées
+    cpu = np.clip(np.where(office, 60, 40) + rng.integers(-20, 31, n) + profile['cpu_offset'][sensor], 0, 100)
+    ram = np.clip(cpu - rng.integers(5, 16, n), 20, 100)
+    power = np.clip(cpu * 2 + rng.integers(-30, 31, n), 50, 300)
+    co2 = power * rng.uniform(1.5, 2.5, n)
+    temperature = 25 + cpu * 0.5 + rng.uniform(-3, 3, n) + profile['age_years'][sensor] * HEAT_PER_YEAR
+    cloud = np.clip(profile['cloud_dependency_score'][sensor] + rng.normal(0, 3, n), 0, 100)
+
+    names = [profile['name'][i] for i in sensor.tolist()]
+    columns = {
+        'hardware_sensor_id': names,
+        'hardware_timestamp': timestamps,
+        'age_years': profile['age_years'][sensor],
+        'cpu_usage': cpu,
+        'ram_usage': ram,
+        'battery_health': np.round(np.clip(profile['battery_health'][sensor] + rng.normal(0, 1, n), 0, 100), 1),
+        'os': [profile['os'][i] for i in sensor.tolist()],
+        'win11_compat': profile['win11_compat'][sensor].tolist(),
+        'energy_sensor_id': names,
+        'energy_timestamp': timestamps,
+        'power_watts': power,
+        'active_devices': np.maximum(1, profile['active_devices'][sensor] + rng.integers(-1, 2, n)),
+        'overheating': (temperature > 75).astype(np.int64),
+        'co2_equiv_g': co2,
+        'network_sensor_id': names,
+        'network_timestamp': timestamps,
+        # Trafic suivant l'activité et la dépendance cloud
+        'network_load_mbps': 10 + (cloud / 100) * (cpu / 100) * rng.uniform(0, 490, n),
+        'requests_per_min': 50 + cpu * 4.5 + rng.integers(-50, 51, n),
+        'cloud_dependency_score': cloud,
+        'recommendations': [{}] * n,
+    }
+    columns.update({field: np.zeros(n) for field in scoring.SCORE_FIELDS})
+    return importer.Batch(n, columns, {field: np.zeros(n, dtype=bool) for field in scoring.SCORE_FIELDS})
+
+
+def seed_readings(rows, sensors=DEFAULT_SENSORS, days=DEFAULT_DAYS, end=None, seed=0, rotate=True, progress=None,
+                  restart=False):
+    """
+    Insert ``rows`` synthetic readings of ``sensors`` sensors spread over
+    the ``days`` before ``end``. ``progress`` is called after every
+    committed block with the running report.
+
+    Blocks are committed with a checkpoint: an interrupted run with the
+    same arguments resumes after its last block, and a completed one is
+    not inserted again unless ``restart`` (which adds a second copy).
+    Without ``end``, the latest interrupted run of the other arguments is
+    resumed with its own end; otherwise the span ends now.
+    Returns the report: imported, resumed, already_done, seconds, ...
+    """
+    prefix = f'seed_iot:{seed}:{sensors}:{rows}:{days:g}:'
+    if end is None:
+        interrupted = (ImportCheckpoint.objects.filter(source__startswith=prefix, done=False)
+                       .order_by('-updated_at').values_list('source', flat=True).first())
+        end = datetime.fromisoformat(interrupted[len(prefix):]) if interrupted else timezone.now()
+    span = timedelta(days=days).total_seconds()
+    steps = -(-rows // sensors)
+    interval = span / steps
+    start = end.timestamp() - span
+    profile = fleet(sensors, seed)
+    # Lookup ids in a fixed order: a fresh database gets identical rows
+    for name in profile['name']:
+        SensorIdentifier.intern(name)
+    for name in sorted(set(profile['os'])):
+        OperatingSystem.intern(name)
+    offset = local_offset(end)
+    report = {'imported': 0, 'rejected': 0, 'indexes_rebuilt': 0, 'partitions': [], 'resumed': 0,
+              'already_done': False, 'interval': interval, 'started': time.perf_counter()}
+
+    # Dropped indexes are recorded like a deferred import's: an
+    # interrupted run leaves them for the next import_iot to rebuild
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=f'{prefix}{end.isoformat()}')
+    if restart:
+        # Pending ranges are kept: those rows still need their derived state
+        checkpoint.records = checkpoint.imported = checkpoint.rejected = 0
+        checkpoint.done = False
+    if checkpoint.done:
+        report['already_done'] = True
+        report['seconds'] = time.perf_counter() - report['started']
+        return report
+    report['resumed'] = checkpoint.records
+    checkpoint.dropped_indexes += importer.drop_indexes()
+    checkpoint.save()
+    recommendation_refs = {}
+    with importer.collector_paused():
+        try:
+            # Every committed block but the last one is full
+            for block in range(checkpoint.records // BLOCK_SIZE, -(-rows // BLOCK_SIZE)):
+                batch = generate(block, rows, sensors, start, interval, seed, profile, offset)
+                with transaction.atomic():
+                    ids, rejected = importer.store_batch(batch, recommendation_refs, derived=False)
+                    imported = ids[1] - ids[0] + 1 if ids else 0
+                    if ids:
+                        importer.add_range(checkpoint.pending_ranges, *ids)
+                    checkpoint.records += batch.records
+                    checkpoint.imported += imported
+                    checkpoint.rejected += rejected
+                    checkpoint.save()
+                report['imported'] += imported
+                report['rejected'] += rejected
+                if progress:
+                    elapsed = time.perf_counter() - report['started']
+                    progress(dict(report, seconds=elapsed, fraction=checkpoint.records / rows,
+                                  rate=report['imported'] / elapsed if elapsed else 0))
+        finally:
+            if checkpoint.dropped_indexes:
+                report['indexes_rebuilt'] += importer.restore_indexes(checkpoint)
+        with transaction.atomic():
+            importer.apply_derived(checkpoint.pending_ranges)
+            checkpoint.pending_ranges = []
+            checkpoint.done = True
+            checkpoint.save()
+    if rotate:
+        report['partitions'] = partitions.rotate()
+    report['seconds'] = time.perf_counter() - report['started']
+    return report
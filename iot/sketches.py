@@ -0,0 +1,546 @@
+"""
+Sketches de quantiles (DDSketch) mis à jour à l'ingestion.
+
+Each tracked metric (IOT_SKETCH_METRICS) has one sketch per scope:
+all sensors / all time, per sensor / all time, all sensors / per hour and
+per sensor / per hour (the hour rollup buckets). A DDSketch keeps counts
+in logarithmic bins, so any quantile is within IOT_SKETCH_ACCURACY
+(relative) of the exact value, reading it costs O(bins) whatever the
+history size, and two sketches merge by adding their bins: the
+percentiles of any hour range come from merging its hourly sketches.
+
+Ingest only updates in-memory deltas (SketchStore.record). They are
+merged into the QuantileSketch rows by SketchStore.flush, every
+IOT_SKETCH_FLUSH_SECONDS from the flusher thread and at exit; reads
+combine the persisted sketch with the pending delta. Persisted all-time
+sketches are cached for IOT_SKETCH_CACHE_SECONDS, so the flushes of
+other processes (ingest server, imports) show up after that delay.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCURACY = 0.01
+DEFAULT_METRICS = ('cpu_usage', 'power_watts', 'network_load_mbps')
+DEFAULT_CACHE_SECONDS = 5
+QUANTILES = (0.5, 0.9, 0.99)
+# Values closer to 0 than this count as zero
+MIN_INDEXABLE = 1e-9
+# Bins kept per sign before the lowest ones are collapsed
+MAX_BINS = 2048
+# Sketch rows per UPDATE statement of a flush
+FLUSH_BATCH_SIZE = 500
+# add_many() adds batches up to this size one value at a time
+SMALL_BATCH = 8
+
+
+class DDSketch:
+    """Quantiles à précision relative garantie, fusionnables"""
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, magnitude):
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, weight=1):
+        value = float(value)
+        if value > MIN_INDEXABLE:
+            bins = self.positive
+            key = self._key(value)
+        elif value < -MIN_INDEXABLE:
+            bins = self.negative
+            key = self._key(-value)
+        else:
+            self.zero_count += weight
+            bins = None
+        if bins is not None:
+            bins[key] = bins.get(key, 0) + weight
+            if len(bins) > MAX_BINS:
+                self._collapse(bins)
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        """add() of every value of a sequence, binned in one NumPy pass"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) <= SMALL_BATCH:
+            # NumPy call overhead beats the binning of a few values
+            for value in values.tolist():
+                self.add(value)
+            return
+        for bins, magnitudes in ((self.positive, values[values > MIN_INDEXABLE]),
+                                 (self.negative, -values[values < -MIN_INDEXABLE])):
+            if not len(magnitudes):
+                continue
+            keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma), return_counts=True)
+            for key, count in zip(keys.astype(np.int64).tolist(), counts.tolist()):
+                bins[key] = bins.get(key, 0) + count
+            if len(bins) > MAX_BINS:
+                self._collapse(bins)
+        self.zero_count += int(np.count_nonzero(np.abs(values) <= MIN_INDEXABLE))
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @staticmethod
+    def _collapse(bins):
+        """Fold the lowest keys into one bin (precision lost near zero only)"""
+        keys = sorted(bins)
+        excess = keys[:len(keys) - MAX_BINS + 1]
+        bins[excess[-1]] = sum(bins.pop(key) for key in excess[:-1]) + bins[excess[-1]]
+
+    def merge(self, other):
+        """Add the bins of another sketch (same accuracy) to this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different accuracies')
+        for bins, other_bins in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_bins.items():
+                bins[key] = bins.get(key, 0) + count
+            if len(bins) > MAX_BINS:
+                self._collapse(bins)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        return DDSketch(self.relative_accuracy).merge(self)
+
+    def quantiles(self, qs=QUANTILES):
+        """Values at each quantile of qs (increasing), None when empty"""
+        if not self.count:
+            return [None] * len(qs)
+        ranks = [q * (self.count - 1) for q in qs]
+        # Bins in value order: negatives (largest magnitude first), zero, positives
+        ordered = [(-self._value(key), count) for key, count in sorted(self.negative.items(), reverse=True)]
+        if self.zero_count:
+            ordered.append((0.0, self.zero_count))
+        ordered.extend((self._value(key), count) for key, count in sorted(self.positive.items()))
+
+        results, seen, index = [], 0, 0
+        for rank in ranks:
+            while index < len(ordered) - 1 and seen + ordered[index][1] <= rank:
+                seen += ordered[index][1]
+                index += 1
+            results.append(min(max(ordered[index][0], self.min), self.max))
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def to_dict(self):
+        return {
+            'accuracy': self.relative_accuracy,
+            'positive': [[key, count] for key, count in sorted(self.positive.items())],
+            'negative': [[key, count] for key, count in sorted(self.negative.items())],
+            'zero': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['accuracy'])
+        sketch.positive = {key: count for key, count in data['positive']}
+        sketch.negative = {key: count for key, count in data['negative']}
+        sketch.zero_count = data['zero']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+def get_accuracy():
+    return getattr(settings, 'IOT_SKETCH_ACCURACY', DEFAULT_ACCURACY)
+
+
+def get_metrics():
+    return tuple(getattr(settings, 'IOT_SKETCH_METRICS', DEFAULT_METRICS))
+
+
+def get_cache_seconds():
+    return getattr(settings, 'IOT_SKETCH_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+
+
+def floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def summarize(sketch, qs=QUANTILES):
+    """count / min / max / mean / p50 / p90 / p99 of a sketch (JSON-ready)"""
+    values = sketch.quantiles(qs)
+    result = {
+        'count': sketch.count,
+        'min': sketch.min if sketch.count else None,
+        'max': sketch.max if sketch.count else None,
+        'mean': sketch.sum / sketch.count if sketch.count else None,
+    }
+    result.update({f'p{round(q * 100)}': value for q, value in zip(qs, values)})
+    return result
+
+
+# ==================== STORE ====================
+
+class SketchStore:
+    """
+    Deltas en mémoire + sketches persistés (QuantileSketch).
+    Keys are (metric, sensor pk or None, hour or None).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._persisted = {}  # key -> (monotonic load time, DDSketch or None)
+        self._atexit = False
+
+    def record(self, reading):
+        """Add one reading (IoTData instance) to the sketches of its metrics"""
+        from .models import METRIC_FAMILIES, SENSOR_REF_FIELDS
+
+        hour = floor_hour(reading.created_at)
+        accuracy = get_accuracy()
+        with self._lock:
+            if not self._atexit:
+                atexit.register(self._flush_at_exit)
+                self._atexit = True
+            for metric in get_metrics():
+                value = getattr(reading, metric)
+                if value is None:
+                    continue
+                sensor = getattr(reading, f'{SENSOR_REF_FIELDS[METRIC_FAMILIES[metric]]}_id')
+                for key in ((metric, None, None), (metric, sensor, None), (metric, None, hour), (metric, sensor, hour)):
+                    sketch = self._pending.get(key)
+                    if sketch is None:
+                        sketch = self._pending[key] = DDSketch(accuracy)
+                    sketch.add(value)
+
+    def record_many(self, hours, columns):
+        """
+        Add a batch of readings given as columns: ``hours`` (floor_hour of
+        each created_at) and ``columns`` mapping the tracked metrics and
+        the sensor ref attnames to sequences. Same sketches as record()
+        per reading, each (metric, sensor, hour) group binned at once.
+        """
+        from .models import METRIC_FAMILIES, SENSOR_REF_FIELDS
+
+        if not len(hours):
+            return
+        hour_codes, hour_keys = _codes(hours)
+        accuracy = get_accuracy()
+        groups = []
+        for metric in get_metrics():
+            values = np.asarray(columns[metric], dtype=np.float64)
+            sensor_codes, sensor_keys = _codes(columns[f'{SENSOR_REF_FIELDS[METRIC_FAMILIES[metric]]}_id'])
+            groups.append(((metric, None, None), values))
+            for code, part in _split(values, sensor_codes):
+                groups.append(((metric, sensor_keys[code], None), part))
+            for code, part in _split(values, hour_codes):
+                groups.append(((metric, None, hour_keys[code]), part))
+            for code, part in _split(values, sensor_codes * len(hour_keys) + hour_codes):
+                sensor, hour = divmod(code, len(hour_keys))
+                groups.append(((metric, sensor_keys[sensor], hour_keys[hour]), part))
+
+        with self._lock:
+            if not self._atexit:
+                atexit.register(self._flush_at_exit)
+                self._atexit = True
+            for key, part in groups:
+                sketch = self._pending.get(key)
+                if sketch is None:
+                    sketch = self._pending[key] = DDSketch(accuracy)
+                sketch.add_many(part)
+
+    def flush(self):
+        """Merge the pending deltas into the database; returns sketches written"""
+        from .models import QuantileSketch
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            with transaction.atomic():
+                # One query for every persisted sketch the deltas touch
+                buckets = [bucket for _, _, bucket in pending if bucket is not None]
+                scope = Q(bucket_start__isnull=True)
+                if buckets:
+                    scope |= Q(bucket_start__gte=min(buckets), bucket_start__lte=max(buckets))
+                existing = {
+                    (row.metric, row.sensor_ref_id, row.bucket_start): row
+                    for row in QuantileSketch.objects.select_for_update()
+                    .filter(scope, metric__in={metric for metric, _, _ in pending})
+                }
+                created, updated = [], []
+                for (metric, sensor, bucket), delta in pending.items():
+                    row = existing.get((metric, sensor, bucket))
+                    if row is None:
+                        created.append((metric, sensor, bucket, delta.count, delta.to_dict()))
+                        continue
+                    merged = DDSketch.from_dict(row.data).merge(delta)
+                    row.data = merged.to_dict()
+                    row.count = merged.count
+                    row.updated_at = timezone.now()
+                    updated.append(row)
+                _insert_sketches(created)
+                QuantileSketch.objects.bulk_update(updated, ['data', 'count', 'updated_at'],
+                                                   batch_size=FLUSH_BATCH_SIZE)
+        except Exception:
+            # Keep the deltas for the next flush
+            with self._lock:
+                for key, delta in pending.items():
+                    if key in self._pending:
+                        delta.merge(self._pending[key])
+                    self._pending[key] = delta
+            raise
+        with self._lock:
+            self._persisted.clear()
+        return len(pending)
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Sketch flush at exit failed')
+
+    def _load(self, metric, sensor, bucket):
+        """Persisted sketch of a key, re-read once the cached copy is too old"""
+        from .models import QuantileSketch
+
+        key = (metric, sensor, bucket)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._persisted.get(key)
+        if cached is not None and now - cached[0] < get_cache_seconds():
+            return cached[1]
+        data = (QuantileSketch.objects.filter(metric=metric, sensor_ref_id=sensor, bucket_start=bucket)
+                .values_list('data', flat=True).first())
+        sketch = DDSketch.from_dict(data) if data else None
+        with self._lock:
+            self._persisted[key] = (now, sketch)
+        return sketch
+
+    def get(self, metric, sensor=None):
+        """All-time sketch of a metric (one sensor pk, or every sensor)"""
+        persisted = self._load(metric, sensor, None)
+        sketch = persisted.copy() if persisted else DDSketch(get_accuracy())
+        with self._lock:
+            delta = self._pending.get((metric, sensor, None))
+            if delta is not None:
+                sketch.merge(delta)
+        return sketch
+
+    def get_range(self, metric, start=None, end=None, sensor=None):
+        """
+        Sketch of [start, end) merged from the hourly sketches.
+        Bounds are widened to whole hours.
+        """
+        from .models import QuantileSketch
+
+        queryset = QuantileSketch.objects.filter(metric=metric, sensor_ref_id=sensor, bucket_start__isnull=False)
+        if start is not None:
+            queryset = queryset.filter(bucket_start__gte=floor_hour(start))
+        if end is not None:
+            queryset = queryset.filter(bucket_start__lt=end)
+        sketch = DDSketch(get_accuracy())
+        for data in queryset.values_list('data', flat=True).iterator():
+            sketch.merge(DDSketch.from_dict(data))
+        with self._lock:
+            for (key_metric, key_sensor, bucket), delta in self._pending.items():
+                if (key_metric == metric and key_sensor == sensor and bucket is not None
+                        and (start is None or bucket >= floor_hour(start)) and (end is None or bucket < end)):
+                    sketch.merge(delta)
+        return sketch
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._persisted.clear()
+
+
+def _insert_sketches(rows):
+    """
+    INSERT new QuantileSketch rows given as (metric, sensor_ref_id,
+    bucket_start, count, data) tuples. An import or a seed run creates
+    hundreds of thousands of hourly sketches: values are prepared once per
+    distinct bucket instead of per model field, as bulk_create would.
+    """
+    from .models import QuantileSketch
+
+    if not rows:
+        return
+    meta = QuantileSketch._meta
+    encoder = meta.get_field('data').encoder
+    adapt_json, adapt_datetime = connection.ops.adapt_json_value, connection.ops.adapt_datetimefield_value
+    quote = connection.ops.quote_name
+    columns = ['metric', 'sensor_ref_id', 'bucket_start', 'count', 'data', 'updated_at']
+    sql = (f'INSERT INTO {quote(meta.db_table)} ({", ".join(quote(c) for c in columns)}) '
+           f'VALUES ({", ".join(["%s"] * len(columns))})')
+    now = adapt_datetime(timezone.now())
+    buckets = {None: None}
+    params = []
+    for metric, sensor, bucket, count, data in rows:
+        if bucket not in buckets:
+            buckets[bucket] = adapt_datetime(bucket)
+        params.append((metric, sensor, buckets[bucket], count, adapt_json(data, encoder), now))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _codes(values):
+    """(int array of codes, list of distinct values) of a sequence"""
+    array = np.asarray(values)
+    if array.dtype.kind in 'iu':
+        keys, codes = np.unique(array, return_inverse=True)
+        return codes.astype(np.int64), keys.tolist()
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def _split(values, codes):
+    """(code, values with that code) for each distinct code"""
+    order = np.argsort(codes, kind='stable')
+    ordered = codes[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    for start, part in zip(starts.tolist(), np.split(values[order], starts[1:])):
+        yield int(ordered[start]), part
+
+
+store = SketchStore()
+
+
+def record(reading):
+    store.record(reading)
+
+
+def record_many(hours, columns):
+    store.record_many(hours, columns)
+
+
+def percentiles(metric, sensor_id=None, start=None, end=None):
+    """
+    p50 / p90 / p99 (and count, min, max, mean) of a metric, from sketches.
+    Without start / end: all history; otherwise the hourly sketches of the range.
+    Raises ValueError for metrics without sketches.
+    """
+    from .models import SensorIdentifier
+
+    if metric not in get_metrics():
+        raise ValueError(f"No sketch for metric: {metric} (tracked: {', '.join(get_metrics())})")
+    sensor = None
+    if sensor_id is not None:
+        sensor = SensorIdentifier.lookup(sensor_id) or -1
+    if start is None and end is None:
+        sketch = store.get(metric, sensor)
+    else:
+        sketch = store.get_range(metric, start, end, sensor)
+    result = {
+        'metric': metric,
+        'sensor_id': sensor_id,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'relative_accuracy': sketch.relative_accuracy,
+    }
+    result.update(summarize(sketch))
+    return result
+
+
+def page_percentiles(metric, prefix):
+    """{'pct_<prefix>_p50': ..., ...} for the page snapshots, rounded"""
+    values = store.get(metric).quantiles(QUANTILES)
+    return {
+        f'pct_{prefix}_p{round(q * 100)}': None if value is None else round(value, 1)
+        for q, value in zip(QUANTILES, values)
+    }
+
+
+def rebuild(rows, batch_size=10000):
+    """
+    Replace every sketch with sketches of ``rows`` (IoTData-like objects
+    with created_at, the tracked metrics and the sensor ref ids).
+    Returns the number of readings added.
+    """
+    from .models import QuantileSketch
+
+    store.reset()
+    QuantileSketch.objects.all().delete()
+    added = 0
+    for row in rows:
+        store.record(row)
+        added += 1
+        if added % batch_size == 0:
+            store.flush()
+    store.flush()
+    return added
+
+
+# ==================== FLUSHER ====================
+
+class SketchFlusher(threading.Thread):
+    """Thread démon persistant les sketches à intervalle régulier"""
+
+    def __init__(self, interval):
+        super().__init__(name='iot-sketches', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        from django.db import close_old_connections
+
+        while not self._stop_event.wait(self.interval):
+            try:
+                store.flush()
+            except Exception:
+                logger.exception('Sketch flush failed')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_flusher = None
+
+
+def start_flusher():
+    """Start the flusher thread if IOT_SKETCH_FLUSH_SECONDS is set"""
+    global _flusher
+    interval = getattr(settings, 'IOT_SKETCH_FLUSH_SECONDS', None)
+    if not interval or _flusher is not None:
+        return None
+    _flusher = SketchFlusher(interval)
+    _flusher.start()
+    return _flusher
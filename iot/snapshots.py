@@ -0,0 +1,213 @@
+"""
+Instantanés colonnes d'IoTData pour l'analyse hors ligne.
+
+A snapshot is a directory with one raw little-endian array per column
+(``<column>.bin``) and a ``manifest.json`` giving dtype, row count, time
+range and, for sensor ids / OS, the code -> name dictionary::
+
+    snapshot = load_snapshot('snapshots/2025-12')
+    cpu = snapshot['cpu_usage']               # numpy.memmap, nothing read yet
+    hw = snapshot.codes('hardware_sensor_id', 'hardware_sensor_01')
+    cpu[snapshot['hardware_sensor_id'] == hw].mean()
+
+Loading only needs numpy: no Django settings, no database. Arrays are
+memory-mapped read-only, so pages are read from disk as they are touched.
+Export streams rows (archive first, then each time partition) in chunks
+and never holds the whole range in memory.
+"""
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+
+
+FORMAT = 'iot-columnar'
+VERSION = 1
+MANIFEST = 'manifest.json'
+
+TIME_COLUMN = 'created_at'
+
+# Logical column -> (stored column, dtype, kind)
+COLUMN_TYPES = {
+    'id': ('id', '<i8', 'int'),
+    'created_at': ('created_at', '<M8[us]', 'time'),
+    'hardware_sensor_id': ('hardware_sensor_ref_id', '<i4', 'category'),
+    'energy_sensor_id': ('energy_sensor_ref_id', '<i4', 'category'),
+    'network_sensor_id': ('network_sensor_ref_id', '<i4', 'category'),
+    'os': ('os_ref_id', '<i4', 'category'),
+    'hardware_timestamp': ('hardware_timestamp', '<i8', 'int'),
+    'energy_timestamp': ('energy_timestamp', '<i8', 'int'),
+    'network_timestamp': ('network_timestamp', '<i8', 'int'),
+    'win11_compat': ('win11_compat', '|b1', 'bool'),
+    'age_years': ('age_years', '<i4', 'int'),
+    'cpu_usage': ('cpu_usage', '<i4', 'int'),
+    'ram_usage': ('ram_usage', '<i4', 'int'),
+    'battery_health': ('battery_health', '<f8', 'float'),
+    'power_watts': ('power_watts', '<i4', 'int'),
+    'active_devices': ('active_devices', '<i4', 'int'),
+    'overheating': ('overheating', '<i4', 'int'),
+    'co2_equiv_g': ('co2_equiv_g', '<i4', 'int'),
+    'network_load_mbps': ('network_load_mbps', '<i4', 'int'),
+    'requests_per_min': ('requests_per_min', '<i4', 'int'),
+    'cloud_dependency_score': ('cloud_dependency_score', '<i4', 'int'),
+    'eco_score': ('eco_score', '<i4', 'int'),
+    'obsolescence_score': ('obsolescence_score', '<i4', 'int'),
+    'bigtech_dependency': ('bigtech_dependency', '<i4', 'int'),
+    'co2_savings_kg_year': ('co2_savings_kg_year', '<i4', 'int'),
+}
+
+DEFAULT_COLUMNS = ['created_at', 'hardware_sensor_id', 'energy_sensor_id', 'network_sensor_id',
+                   'cpu_usage', 'ram_usage', 'battery_health', 'power_watts', 'co2_equiv_g',
+                   'overheating', 'network_load_mbps', 'eco_score']
+
+CHUNK_ROWS = 50000
+
+
+# ==================== EXPORT ====================
+
+def _to_array(values, dtype, kind):
+    if kind == 'time':
+        # Aware UTC datetimes -> naive UTC microseconds
+        values = [value.astimezone(dt_timezone.utc).replace(tzinfo=None) for value in values]
+    return np.asarray(values, dtype=dtype)
+
+
+def iter_source_rows(stored, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """Stored-column tuples in time order: archived readings, then partitions"""
+    from . import archive, partitions
+
+    yield from archive.iter_rows(stored, start, end)
+    for queryset in partitions.querysets(start, end):
+        yield from queryset.order_by('created_at', 'id').values_list(*stored).iterator(chunk_size=chunk_rows)
+
+
+def export_snapshot(path, columns=None, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """
+    Write the readings of [start, end) to a snapshot directory.
+    Returns the manifest.
+    """
+    from .models import OperatingSystem, SensorIdentifier
+
+    columns = list(columns or DEFAULT_COLUMNS)
+    unknown = [column for column in columns if column not in COLUMN_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    if TIME_COLUMN not in columns:
+        columns.insert(0, TIME_COLUMN)
+    stored = [COLUMN_TYPES[column][0] for column in columns]
+    time_index = columns.index(TIME_COLUMN)
+
+    os.makedirs(path, exist_ok=True)
+    files = {column: open(os.path.join(path, f'{column}.bin'), 'wb') for column in columns}
+    used_codes = {column: set() for column in columns if COLUMN_TYPES[column][2] == 'category'}
+    rows, first, last = 0, None, None
+    try:
+        chunk = []
+
+        def flush():
+            for index, column in enumerate(columns):
+                _, dtype, kind = COLUMN_TYPES[column]
+                values = [row[index] for row in chunk]
+                if kind == 'category':
+                    used_codes[column].update(values)
+                _to_array(values, dtype, kind).tofile(files[column])
+            chunk.clear()
+
+        for row in iter_source_rows(stored, start, end, chunk_rows):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                rows += len(chunk)
+                first = first or chunk[0][time_index]
+                last = chunk[-1][time_index]
+                flush()
+        if chunk:
+            rows += len(chunk)
+            first = first or chunk[0][time_index]
+            last = chunk[-1][time_index]
+            flush()
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {
+        'format': FORMAT,
+        'version': VERSION,
+        'rows': rows,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'first': first.isoformat() if first else None,
+        'last': last.isoformat() if last else None,
+        'exported_at': datetime.now(dt_timezone.utc).isoformat(),
+        'columns': {},
+    }
+    for column in columns:
+        _, dtype, kind = COLUMN_TYPES[column]
+        entry = {'file': f'{column}.bin', 'dtype': dtype, 'kind': kind}
+        if kind == 'category':
+            lookup = OperatingSystem if column == 'os' else SensorIdentifier
+            entry['categories'] = {str(code): lookup.name_for(code) for code in sorted(used_codes[column])}
+        manifest['columns'][column] = entry
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ==================== LOAD ====================
+
+class Snapshot:
+    """Colonnes d'un instantané, mappées en mémoire à la demande"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != FORMAT:
+            raise ValueError(f'{path} is not an {FORMAT} snapshot')
+        self.rows = self.manifest['rows']
+        self._arrays = {}
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    def __contains__(self, column):
+        return column in self.manifest['columns']
+
+    def __getitem__(self, column):
+        """Read-only numpy.memmap of a column (zero-copy)"""
+        if column not in self._arrays:
+            entry = self.manifest['columns'][column]
+            file_path = os.path.join(self.path, entry['file'])
+            if self.rows == 0:
+                self._arrays[column] = np.empty(0, dtype=entry['dtype'])
+            else:
+                self._arrays[column] = np.memmap(file_path, dtype=entry['dtype'], mode='r', shape=(self.rows,))
+        return self._arrays[column]
+
+    def categories(self, column):
+        """{code: name} of a sensor id / OS column"""
+        return {int(code): name for code, name in self.manifest['columns'][column].get('categories', {}).items()}
+
+    def codes(self, column, name):
+        """Code of a sensor id / OS name in a category column (None if absent)"""
+        for code, label in self.categories(column).items():
+            if label == name:
+                return code
+        return None
+
+    def labels(self, column):
+        """Category column decoded to names (materialized, object array)"""
+        categories = self.categories(column)
+        codes = np.asarray(self[column])
+        lookup = np.array([None] * (max(categories, default=0) + 1), dtype=object)
+        for code, name in categories.items():
+            lookup[code] = name
+        return lookup[codes]
+
+    def __repr__(self):
+        return f"<Snapshot {self.path}: {self.rows} rows, {len(self.columns)} columns>"
+
+
+def load_snapshot(path):
+    return Snapshot(path)
@@ -18,7 +18,10 @@
                     { id: 'avg-power', key: 'avg_power', suffix: ' W' },
                     { id: 'avg-co2', key: 'avg_co2', suffix: ' g' },
                     { id: 'avg-overheating', key: 'avg_overheating', suffix: ' °C' },
-                    { id: 'avg-active', key: 'avg_active', suffix: '', round: true }
+                    { id: 'avg-active', key: 'avg_active', suffix: '', round: true },
+                    { id: 'pct-power-p50', key: 'pct_power_p50', suffix: ' W' },
+                    { id: 'pct-power-p90', key: 'pct_power_p90', suffix: ' W' },
+                    { id: 'pct-power-p99', key: 'pct_power_p99', suffix: ' W' }
                 ],
                 charts: [
                     {
@@ -18,7 +18,10 @@
                     { id: 'avg-cpu', key: 'avg_cpu', suffix: '%' },
                     { id: 'avg-ram', key: 'avg_ram', suffix: '%' },
                     { id: 'avg-battery', key: 'avg_battery', suffix: '%' },
-                    { id: 'avg-age', key: 'avg_age', suffix: ' ans' }
+                    { id: 'avg-age', key: 'avg_age', suffix: ' ans' },
+                    { id: 'pct-cpu-p50', key: 'pct_cpu_p50', suffix: '%' },
+                    { id: 'pct-cpu-p90', key: 'pct_cpu_p90', suffix: '%' },
+                    { id: 'pct-cpu-p99', key: 'pct_cpu_p99', suffix: '%' }
                 ],
                 charts: [
                     {
@@ -17,7 +17,10 @@
                 metrics: [
                     { id: 'avg-network-load', key: 'avg_network_load', suffix: ' Mbps' },
                     { id: 'avg-requests', key: 'avg_requests', suffix: '', round: true },
-                    { id: 'avg-cloud', key: 'avg_cloud', suffix: '%' }
+                    { id: 'avg-cloud', key: 'avg_cloud', suffix: '%' },
+                    { id: 'pct-network-load-p50', key: 'pct_network_load_p50', suffix: ' Mbps' },
+                    { id: 'pct-network-load-p90', key: 'pct_network_load_p90', suffix: ' Mbps' },
+                    { id: 'pct-network-load-p99', key: 'pct_network_load_p99', suffix: ' Mbps' }
                 ],
                 charts: [
                     {
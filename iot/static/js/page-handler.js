@@ -219,7 +219,7 @@ class PageDataHandler {
 
             // First check if we have server-side averages stored
             if (this.serverAverages && this.serverAverages[metric.key] !== undefined) {
-                value = this.serverAverages[metric.key];
+                value = this.serverAverages[metric.key] ?? '-';
             } else {
                 // Otherwise calculate from data array
                 const dataArray = this.data[metric.key.replace('avg_', '')] || [];
@@ -304,9 +304,9 @@ class PageDataHandler {
      * Extract server-side averages from WebSocket data
      */
     extractServerAverages(data) {
-        // Look for keys that start with 'avg_'
+        // Look for keys that start with 'avg_' (averages) or 'pct_' (sketch percentiles)
         Object.keys(data).forEach(key => {
-            if (key.startsWith('avg_')) {
+            if (key.startsWith('avg_') || key.startsWith('pct_')) {
                 this.serverAverages[key] = data[key];
             }
         });
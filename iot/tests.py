@@ -1,3 +1,960 @@
-from django.test import TestCase
+import json
+import math
+import operator
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import (archive, downsampling, gorilla, importer, ingest, line_protocol, retention, rules, routing, scoring,
+               seeding, sketches, tracing)
+from .data_utils import get_sensor_series
+from .models import (AlertRule, ArchiveSegment, ImportCheckpoint, IoTData, IoTRollup, QuantileSketch,
+                     SensorIdentifier, SensorState)
+
+
+RETENTION = {'raw': 7, 'archive': 365, 'minute': 90, 'hour': None}
+
+
+class GorillaCodecTests(SimpleTestCase):
+    """Encodage Gorilla : decode(encode(values)) == values"""
+
+    INTEGERS = [
+        [],
+        [0],
+        [-42],
+        [5, -3, -3, 0, 2 ** 40, -(2 ** 40), 7],
+        [-1_000_000, -999_000, -998_000, -997_500, -1_000_001],
+        list(range(-50, 50, 3)),
+    ]
+
+    def assertRoundTrip(self, encoding, values):
+        decoded = gorilla.decode(encoding, gorilla.encode(encoding, values), len(values))
+        self.assertEqual(decoded, values)
+
+    def test_integer_codecs(self):
+        for encoding in ('dod', 'delta'):
+            for values in self.INTEGERS:
+                with self.subTest(encoding=encoding, values=values):
+                    self.assertRoundTrip(encoding, values)
+
+    def test_dod_timestamps(self):
+        start = archive.to_micros(datetime(2026, 1, 10, tzinfo=dt_timezone.utc))
+        values = [start + i * 1_000_000 + (i % 3) * 17 for i in range(100)]
+        self.assertRoundTrip('dod', values)
+        self.assertRoundTrip('dod', values[::-1])
+
+    def test_xor_floats(self):
+        cases = [
+            [],
+            [0.0],
+            [-0.0],
+            [-12.5],
+            [98.6, 98.6, -98.6, 0.1, 1e-310, -1e300, 3.0],
+            [math.inf, -math.inf, 1.5, math.inf],
+        ]
+        for values in cases:
+            with self.subTest(values=values):
+                self.assertRoundTrip('xor', values)
+        # -0.0 == 0.0: compare the bits
+        decoded = gorilla.decode('xor', gorilla.encode('xor', [0.0, -0.0]), 2)
+        self.assertEqual([math.copysign(1, value) for value in decoded], [1, -1])
+
+    def test_xor_nan(self):
+        values = [1.0, math.nan, -2.5, math.nan, math.inf, math.nan]
+        decoded = gorilla.decode('xor', gorilla.encode('xor', values), len(values))
+        self.assertEqual(len(decoded), len(values))
+        for value, result in zip(values, decoded):
+            if math.isnan(value):
+                self.assertTrue(math.isnan(result))
+            else:
+                self.assertEqual(result, value)
+
+
+class ArchiveSegmentTests(SimpleTestCase):
+    """Segments construits en mémoire, relus colonne par colonne"""
+
+    def make_row(self, index, refs=(1, 2, 3)):
+        row = {column: index for column in archive.COLUMN_CODECS}
+        row.update(zip(archive.SEGMENT_COLUMNS, refs))
+        row.update(
+            id=index + 1,
+            created_at=datetime(2026, 1, 10, tzinfo=dt_timezone.utc) + timedelta(seconds=index),
+            battery_health=-index / 3,
+            cpu_usage=-index,
+            win11_compat=bool(index % 2),
+            recommendations_ref_id=None,
+        )
+        return row
+
+    def read(self, built):
+        names = archive.SEGMENT_COLUMNS + list(archive.COLUMN_CODECS)
+        rows = []
+        for segment, blocks in built:
+            reader = archive.SegmentReader(segment, {block.column: block for block in blocks})
+            columns = [reader.column(name) for name in names]
+            rows.extend(dict(zip(names, values)) for values in zip(*columns))
+        return rows
+
+    def test_empty(self):
+        self.assertEqual(archive.build_segments([], datetime(2026, 1, 10, tzinfo=dt_timezone.utc)), [])
+
+    def test_single_row(self):
+        row = self.make_row(0)
+        built = archive.build_segments([row], row['created_at'])
+        self.assertEqual(len(built), 1)
+        segment, _ = built[0]
+        self.assertEqual(segment.row_count, 1)
+        self.assertEqual(segment.start_time, segment.end_time)
+        self.assertEqual(self.read(built), [row])
+
+    def test_split_by_sensor_and_size(self):
+        rows = [self.make_row(i, refs=(1 + i % 2, 2, 3)) for i in range(7)]
+        built = archive.build_segments(rows, rows[0]['created_at'], segment_rows=2)
+        # 4 rows of sensor 1 and 3 of sensor 2, 2 rows per segment
+        self.assertEqual([segment.row_count for segment, _ in built], [2, 2, 2, 1])
+        self.assertCountEqual(self.read(built), rows)
+
+
+@override_settings(IOT_RETENTION=RETENTION, IOT_PARTITION_PERIOD='month')
+class ArchiveRetentionTests(TestCase):
+    """Lectures expirées par la rétention, relues depuis l'archive"""
+
+    NOW = datetime(2026, 1, 20, 12, tzinfo=dt_timezone.utc)
+
+    def store(self, created_at, index, sensor='HW_A'):
+        payload = {
+            'hardware_sensor_id': sensor,
+            'hardware_timestamp': 1_768_000_000 + index,
+            'cpu_usage': index * 7 - 30,
+            'battery_health': -1.25 * index if index % 2 else 0.1 * index,
+            'eco_score': 50,
+        }
+        (reading,), _ = ingest.create_readings([payload])
+        IoTData.objects.filter(pk=reading.pk).update(created_at=created_at)
+        return created_at, payload['cpu_usage'], payload['battery_health']
+
+    def test_empty_window(self):
+        self.assertEqual(archive.archive_queryset(IoTData.objects.none(), self.NOW), 0)
+        self.assertFalse(ArchiveSegment.objects.exists())
+
+    def test_series_across_retention(self):
+        # Three raw windows past the 7 days, one reading of another sensor,
+        # and two readings still inside the retention
+        old_start = datetime(2026, 1, 10, 8, 5, tzinfo=dt_timezone.utc)
+        expected = [self.store(old_start + timedelta(minutes=25 * i), i) for i in range(7)]
+        self.store(old_start, 99, sensor='HW_B')
+        recent = [self.store(self.NOW - timedelta(hours=2 - i), 10 + i) for i in range(2)]
+        expected += recent
+
+        report = retention.enforce_retention(now=self.NOW)
+        self.assertEqual(report['partitions_rotated'], [])
+        self.assertEqual(report['raw_archived'], 8)
+        self.assertEqual(report['raw_deleted'], 8)
+        self.assertEqual(IoTData.objects.count(), 2)
+        self.assertEqual(ArchiveSegment.objects.values('window_start').distinct().count(), 3)
+
+        # A second run finds nothing left to archive
+        report = retention.enforce_retention(now=self.NOW)
+        self.assertEqual(report['raw_archived'], 0)
+        self.assertEqual(archive.ArchivedRows(['id']).count(), 8)
+
+        series = get_sensor_series('HW_A', ['cpu_usage', 'battery_health'])
+        self.assertEqual(series['count'], len(expected))
+        self.assertEqual(series['timestamps'], [created_at.isoformat() for created_at, _, _ in expected])
+        self.assertEqual(series['series']['cpu_usage'], [cpu for _, cpu, _ in expected])
+        self.assertEqual(series['series']['battery_health'], [battery for _, _, battery in expected])
+
+        # Newest first, only the archived part
+        archived = archive.ArchivedRows(['created_at', 'cpu_usage'], hardware_sensor_ref__name='HW_A')
+        self.assertEqual(archived[:3], [(created_at, cpu) for created_at, cpu, _ in expected[6::-1]][:3])
+        self.assertEqual(archived[6], (expected[0][0], expected[0][1]))
+
+    def test_batches_split_buckets(self):
+        # Five readings of the same minute, folded two by two
+        old_start = datetime(2026, 1, 10, 8, 5, tzinfo=dt_timezone.utc)
+        expected = [self.store(old_start + timedelta(seconds=i), i) for i in range(5)]
+        report = retention.enforce_retention(now=self.NOW, batch_size=2)
+        self.assertEqual((report['raw_rolled_up'], report['raw_archived'], report['raw_deleted']), (5, 5, 5))
+        rollup = IoTRollup.objects.get(resolution='minute')
+        self.assertEqual(rollup.bucket_start, old_start)
+        self.assertEqual(rollup.sample_count, 5)
+        self.assertAlmostEqual(rollup.cpu_usage, sum(cpu for _, cpu, _ in expected) / 5)
+        series = get_sensor_series('HW_A', ['cpu_usage'])
+        self.assertEqual(series['series']['cpu_usage'], [cpu for _, cpu, _ in expected])
+
+    def test_range_inside_archive(self):
+        old_start = datetime(2026, 1, 10, 8, 5, tzinfo=dt_timezone.utc)
+        expected = [self.store(old_start + timedelta(minutes=25 * i), i) for i in range(7)]
+        retention.enforce_retention(now=self.NOW)
+        start, end = expected[2][0], expected[5][0]
+        series = get_sensor_series('HW_A', ['cpu_usage'], start=start, end=end)
+        self.assertEqual(series['series']['cpu_usage'], [cpu for _, cpu, _ in expected[2:5]])
+
+
+class ImporterResumeTests(TestCase):
+    """Import interrompu au milieu du fichier, puis repris"""
+
+    RECORDS = 10
+    BATCH_SIZE = 3
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'history.ndjson')
+        with open(self.path, 'w') as f:
+            for i in range(self.RECORDS):
+                f.write(json.dumps({
+                    'hardware_sensor_id': f'HW_{i % 2}',
+                    'hardware_timestamp': 1_768_000_000 + i,
+                    'cpu_usage': i,
+                    'created_at': f'2026-01-10T08:{i:02d}:00Z',
+                }) + '\n')
+
+    def fail_on_batch(self, number):
+        """Patch store_batch to raise after inserting the given batch"""
+        store_batch = importer.store_batch
+        calls = []
+
+        def failing(*args, **kwargs):
+            result = store_batch(*args, **kwargs)
+            calls.append(result)
+            if len(calls) == number:
+                raise RuntimeError('disk full')
+            return result
+
+        return mock.patch.object(importer, 'store_batch', side_effect=failing)
+
+    def import_file(self, **kwargs):
+        return importer.import_file(self.path, batch_size=self.BATCH_SIZE, rotate=False, **kwargs)
+
+    def live_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                [IoTData._meta.db_table],
+            )
+            return sorted(cursor.fetchall())
+
+    def assertImportedOnce(self):
+        timestamps = list(IoTData.objects.order_by('id').values_list('hardware_timestamp', flat=True))
+        self.assertEqual(timestamps, [1_768_000_000 + i for i in range(self.RECORDS)])
+
+    def test_resume_after_failed_batch(self):
+        with self.fail_on_batch(2), self.assertRaises(RuntimeError):
+            self.import_file()
+        # The failed batch rolled back with its checkpoint
+        checkpoint = ImportCheckpoint.objects.get(source=os.path.abspath(self.path))
+        self.assertEqual((checkpoint.records, checkpoint.imported, checkpoint.done), (3, 3, False))
+        self.assertEqual(IoTData.objects.count(), 3)
+
+        report = self.import_file()
+        self.assertEqual(report['resumed_at'], 3)
+        self.assertEqual((report['records'], report['imported']), (7, 7))
+        self.assertEqual(report['total_imported'], self.RECORDS)
+        self.assertImportedOnce()
+
+        # Done: a third run imports nothing
+        self.assertEqual(self.import_file()['imported'], 0)
+        self.assertImportedOnce()
+
+    def test_defer_restores_indexes_after_failure(self):
+        indexes = self.live_indexes()
+        self.assertTrue(indexes)
+        with self.fail_on_batch(3), self.assertRaises(RuntimeError):
+            self.import_file(defer=True)
+        self.assertEqual(self.live_indexes(), indexes)
+        checkpoint = ImportCheckpoint.objects.get(source=os.path.abspath(self.path))
+        self.assertEqual(checkpoint.dropped_indexes, [])
+        # Derived state of the committed batches is still to apply
+        ids = list(IoTData.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(checkpoint.pending_ranges, [[ids[0], ids[-1]]])
+
+        report = self.import_file(defer=True)
+        self.assertEqual(report['indexes_rebuilt'], len(indexes))
+        self.assertEqual(self.live_indexes(), indexes)
+        self.assertImportedOnce()
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.pending_ranges, checkpoint.dropped_indexes, checkpoint.done), ([], [], True))
+
+
+class RulesApiTests(TestCase):
+    """API des règles : corps invalides rejetés sans effet de bord"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('ops', password='x', is_staff=True)
+        self.client.force_login(user)
+
+    def post(self, body, url=None):
+        return self.client.post(url or reverse('api_rules'), json.dumps(body), content_type='application/json')
+
+    def test_non_object_bodies(self):
+        rule = AlertRule.objects.create(name='hot', expression='overheating == 1')
+        for body in ([1, 2], ['name'], 5, 'name', None):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+                response = self.client.patch(
+                    reverse('api_rule_detail', args=[rule.pk]), json.dumps(body), content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(AlertRule.objects.count(), 1)
+
+    def test_rejected_rule_does_not_intern_sensor(self):
+        response = self.post({'name': 'bad', 'expression': 'cpu_usage >> 3', 'sensor_id': 'HW_NEW'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expression', response.json()['error'])
+        self.assertFalse(SensorIdentifier.objects.filter(name='HW_NEW').exists())
+
+        response = self.post({'name': 'busy', 'expression': 'cpu_usage > 90', 'sensor_id': 'HW_NEW'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['sensor_id'], 'HW_NEW')
+
+
+def rule_reading(moment, hardware=1, energy=1, network=1, **metrics):
+    """Just enough of an IoTData row for the rules engine"""
+    return SimpleNamespace(
+        created_at=moment, hardware_sensor_ref_id=hardware, energy_sensor_ref_id=energy,
+        network_sensor_ref_id=network, **metrics,
+    )
+
+
+class RuleExpressionTests(SimpleTestCase):
+    """Syntaxe des règles"""
+
+    def test_parse(self):
+        comparisons, hold = rules.parse_expression('cpu_usage >= 95 and ram_usage>=90.5 FOR 3 readings')
+        self.assertEqual(hold, 3)
+        self.assertEqual([(c.metric, c.op, c.threshold) for c in comparisons],
+                         [('cpu_usage', '>=', 95.0), ('ram_usage', '>=', 90.5)])
+        comparisons, hold = rules.parse_expression('battery_health < -1 for 1 reading')
+        self.assertEqual((comparisons[0].threshold, hold), (-1.0, 1))
+        self.assertEqual(rules.parse_expression('overheating == 1')[1], 1)
+
+    def test_invalid(self):
+        for expression in ('', 'cpu_usage', 'cpu_usage => 3', 'cpu_usage > x', 'cpu > 3',
+                           'cpu_usage > 3 or ram_usage > 3', 'cpu_usage > 3 for 0 readings', 'cpu_usage > 3 and'):
+            with self.subTest(expression=expression), self.assertRaises(ValueError):
+                rules.parse_expression(expression)
+
+    def test_anchor_and_family(self):
+        rule = rules.CompiledRule(1, 'r', 'power_watts != 0 and cpu_usage > 5')
+        self.assertEqual(rule.anchor.metric, 'cpu_usage')
+        self.assertEqual(rule.ref_attname, 'energy_sensor_ref_id')
+        self.assertIsNone(rules.CompiledRule(2, 'r', 'power_watts != 0').anchor)
+
+
+class MetricIndexTests(SimpleTestCase):
+    """Bisection des seuils, bornes comprises"""
+
+    def test_boundaries(self):
+        index = rules.MetricIndex()
+        comparisons = [
+            rules.Comparison('cpu_usage', op, threshold)
+            for op in ('>', '>=', '<', '<=', '==') for threshold in (10, 20, 20, 30)
+        ]
+        for number, comparison in enumerate(comparisons):
+            index.add(comparison, number)
+        index.freeze()
+        for value in (-5, 9.5, 10, 10.5, 19, 20, 21, 30, 30.5, 45):
+            with self.subTest(value=value):
+                expected = [n for n, c in enumerate(comparisons) if c.test(value, c.threshold)]
+                self.assertEqual(sorted(index.match(value)), expected)
+
+    def test_empty(self):
+        index = rules.MetricIndex()
+        index.freeze()
+        self.assertEqual(list(index.match(3)), [])
+
+
+class RulesEngineTests(SimpleTestCase):
+    """Moteur indexé comparé à une évaluation naïve de chaque règle"""
+
+    START = datetime(2026, 1, 10, tzinfo=dt_timezone.utc)
+    METRICS = ('cpu_usage', 'ram_usage', 'power_watts')
+    THRESHOLDS = (10, 20, 30)
+
+    def naive(self, compiled, readings):
+        """Every rule against every reading, with its own hold / debounce state"""
+        states, fired = {}, []
+        for moment, reading in readings:
+            fired.append([])
+            for rule in compiled:
+                sensor = getattr(reading, rule.ref_attname)
+                if rule.sensor is not None and sensor != rule.sensor:
+                    continue
+                state = states.setdefault((rule.id, sensor), {'streak': 0, 'fired': False, 'last': None})
+                values = [getattr(reading, c.metric) for c in rule.comparisons]
+                if all(v is not None and c.test(v, c.threshold) for v, c in zip(values, rule.comparisons)):
+                    state['streak'] += 1
+                    if (state['streak'] >= rule.hold and not state['fired']
+                            and (state['last'] is None or (moment - state['last']).total_seconds() >= rule.cooldown)):
+                        state['fired'], state['last'] = True, moment
+                        fired[-1].append((rule.id, sensor))
+                else:
+                    state['streak'], state['fired'] = 0, False
+        return fired
+
+    def random_rules(self, rng, count):
+        compiled = []
+        for rule_id in range(count):
+            comparisons = [
+                f'{rng.choice(self.METRICS)} {rng.choice(list(rules.OPERATORS))} {rng.choice(self.THRESHOLDS)}'
+                for _ in range(rng.randint(1, 2))
+            ]
+            hold = rng.choice(('', ' for 2 readings', ' for 3 readings'))
+            compiled.append(rules.CompiledRule(
+                rule_id, f'r{rule_id}', ' and '.join(comparisons) + hold,
+                sensor=rng.choice((None, None, 1, 2)), cooldown=rng.choice((0, 30, 100)),
+            ))
+        return compiled
+
+    def test_matches_naive_evaluation(self):
+        rng = random.Random(42)
+        values = [None, *(t + d for t in self.THRESHOLDS for d in (-1, 0, 1))]
+        for _ in range(20):
+            compiled = self.random_rules(rng, 25)
+            readings = []
+            for step in range(150):
+                moment = self.START + timedelta(seconds=20 * step)
+                metrics = {metric: rng.choice(values) for metric in self.METRICS}
+                readings.append((moment, rule_reading(
+                    moment, hardware=rng.choice((1, 2)), energy=rng.choice((1, 2, 3)), **metrics
+                )))
+            engine = rules.RulesEngine()
+            engine.load(compiled)
+            got = [sorted((rule.id, sensor) for rule, sensor in engine.evaluate(reading)) for _, reading in readings]
+            self.assertEqual(got, [sorted(f) for f in self.naive(compiled, readings)])
+
+    def test_hold_and_cooldown(self):
+        engine = rules.RulesEngine()
+        engine.load([rules.CompiledRule(1, 'hot', 'power_watts > 250 for 3 readings', cooldown=60)])
+        moments = [self.START + timedelta(seconds=10 * i) for i in range(12)]
+        watts = [300, 300, 300, 300, 100, 300, 300, 300, 300, 100, 300, 300]
+        fired = [bool(engine.evaluate(rule_reading(m, power_watts=w))) for m, w in zip(moments, watts)]
+        # Fires once the hold is reached (20 s); after clearing at 40 s the
+        # hold is back at 70 s, inside the cooldown: it fires again at 80 s
+        self.assertEqual([i for i, f in enumerate(fired) if f], [2, 8])
+
+    def test_sensor_scope(self):
+        engine = rules.RulesEngine()
+        engine.load([
+            rules.CompiledRule(1, 'fleet', 'cpu_usage > 90'),
+            rules.CompiledRule(2, 'one', 'cpu_usage > 90', sensor=2),
+        ])
+        fired = engine.evaluate(rule_reading(self.START, hardware=1, energy=2, cpu_usage=95))
+        self.assertEqual([(rule.id, sensor) for rule, sensor in fired], [(1, 1)])
+        fired = engine.evaluate(rule_reading(self.START, hardware=2, cpu_usage=95))
+        self.assertEqual(sorted((rule.id, sensor) for rule, sensor in fired), [(1, 2), (2, 2)])
+
+
+@override_settings(IOT_RULES_RELOAD_SECONDS=3600)
+class RulesReloadTests(TestCase):
+    """Recompilation des règles quand la table change"""
+
+    def setUp(self):
+        rules.engine.load([])
+        rules.engine.invalidate()
+        self.addCleanup(rules.engine.invalidate)
+
+    def fired(self, **metrics):
+        rules.engine._refresh()
+        reading = rule_reading(datetime(2026, 1, 10, tzinfo=dt_timezone.utc), **metrics)
+        return [rule.name for rule, _ in rules.engine.evaluate(reading)]
+
+    def test_edit_refreshes_index(self):
+        rule = AlertRule.objects.create(name='busy', expression='cpu_usage > 90', cooldown_seconds=0)
+        self.assertEqual(self.fired(cpu_usage=95), ['busy'])
+        self.assertEqual(self.fired(cpu_usage=50), [])
+
+        rule.expression = 'cpu_usage > 40'
+        rule.save()
+        self.assertEqual(self.fired(cpu_usage=50), ['busy'])
+
+        rule.enabled = False
+        rule.save()
+        self.assertEqual(self.fired(cpu_usage=0), [])
+        self.assertEqual(self.fired(cpu_usage=99), [])
+
+    def test_changes_from_other_processes(self):
+        self.assertEqual(self.fired(cpu_usage=95), [])
+        # A write the post_save signal of this process does not see
+        AlertRule.objects.bulk_create([AlertRule(name='busy', expression='cpu_usage > 90')])
+        with override_settings(IOT_RULES_RELOAD_SECONDS=0):
+            self.assertEqual(self.fired(cpu_usage=95), ['busy'])
+
+
+def sketch_of(values, accuracy=sketches.DEFAULT_ACCURACY):
+    sketch = sketches.DDSketch(accuracy)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+class DDSketchTests(SimpleTestCase):
+    """Quantiles approchés comparés aux quantiles exacts"""
+
+    QS = (0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1)
+
+    def values(self, seed=7, size=5000):
+        rng = random.Random(seed)
+        values = [rng.lognormvariate(3, 1.5) for _ in range(size)]
+        values += [-rng.lognormvariate(1, 1) for _ in range(size // 5)] + [0.0] * 50
+        rng.shuffle(values)
+        return values
+
+    def add_many(self, values, accuracy=sketches.DEFAULT_ACCURACY):
+        sketch = sketches.DDSketch(accuracy)
+        sketch.add_many(values)
+        return sketch
+
+    def test_relative_error(self):
+        for accuracy in (0.01, 0.05):
+            values = self.values()
+            ordered = sorted(values)
+            for sketch in (sketch_of(values, accuracy), self.add_many(values, accuracy)):
+                for q, estimate in zip(self.QS, sketch.quantiles(self.QS)):
+                    exact = ordered[int(q * (len(ordered) - 1))]
+                    with self.subTest(accuracy=accuracy, q=q):
+                        self.assertLessEqual(abs(estimate - exact), accuracy * abs(exact) + 1e-12)
+                self.assertEqual((sketch.count, sketch.min, sketch.max), (len(values), ordered[0], ordered[-1]))
+
+    def test_add_many_matches_add(self):
+        values = self.values(size=300)
+        self.assertEqual(self.add_many(values).positive, sketch_of(values).positive)
+        self.assertEqual(self.add_many(values).negative, sketch_of(values).negative)
+        self.assertEqual(self.add_many(values[:3]).to_dict(), sketch_of(values[:3]).to_dict())
+
+    def test_empty(self):
+        sketch = sketches.DDSketch()
+        self.assertEqual(sketch.quantiles(), [None, None, None])
+        self.assertEqual(sketches.summarize(sketch)['min'], None)
+        self.assertEqual(sketches.DDSketch.from_dict(sketch.to_dict()).to_dict(), sketch.to_dict())
+
+    def test_merge_associative(self):
+        # Integers: sums are exact whatever the order
+        rng = random.Random(3)
+        a, b, c = ([rng.randint(-500, 5000) for _ in range(400)] for _ in range(3))
+        left = sketch_of(a).merge(sketch_of(b)).merge(sketch_of(c))
+        right = sketch_of(a).merge(sketch_of(b).merge(sketch_of(c)))
+        self.assertEqual(left.to_dict(), right.to_dict())
+        self.assertEqual(left.to_dict(), sketch_of(a + b + c).to_dict())
+        with self.assertRaises(ValueError):
+            left.merge(sketches.DDSketch(0.05))
+
+    def test_dict_round_trip(self):
+        sketch = sketch_of(self.values(size=500))
+        data = json.loads(json.dumps(sketch.to_dict()))
+        restored = sketches.DDSketch.from_dict(data)
+        self.assertEqual(restored.to_dict(), sketch.to_dict())
+        self.assertEqual(restored.quantiles(self.QS), sketch.quantiles(self.QS))
+
+    def test_collapse_keeps_high_quantiles(self):
+        values = [10 ** (i / 100) for i in range(-1200, 1200)]
+        sketch = sketch_of(values)
+        self.assertLessEqual(len(sketch.positive), sketches.MAX_BINS)
+        self.assertAlmostEqual(sketch.quantile(0.99), sorted(values)[int(0.99 * (len(values) - 1))],
+                               delta=0.01 * max(values))
+
+
+class SketchStoreTests(TestCase):
+    """Deltas en mémoire et sketches persistés"""
+
+    def setUp(self):
+        self.store = sketches.SketchStore()
+
+    def write(self, values, metric='cpu_usage'):
+        """Sketch row as another process would flush it"""
+        sketch = sketches.DDSketch()
+        for value in values:
+            sketch.add(value)
+        QuantileSketch.objects.update_or_create(
+            metric=metric, sensor_ref=None, bucket_start=None,
+            defaults={'count': sketch.count, 'data': sketch.to_dict()},
+        )
+
+    def test_other_process_flush_expires_cache(self):
+        self.write([10, 20])
+        with override_settings(IOT_SKETCH_CACHE_SECONDS=3600):
+            self.assertEqual(self.store.get('cpu_usage').count, 2)
+            self.write([10, 20, 30])
+            self.assertEqual(self.store.get('cpu_usage').count, 2)
+        with override_settings(IOT_SKETCH_CACHE_SECONDS=0):
+            self.assertEqual(self.store.get('cpu_usage').count, 3)
+
+    @override_settings(IOT_SKETCH_METRICS=['cpu_usage'])
+    def test_flush_merges_into_existing_rows(self):
+        sensor = SensorIdentifier.intern('HW_A')
+        moment = datetime(2026, 1, 10, 8, 30, tzinfo=dt_timezone.utc)
+        rng = random.Random(5)
+        values = []
+        for _ in range(3):
+            batch = [rng.randint(0, 100) for _ in range(200)]
+            values += batch
+            for value in batch:
+                self.store.record(rule_reading(moment, hardware=sensor, cpu_usage=value))
+            self.assertEqual(self.store.flush(), 4)
+        self.assertEqual(self.store.flush(), 0)
+
+        expected = sketch_of(values).to_dict()
+        rows = QuantileSketch.objects.filter(metric='cpu_usage')
+        self.assertEqual(rows.count(), 4)
+        for row in rows:
+            with self.subTest(sensor=row.sensor_ref_id, bucket=row.bucket_start):
+                self.assertEqual(row.count, len(values))
+                self.assertEqual(row.data, expected)
+        with override_settings(IOT_SKETCH_CACHE_SECONDS=0):
+            self.assertEqual(self.store.get('cpu_usage', sensor).to_dict(), expected)
+        self.assertEqual(self.store.get_range('cpu_usage', moment, moment + timedelta(hours=1)).to_dict(), expected)
+
+
+class IngestTraceTests(TestCase):
+    """Étapes received -> committed de l'ingestion"""
+
+    def setUp(self):
+        tracing.reset_histograms()
+        self.addCleanup(tracing.reset_histograms)
+
+    def test_device_timestamp_set_after_start(self):
+        trace = tracing.start_trace()
+        self.assertEqual(tracing.histograms['received'].count, 0)
+        trace.set_device_timestamp((trace.stamps['received'] - 2) * 1000)
+        self.assertAlmostEqual(trace.stamps['device'], trace.stamps['received'] - 2, places=3)
+        self.assertEqual(tracing.histograms['received'].count, 1)
+        self.assertGreaterEqual(tracing.histograms['received'].max_ms, 1999)
+
+    def test_received_before_scoring(self):
+        apply_scores = scoring.apply_scores
+
+        def slow_scores(*args):
+            time.sleep(0.05)
+            return apply_scores(*args)
+
+        with mock.patch.object(scoring, 'apply_scores', side_effect=slow_scores):
+            readings, trace = ingest.create_readings([{'hardware_timestamp': int(time.time())}])
+        self.assertEqual(len(readings), 1)
+        self.assertIn('device', trace.stamps)
+        self.assertGreaterEqual(trace.stamps['committed'] - trace.stamps['received'], 0.05)
+        self.assertGreaterEqual(tracing.histograms['committed'].max_ms, 50)
+
+
+@mock.patch.object(seeding, 'BLOCK_SIZE', 5)
+class SeedResumeTests(TestCase):
+    """Génération interrompue, reprise sans --end"""
+
+    def seed(self, **kwargs):
+        return seeding.seed_readings(12, sensors=2, days=1, rotate=False, **kwargs)
+
+    def test_resume_without_end(self):
+        store_batch = importer.store_batch
+        calls = []
+
+        def failing(*args, **kwargs):
+            calls.append(None)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return store_batch(*args, **kwargs)
+
+        with mock.patch.object(importer, 'store_batch', side_effect=failing), self.assertRaises(RuntimeError):
+            self.seed()
+        self.assertEqual(IoTData.objects.count(), 5)
+        self.assertFalse(SensorState.objects.exists())
+
+        report = self.seed()
+        self.assertEqual((report['resumed'], report['imported']), (5, 7))
+        self.assertEqual(ImportCheckpoint.objects.count(), 1)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.imported, checkpoint.pending_ranges, checkpoint.done), (12, [], True))
+        # Derived state of the rows inserted before the failure was applied too
+        self.assertEqual(sum(SensorState.objects.values_list('reading_count', flat=True)), 12)
+
+        # Same rows as an uninterrupted run ending at the first run's end
+        rows = list(IoTData.objects.order_by('id').values_list('hardware_timestamp', 'cpu_usage', 'power_watts'))
+        end = datetime.fromisoformat(checkpoint.source.removeprefix('seed_iot:0:2:12:1:'))
+        IoTData.objects.all().delete()
+        self.assertEqual(self.seed(end=end, restart=True)['imported'], 12)
+        self.assertEqual(
+            list(IoTData.objects.order_by('id').values_list('hardware_timestamp', 'cpu_usage', 'power_watts')), rows
+        )
+
+        # Completed: a new run without --end is a new span
+        self.assertEqual(self.seed()['resumed'], 0)
+        self.assertEqual(ImportCheckpoint.objects.count(), 2)
+
+
+class LineProtocolTests(SimpleTestCase):
+    """Protocole ligne : parse_line(format_line(...))"""
+
+    def test_round_trip(self):
+        cases = [
+            ({'cpu_usage': 45, 'ram_usage': 60, 'power_watts': 120}, 1701234567),
+            ({'os': 'Windows 11', 'win11_compat': True, 'battery_health': 81.5}, None),
+            ({'os': 'Linux, "Debian" 12', 'win11_compat': False}, 1701234567000),
+            ({'os': 'é=ü,#', 'cpu_usage': -3, 'battery_health': 1e-05}, None),
+            ({'network_load_mbps': 12.25, 'requests_per_min': 0}, 5),
+        ]
+        for fields, timestamp in cases:
+            with self.subTest(fields=fields):
+                payload = line_protocol.parse_line(line_protocol.format_line('ESP32_001', fields, timestamp))
+                families = {line_protocol.FIELD_FAMILIES[key] for key in fields}
+                expected = dict(fields)
+                for family in families:
+                    expected[f'{family}_sensor_id'] = 'ESP32_001'
+                    if timestamp is not None:
+                        expected[f'{family}_timestamp'] = timestamp
+                self.assertEqual(payload, expected)
+                for key, value in fields.items():
+                    self.assertIs(type(payload[key]), type(value))
+
+    def test_family_assignment(self):
+        payload = line_protocol.parse_line('ESP32_007 power_watts=120,overheating=1 1701234567')
+        self.assertEqual(payload, {
+            'power_watts': 120, 'overheating': 1,
+            'energy_sensor_id': 'ESP32_007', 'energy_timestamp': 1701234567,
+        })
+
+    def test_values(self):
+        payload = line_protocol.parse_line('S win11_compat=T,overheating=0,battery_health=7,os="a b"')
+        self.assertEqual((payload['win11_compat'], payload['battery_health'], payload['os']), (True, 7, 'a b'))
+        payload = line_protocol.parse_line('S win11_compat=f,battery_health=-2.5')
+        self.assertEqual((payload['win11_compat'], payload['battery_health']), (False, -2.5))
+
+    def test_json_lines(self):
+        nested = {'hardware': {'sensor_id': 'HW', 'cpu_usage': 5}, 'energy': {'sensor_id': 'EN'}}
+        self.assertEqual(line_protocol.parse_line('  ' + json.dumps(nested)), nested)
+        self.assertEqual(line_protocol.parse_line('{"cpu_usage": 5}'), {'cpu_usage': 5})
+
+    def test_ignored(self):
+        for line in ('', '   ', '\n', '# cpu_usage=5', '  # comment'):
+            with self.subTest(line=line):
+                self.assertIsNone(line_protocol.parse_line(line))
+
+    def test_errors(self):
+        for line in (
+            'ESP32_001',
+            'ESP32_001 cpu_usage=1 1701234567 extra',
+            'ESP32_001 cpu=1',
+            'ESP32_001 cpu_usage=1,sensor_id=2',
+            'ESP32_001 cpu_usage=abc',
+            'ESP32_001 cpu_usage=',
+            'ESP32_001 cpu_usage',
+            'ESP32_001 cpu_usage=1 soon',
+            'ESP32_001 cpu_usage=1 1.5',
+            'ESP32_001 os="unterminated',
+            'ESP32_001 os="a"b"',
+            '[1, 2]',
+            '{"cpu_usage": ',
+        ):
+            with self.subTest(line=line), self.assertRaises(ValueError):
+                line_protocol.parse_line(line)
+
+
+@override_settings(IOT_INGEST_WS_CREDITS=10, IOT_INGEST_WS_BATCH_SIZE=3, IOT_INGEST_WS_FLUSH_SECONDS=0.01)
+class IngestConsumerTests(TestCase):
+    """Ingestion WebSocket : acks, crédits et lots"""
+
+    application = URLRouter(routing.websocket_urlpatterns)
+
+    def setUp(self):
+        # Deltas of the rolled back readings must not be flushed at exit
+        self.addCleanup(sketches.store.reset)
+
+    async def connect(self, ack='message'):
+        communicator = WebsocketCommunicator(self.application, f'/ws/ingest/?ack={ack}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def reading(self, cpu_usage):
+        return {'hardware_sensor_id': 'HW_WS', 'hardware_timestamp': 1768000000 + cpu_usage, 'cpu_usage': cpu_usage}
+
+    async def stored(self):
+        return await database_sync_to_async(IoTData.objects.filter(hardware_sensor_ref__name='HW_WS').count)()
+
+    async def test_message_acks(self):
+        communicator = await self.connect()
+        ready = await communicator.receive_json_from()
+        self.assertEqual((ready['type'], ready['ack'], ready['credits'], ready['batch_size']), ('ready', 'message', 10, 3))
+        credits = ready['credits']
+
+        # One reading: acked by the flush timer
+        await communicator.send_json_to({'id': 'a', 'reading': self.reading(1)})
+        ack = await communicator.receive_json_from()
+        self.assertEqual(ack, {'type': 'ack', 'seq': 1, 'id': 'a', 'stored': 1, 'rejected': [], 'credits': 1})
+
+        # Batched frame with an invalid reading: every reading costs a credit
+        await communicator.send_json_to({'id': 'b', 'readings': [self.reading(2), 5, self.reading(3)]})
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['id'], ack['stored'], ack['credits']), (2, 'b', 2, 3))
+        self.assertEqual(ack['rejected'], [{'index': 1, 'error': 'reading is not an object'}])
+
+        # Line protocol, one malformed line
+        await communicator.send_to(text_data='HW_WS cpu_usage=4 1768000004\nHW_WS cpu=1\n# comment')
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['stored'], ack['credits']), (3, 1, 2))
+        self.assertEqual([r['index'] for r in ack['rejected']], [1])
+
+        # Malformed frames are acked with their error, their credits refunded
+        await communicator.send_to(text_data='{"readings": 3}')
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['stored'], ack['credits'], ack['error']), (4, 0, 0, '"readings" must be a list'))
+        await communicator.send_to(text_data='{not json')
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['stored'], ack['credits'], len(ack['rejected'])), (5, 0, 1, 1))
+
+        # More readings than credits: refused whole
+        await communicator.send_json_to({'readings': [self.reading(10 + i) for i in range(credits + 1)]})
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['stored'], ack['credits']), (6, 0, 0))
+        self.assertIn('Not enough credits', ack['error'])
+
+        self.assertEqual(await self.stored(), 4)
+        await communicator.disconnect()
+
+    async def test_batch_flush_and_credits(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+        # 9 of the 10 credits in flight before any ack: the batch size (3)
+        # flushes without waiting for the timer
+        for seq in range(1, 4):
+            await communicator.send_json_to({'readings': [self.reading(3 * seq + i) for i in range(3)]})
+            ack = await communicator.receive_json_from()
+            self.assertEqual((ack['seq'], ack['stored'], ack['credits']), (seq, 3, 3))
+        # Credits were refilled by the acks: 10 readings fit again
+        await communicator.send_json_to({'readings': [self.reading(20 + i) for i in range(10)]})
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['stored'], ack['credits']), (4, 10, 10))
+        self.assertEqual(await self.stored(), 19)
+        await communicator.disconnect()
+
+    async def test_cumulative_acks(self):
+        communicator = await self.connect('cumulative')
+        await communicator.receive_json_from()
+        await communicator.send_json_to({'reading': self.reading(1)})
+        await communicator.send_to(text_data='{"readings": "x"}')
+        await communicator.send_json_to({'readings': [self.reading(2), [], self.reading(3)]})
+        # Third message brings the batch to 3 readings: one ack for all
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['seq'], ack['stored'], ack['credits']), (3, 3, 4))
+        self.assertEqual(ack['rejected'], [
+            {'seq': 2, 'error': '"readings" must be a list'},
+            {'seq': 3, 'index': 1, 'error': 'reading is not an object'},
+        ])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_unknown_ack_mode(self):
+        communicator = await self.connect('never')
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+        self.assertEqual((await communicator.receive_output())['type'], 'websocket.close')
+
+
+class LTTBTests(SimpleTestCase):
+    """Sous-échantillonnage LTTB"""
+
+    def naive_lttb(self, x, y, max_points):
+        """Textbook LTTB, one point at a time"""
+        n = len(x)
+        every = (n - 2) / (max_points - 2)
+        selected, a = [0], 0
+        for b in range(max_points - 2):
+            lo, hi = int(b * every) + 1, int((b + 1) * every) + 1
+            next_lo, next_hi = hi, min(int((b + 2) * every) + 1, n)
+            if b == max_points - 3:
+                next_lo, next_hi = n - 1, n
+            x_avg = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+            y_avg = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+            areas = [abs((x[a] - x_avg) * (y[i] - y[a]) - (x[a] - x[i]) * (y_avg - y[a])) for i in range(lo, hi)]
+            a = lo + areas.index(max(areas))
+            selected.append(a)
+        return selected + [n - 1]
+
+    def test_matches_naive(self):
+        rng = random.Random(11)
+        for n, max_points in ((10, 3), (100, 7), (1000, 50), (1001, 999), (257, 16)):
+            x = sorted(rng.uniform(0, 1e6) for _ in range(n))
+            y = [rng.gauss(0, 1) for _ in range(n)]
+            with self.subTest(n=n, max_points=max_points):
+                selected = downsampling.lttb_indices(x, y, max_points).tolist()
+                self.assertEqual(selected, self.naive_lttb(x, y, max_points))
+
+    def test_bounds(self):
+        x = list(range(100))
+        y = [i % 7 for i in x]
+        for max_points in (3, 10, 99):
+            with self.subTest(max_points=max_points):
+                selected = downsampling.lttb_indices(x, y, max_points).tolist()
+                self.assertEqual(len(selected), max_points)
+                self.assertEqual((selected[0], selected[-1]), (0, 99))
+                self.assertEqual(selected, sorted(set(selected)))
+
+    def test_small_inputs(self):
+        # Nothing to drop: every point, even below MIN_POINTS
+        for n, max_points in ((10, 10), (10, 11), (10, 1000), (2, 2), (1, 1), (0, 0)):
+            with self.subTest(n=n, max_points=max_points):
+                self.assertEqual(downsampling.lttb_indices(range(n), range(n), max_points).tolist(), list(range(n)))
+        # Fewer points wanted than MIN_POINTS
+        for max_points in (2, 1, 0, -1):
+            with self.subTest(max_points=max_points), self.assertRaises(ValueError):
+                downsampling.lttb_indices(range(10), range(10), max_points)
+
+    def test_peak_kept(self):
+        y = [0.0] * 500
+        y[137], y[388] = 50.0, -50.0
+        selected = downsampling.lttb_indices(range(500), y, 20).tolist()
+        self.assertIn(137, selected)
+        self.assertIn(388, selected)
+
+    def test_missing_values(self):
+        moment = datetime(2026, 1, 10, tzinfo=dt_timezone.utc)
+        rows = [(moment + timedelta(seconds=i), None if i % 4 else float(i), i % 3) for i in range(400)]
+        rows[-1] = (rows[-1][0], None, None)
+        sampled = downsampling.downsample_rows(rows, 40)
+        self.assertEqual(len(sampled), 40)
+        self.assertEqual((sampled[0], sampled[-1]), (rows[0], rows[-1]))
+        self.assertTrue(all(row in rows for row in sampled))
+
+        # A bucket holding one real value keeps it, never a NaN
+        y = [math.nan] * 30
+        for i in (5, 14, 25):
+            y[i] = float(i)
+        selected = downsampling.lttb_indices(range(30), y, 5).tolist()
+        self.assertEqual(selected, [0, 5, 14, 25, 29])
+
+    def test_rows_pass_through(self):
+        moment = datetime(2026, 1, 10, tzinfo=dt_timezone.utc)
+        rows = [(moment + timedelta(seconds=i), i) for i in range(10)]
+        self.assertIs(downsampling.downsample_rows(rows, None), rows)
+        self.assertIs(downsampling.downsample_rows(rows, 10), rows)
+        self.assertEqual(len(downsampling.downsample_rows(rows, 4)), 4)
+
+
+class SensorSeriesApiTests(TestCase):
+    """Validation des paramètres de /api/sensors/<id>/series/"""
+
+    def get(self, **params):
+        return self.client.get(reverse('api_sensor_series', args=['HW_A']), {'metric': 'cpu_usage', **params})
+
+    def test_limit(self):
+        for limit in ('0', '-1', 'abc'):
+            with self.subTest(limit=limit):
+                response = self.get(limit=limit)
+                self.assertEqual(response.status_code, 400)
+        response = self.get(limit='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['count'], response.json()['truncated']), (0, False))
+
+    def test_max_points(self):
+        self.assertEqual(self.get(max_points='2').status_code, 400)
+        self.assertEqual(self.get(max_points='3').status_code, 200)
@@ -0,0 +1,185 @@
+"""
+Traçage de latence du pipeline d'ingestion IoT.
+
+Each reading is stamped at every stage it goes through:
+
+    device -> received -> committed -> snapshot_built -> group_send -> frame_written
+
+The gap between a stage and the one before it is recorded into a
+per-stage latency histogram (the broadcast stages are measured per
+WebSocket group: building that group's snapshot, then its group_send), so we can see where time goes when the
+dashboards lag behind the sensors. Stamps use wall-clock time
+(``time.time()``) so they stay comparable with the device timestamp and
+across processes when the channel layer is not in-memory.
+"""
+import bisect
+import threading
+import time
+import uuid
+
+
+STAGES = [
+    'device',
+    'received',
+    'committed',
+    'snapshot_built',
+    'group_send',
+    'frame_written',
+]
+
+# Stage each stage is measured from
+PREVIOUS_STAGE = {stage: STAGES[i - 1] for i, stage in enumerate(STAGES) if i > 0}
+
+# Histogram upper bounds in milliseconds (the last bucket is open ended)
+BUCKET_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+
+
+class LatencyHistogram:
+    """Histogramme de latence à buckets fixes (thread-safe)"""
+
+    def __init__(self, bounds=BUCKET_BOUNDS_MS):
+        self.bounds = list(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def observe(self, value_ms):
+        # Clock skew between the device and the server can produce
+        # negative gaps; clamp them instead of polluting the buckets.
+        value_ms = max(0.0, value_ms)
+        index = bisect.bisect_left(self.bounds, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += value_ms
+            self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, q):
+        """Estimated percentile (upper bound of the matching bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(self.bounds):
+                    return float(min(self.bounds[index], self.max_ms))
+                return self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            total_ms = self.total_ms
+            max_ms = self.max_ms
+        labels = [f'le_{bound}' for bound in self.bounds] + ['le_inf']
+        return {
+            'count': count,
+            'mean_ms': round(total_ms / count, 2) if count else 0.0,
+            'max_ms': round(max_ms, 2),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': dict(zip(labels, counts)),
+        }
+
+
+# One histogram per measured stage, plus the device -> frame total
+histograms = {stage: LatencyHistogram() for stage in PREVIOUS_STAGE}
+histograms['end_to_end'] = LatencyHistogram()
+
+
+def device_time_to_seconds(timestamp):
+    """Convertit un timestamp capteur (s ou ms) en secondes epoch"""
+    try:
+        timestamp = float(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if timestamp <= 0:
+        return None
+    # ESP32 firmwares send milliseconds, the simulators send seconds
+    if timestamp > 1e12:
+        timestamp /= 1000.0
+    return timestamp
+
+
+class IngestTrace:
+    """Horodatages d'une lecture à travers les étapes du pipeline"""
+
+    def __init__(self, device_timestamp=None, trace_id=None, stamps=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:12]
+        self.stamps = dict(stamps or {})
+        device_time = device_time_to_seconds(device_timestamp)
+        if device_time is not None:
+            self.stamps['device'] = device_time
+
+    def set_device_timestamp(self, device_timestamp):
+        """
+        Device time read from the payload after the trace started: stamp
+        it and record the device -> received latency.
+        """
+        device_time = device_time_to_seconds(device_timestamp)
+        if device_time is None or 'device' in self.stamps:
+            return
+        self.stamps['device'] = device_time
+        if 'received' in self.stamps:
+            histograms['received'].observe((self.stamps['received'] - device_time) * 1000)
+
+    def mark(self, stage, now=None, since=None):
+        """
+        Stamp a stage and record its latency from the previous stage, or
+        from ``since`` when the stage has its own start.
+        """
+        now = time.time() if now is None else now
+        previous = self.stamps.get(PREVIOUS_STAGE.get(stage)) if since is None else since
+        if previous is not None:
+            histograms[stage].observe((now - previous) * 1000)
+        if stage == 'frame_written' and 'device' in self.stamps:
+            histograms['end_to_end'].observe((now - self.stamps['device']) * 1000)
+        self.stamps[stage] = now
+        return now
+
+    def to_event(self):
+        """Serializable form carried inside channel layer messages"""
+        return {'id': self.trace_id, 'stamps': dict(self.stamps)}
+
+    @classmethod
+    def from_event(cls, payload):
+        if not payload:
+            return None
+        return cls(trace_id=payload.get('id'), stamps=payload.get('stamps'))
+
+    def copy(self):
+        return IngestTrace(trace_id=self.trace_id, stamps=self.stamps)
+
+
+def start_trace(device_timestamp=None):
+    """
+    Start a trace for a reading that has just been received (before any
+    parsing: the device timestamp can be set later, see
+    IngestTrace.set_device_timestamp)
+    """
+    trace = IngestTrace(device_timestamp)
+    trace.mark('received')
+    return trace
+
+
+def get_latency_report():
+    """Per-stage latency histograms, for the metrics API"""
+    return {
+        'stages': STAGES,
+        'histograms': {name: histogram.snapshot() for name, histogram in histograms.items()},
+    }
+
+
+def reset_histograms():
+    for histogram in histograms.values():
+        histogram.reset()
@@ -18,13 +18,30 @@ urlpatterns = [
     path('energy-data/', views.get_energy_data, name='api_energy'),
     path('network-data/', views.get_network_data, name='api_network'),
     path('scores-data/', views.get_scores_data, name='api_scores'),
+    path('fleet-data/', views.get_fleet_data, name='api_fleet'),
+    path('alerts/', views.get_alerts_data, name='api_alerts'),
     path('history/', views.get_history_data, name='api_history'),
+    path('sensors/<str:sensor_id>/series/', views.get_sensor_series, name='api_sensor_series'),
+    # Analytics APIs
+    path('analytics/<str:metric>/', views.get_metric_analytics, name='api_metric_analytics'),
+    path('analytics/<str:metric>/sensors/', views.get_sensor_comparison, name='api_sensor_comparison'),
+    path('analytics/<str:metric>/percentiles/', views.get_metric_percentiles, name='api_metric_percentiles'),
+    path('reports/', views.get_reports, name='api_reports'),
     # Session management APIs
     path('session-info/', views.get_session_info, name='api_session_info'),
     path('extend-session/', views.extend_session, name='api_extend_session'),
     # Quiz APIs
     path('quiz/questions/', views.get_quiz_questions, name='api_quiz_questions'),
     path('quiz/submit/', views.submit_quiz_result, name='api_quiz_submit'),
+    # Observability APIs (staff only)
+    path('metrics/latency/', views.get_latency_metrics, name='api_metrics_latency'),
+    path('metrics/queries/', views.get_query_metrics, name='api_metrics_queries'),
+    path('metrics/recommendations/', views.get_recommendation_metrics, name='api_metrics_recommendations'),
+    path('metrics/profiler/', views.profiler_control, name='api_metrics_profiler'),
+    # Alert rules APIs (staff only)
+    path('rules/', views.rules_collection, name='api_rules'),
+    path('rules/alerts/', views.get_rule_alerts, name='api_rule_alerts'),
+    path('rules/<int:rule_id>/', views.rule_detail, name='api_rule_detail'),
 ]
 
 
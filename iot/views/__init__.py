@@ -21,12 +21,18 @@ from .api_views import (
     get_energy_data,
     get_network_data,
     get_scores_data,
+    get_fleet_data,
+    get_alerts_data,
     get_history_data,
+    get_sensor_series,
     get_session_info,
     extend_session,
     get_quiz_questions,
     submit_quiz_result
 )
+from .analytics_views import get_metric_analytics, get_metric_percentiles, get_reports, get_sensor_comparison
+from .metrics_views import get_latency_metrics, get_query_metrics, get_recommendation_metrics, profiler_control
+from .rules_views import get_rule_alerts, rule_detail, rules_collection
 
 __all__ = [
     # Authentication
@@ -47,9 +53,26 @@ __all__ = [
     'get_energy_data',
     'get_network_data',
     'get_scores_data',
+    'get_fleet_data',
+    'get_alerts_data',
     'get_history_data',
+    'get_sensor_series',
     'get_session_info',
     'extend_session',
     'get_quiz_questions',
     'submit_quiz_result',
+    # Analytics APIs
+    'get_metric_analytics',
+    'get_metric_percentiles',
+    'get_sensor_comparison',
+    'get_reports',
+    # Observability APIs
+    'get_latency_metrics',
+    'get_query_metrics',
+    'get_recommendation_metrics',
+    'profiler_control',
+    # Alert rules APIs
+    'rules_collection',
+    'rule_detail',
+    'get_rule_alerts',
 ]
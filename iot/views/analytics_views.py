@@ -0,0 +1,107 @@
+"""
+Analytics API views (vectorized statistics over large windows)
+"""
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from .api_views import parse_time_param
+
+
+@require_http_methods(["GET"])
+def get_metric_analytics(request, metric):
+    """
+    Summary (mean, p50/p95/p99), linear trend and moving average of a metric.
+    Params:
+        from / to: ISO 8601 datetime or epoch seconds
+        sensor: restrict to one sensor id
+        resolution: raw (default), minute or hour (rollups)
+        window: moving average window in points, default 60
+        points: max moving average points returned, default 500
+    """
+    try:
+        from .. import analytics
+        data = analytics.metric_report(
+            metric,
+            start=parse_time_param(request.GET.get('from')),
+            end=parse_time_param(request.GET.get('to')),
+            sensor_id=request.GET.get('sensor') or None,
+            resolution=request.GET.get('resolution', 'raw'),
+            window=int(request.GET.get('window', 60)),
+            points=min(int(request.GET.get('points', 500)), 5000),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse(data, status=200)
+
+
+@require_http_methods(["GET"])
+def get_sensor_comparison(request, metric):
+    """
+    Per-sensor statistics of a metric (count, mean, std, percentiles, trend).
+    Params:
+        from / to: ISO 8601 datetime or epoch seconds
+        resolution: raw (default), minute or hour (rollups)
+    """
+    try:
+        from .. import analytics
+        data = analytics.sensor_comparison(
+            metric,
+            start=parse_time_param(request.GET.get('from')),
+            end=parse_time_param(request.GET.get('to')),
+            resolution=request.GET.get('resolution', 'raw'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse(data, status=200)
+
+
+@require_http_methods(["GET"])
+def get_metric_percentiles(request, metric):
+    """
+    p50 / p90 / p99 of a metric from the quantile sketches (constant time).
+    Params:
+        sensor: restrict to one sensor id
+        from / to: merge the hourly sketches of this range (whole hours)
+    """
+    try:
+        from .. import sketches
+        data = sketches.percentiles(
+            metric,
+            sensor_id=request.GET.get('sensor') or None,
+            start=parse_time_param(request.GET.get('from')),
+            end=parse_time_param(request.GET.get('to')),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse(data, status=200)
+
+
+@require_http_methods(["GET"])
+def get_reports(request):
+    """
+    Stored daily / monthly reports (manage.py generate_reports), newest first.
+    Params:
+        period: day (default) or month
+        sensor: sensor id, fleet-wide reports when omitted
+        from / to: range of period starts (ISO 8601 datetime or epoch seconds)
+        limit: default 100, cap 1000
+    """
+    try:
+        from .. import reports
+        data = reports.list_reports(
+            period=request.GET.get('period', 'day'),
+            sensor_id=request.GET.get('sensor') or None,
+            start=parse_time_param(request.GET.get('from')),
+            end=parse_time_param(request.GET.get('to')),
+            limit=min(int(request.GET.get('limit', 100)), 1000),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse(data, status=200)
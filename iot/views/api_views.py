@@ -2,10 +2,11 @@
 API views for JSON responses and data ingestion
 """
 import json
+from datetime import datetime, timezone
 from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from ..models import IoTData
 
 
 @csrf_exempt
@@ -18,86 +19,8 @@ def iot_data_post(request):
     try:
         data = json.loads(request.body)
         
-        # Extract nested data structures (from Node-RED format)
-        # Support both nested format and flat format for backwards compatibility
-        hardware_data = data.get('hardware', data)
-        energy_data = data.get('energy', data)
-        network_data = data.get('network', data)
-        scores_data = data.get('scores', data)
-        
-        # Create new IoT data record
-        iot_data = IoTData.objects.create(
-            # Hardware fields - try nested first, then root
-            hardware_sensor_id=hardware_data.get('sensor_id', data.get('hardware_sensor_id', 'unknown')),
-            hardware_timestamp=hardware_data.get('timestamp', data.get('hardware_timestamp', 0)),
-            age_years=hardware_data.get('age_years', data.get('age_years', 0)),
-            cpu_usage=hardware_data.get('cpu_usage', data.get('cpu_usage', 0)),
-            ram_usage=hardware_data.get('ram_usage', data.get('ram_usage', 0)),
-            battery_health=hardware_data.get('battery_health', data.get('battery_health', 0)),
-            os=hardware_data.get('os', data.get('os', 'unknown')),
-            win11_compat=hardware_data.get('win11_compat', data.get('win11_compat', False)),
-            
-            # Energy fields
-            energy_sensor_id=energy_data.get('sensor_id', data.get('energy_sensor_id', 'unknown')),
-            energy_timestamp=energy_data.get('timestamp', data.get('energy_timestamp', 0)),
-            power_watts=energy_data.get('power_watts', data.get('power_watts', 0)),
-            active_devices=energy_data.get('active_devices', data.get('active_devices', 0)),
-            overheating=energy_data.get('overheating', data.get('overheating', 0)),
-            co2_equiv_g=energy_data.get('co2_equiv_g', data.get('co2_equiv_g', 0)),
-            
-            # Network fields
-            network_sensor_id=network_data.get('sensor_id', data.get('network_sensor_id', 'unknown')),
-            network_timestamp=network_data.get('timestamp', data.get('network_timestamp', 0)),
-            network_load_mbps=network_data.get('network_load_mbps', data.get('network_load_mbps', 0)),
-            requests_per_min=network_data.get('requests_per_min', data.get('requests_per_min', 0)),
-            cloud_dependency_score=network_data.get('cloud_dependency_score', data.get('cloud_dependency_score', 0)),
-            
-            # Scores from nested object or root
-            eco_score=scores_data.get('eco_score', 0),
-            obsolescence_score=scores_data.get('obsolescence_score', 0),
-            bigtech_dependency=scores_data.get('bigtech_dependency', 0),
-            co2_savings_kg_year=scores_data.get('co2_savings_kg_year', 0),
-            recommendations=scores_data.get('recommendations', {}),
-        )
-        
-        # Send updated data via WebSocket to all connected clients
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        from .. import data_utils
-        
-        channel_layer = get_channel_layer()
-        
-        # Define groups and their data functions
-        groups = [
-            'dashboard_updates',
-            'hardware_updates',
-            'energy_updates',
-            'network_updates',
-            'scores_updates'
-        ]
-        
-        data_functions = {
-            'dashboard_updates': data_utils.get_dashboard_data_dict,
-            'hardware_updates': data_utils.get_hardware_data_dict,
-            'energy_updates': data_utils.get_energy_data_dict,
-            'network_updates': data_utils.get_network_data_dict,
-            'scores_updates': data_utils.get_scores_data_dict,
-        }
-        
-        # Send data to each WebSocket group
-        for group in groups:
-            try:
-                data_dict = data_functions[group]()
-                async_to_sync(channel_layer.group_send)(
-                    group,
-                    {
-                        'type': 'data_update',
-                        'data': data_dict
-                    }
-                )
-            except Exception as e:
-                # Log error but don't block response
-                print(f"Error sending WebSocket to group {group}: {e}")
+        from .. import ingest
+        iot_data = ingest.ingest_reading(data)
         
         return JsonResponse({
             'message': 'IoT data created successfully',
@@ -115,7 +38,8 @@ def get_latest_data(request):
     """Get the most recent IoT data record"""
     try:
         from .. import data_utils
-        latest_data = IoTData.objects.order_by('-created_at').first()
+        from .. import partitions
+        latest_data = partitions.latest_reading()
         
         if latest_data:
             data = data_utils.serialize_iot_data(latest_data)
@@ -182,6 +106,38 @@ def get_scores_data(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@require_http_methods(["GET"])
+def get_fleet_data(request):
+    """Get the current state of every sensor (online / stale / offline)"""
+    try:
+        from .. import data_utils
+        data = data_utils.get_fleet_data_dict()
+        return JsonResponse(data, status=200)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def get_alerts_data(request):
+    """
+    Get the latest anomaly alerts, newest first.
+    Params: sensor, metric, kind (zscore / rate / stuck), limit (default 50, cap 500)
+    """
+    try:
+        from .. import data_utils
+        data = data_utils.get_alerts_data_dict(
+            limit=min(int(request.GET.get('limit', 50)), 500),
+            sensor_id=request.GET.get('sensor'),
+            metric=request.GET.get('metric'),
+            kind=request.GET.get('kind'),
+        )
+        return JsonResponse(data, status=200)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit parameter'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @require_http_methods(["GET"])
 def get_history_data(request):
     """
@@ -203,6 +159,60 @@ def get_history_data(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def parse_time_param(value):
+    """Parse an ISO 8601 datetime or epoch seconds query parameter"""
+    if value in (None, ''):
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = None
+    if seconds is not None:
+        try:
+            return datetime.fromtimestamp(seconds, tz=timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            # nan, inf, 1e20: out of the platform's range
+            raise ValueError(f'Invalid datetime: {value}') from None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Invalid datetime: {value}')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+@require_http_methods(["GET"])
+def get_sensor_series(request, sensor_id):
+    """
+    Get the time series of one sensor.
+    Params:
+        metric: comma separated metric names (same sensor family)
+        from: ISO 8601 datetime or epoch seconds (inclusive)
+        to: ISO 8601 datetime or epoch seconds (exclusive)
+        limit: max number of points (>= 1), default and cap 10000
+        resolution: raw (default), minute or hour (retention rollups)
+        max_points: LTTB-downsample the range to this many points (cap 5000)
+    """
+    from .. import data_utils
+
+    metrics = [m for m in request.GET.get('metric', '').split(',') if m]
+    if not metrics:
+        return JsonResponse({'error': 'Missing metric parameter'}, status=400)
+    try:
+        start = parse_time_param(request.GET.get('from'))
+        end = parse_time_param(request.GET.get('to'))
+        limit = min(int(request.GET.get('limit', data_utils.MAX_SERIES_POINTS)), data_utils.MAX_SERIES_POINTS)
+        resolution = request.GET.get('resolution', 'raw')
+        max_points = request.GET.get('max_points')
+        max_points = min(int(max_points), data_utils.MAX_CHART_POINTS) if max_points else None
+        data = data_utils.get_sensor_series(sensor_id, metrics, start, end, limit, resolution, max_points)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse(data, status=200)
+
+
 @require_http_methods(["GET"])
 def get_session_info(request):
     """
@@ -0,0 +1,103 @@
+"""
+Observability API views (staff only)
+"""
+from functools import wraps
+import json
+from django.http import JsonResponse
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods
+from .. import db_profiling
+from .. import profiling
+from .. import recommendations
+from .. import tracing
+
+
+def staff_required(view_func):
+    """Restrict a JSON API view to authenticated staff users"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Not authenticated'}, status=401)
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Staff access required'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+@require_http_methods(["GET"])
+@staff_required
+def get_latency_metrics(request):
+    """
+    Per-stage ingest latency histograms.
+    Params:
+        reset: if set, clear the histograms after reading them
+    """
+    report = tracing.get_latency_report()
+    if request.GET.get('reset'):
+        tracing.reset_histograms()
+    return JsonResponse(report, status=200)
+
+
+@require_http_methods(["GET"])
+@staff_required
+def get_query_metrics(request):
+    """
+    Top query fingerprints by total time and recent slow queries.
+    Requires IOT_QUERY_PROFILING = True.
+    Params:
+        top: number of fingerprints to return
+        reset: if set, clear the statistics after reading them
+    """
+    try:
+        top = int(request.GET['top']) if 'top' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid top parameter'}, status=400)
+    report = db_profiling.get_query_report(top)
+    if request.GET.get('reset'):
+        db_profiling.stats.reset()
+    return JsonResponse(report, status=200)
+
+
+@require_http_methods(["GET"])
+@staff_required
+def get_recommendation_metrics(request):
+    """
+    Hit rate of the recommendations LRU cache.
+    Params:
+        reset: if set, empty the cache and its counters after reading them
+    """
+    report = recommendations.stats()
+    if request.GET.get('reset'):
+        recommendations.reset()
+    return JsonResponse(report, status=200)
+
+
+@ensure_csrf_cookie
+@require_http_methods(["GET", "POST"])
+@staff_required
+def profiler_control(request):
+    """
+    Control the sampling profiler.
+    GET returns its status (and sets the CSRF cookie), POST {"action":
+    "start" | "stop"} with the X-CSRFToken header toggles it.
+    Stopping writes the collapsed stacks and returns the file path.
+    """
+    profiler = profiling.get_profiler()
+    if request.method == 'GET':
+        return JsonResponse(profiler.status(), status=200)
+
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    if not isinstance(body, dict):
+        return JsonResponse({'error': 'JSON body must be an object'}, status=400)
+    action = body.get('action')
+
+    if action == 'start':
+        started = profiler.start()
+        return JsonResponse({**profiler.status(), 'started': started}, status=200)
+    if action == 'stop':
+        path = profiler.stop()
+        return JsonResponse({**profiler.status(), 'output': str(path) if path else None}, status=200)
+    return JsonResponse({'error': 'action must be "start" or "stop"'}, status=400)
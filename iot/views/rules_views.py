@@ -0,0 +1,108 @@
+"""
+Alert rules API views (staff only)
+Session-authenticated: writes need the CSRF token (X-CSRFToken header),
+whose cookie is set at login or by GET /api/rules/
+"""
+import json
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods
+from .metrics_views import staff_required
+
+RULE_FIELDS = ('name', 'expression', 'sensor_id', 'cooldown_seconds', 'enabled')
+
+
+def apply_rule_fields(rule, data):
+    """
+    Copy the editable fields of a JSON body onto a rule and validate it.
+    The sensor is only interned once the rest is valid: call it in the
+    transaction that saves the rule.
+    """
+    from ..models import SensorIdentifier
+
+    if not isinstance(data, dict):
+        raise ValidationError('Body must be a JSON object')
+    unknown = set(data) - set(RULE_FIELDS)
+    if unknown:
+        raise ValidationError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    for field in ('name', 'expression', 'cooldown_seconds', 'enabled'):
+        if field in data:
+            setattr(rule, field, data[field])
+    sensor_id = str(data['sensor_id']) if data.get('sensor_id') else None
+    max_length = SensorIdentifier._meta.get_field('name').max_length
+    if sensor_id and len(sensor_id) > max_length:
+        raise ValidationError({'sensor_id': [f'At most {max_length} characters']})
+    rule.full_clean(exclude=['sensor_ref'])
+    if 'sensor_id' in data:
+        rule.sensor_ref_id = SensorIdentifier.intern(sensor_id) if sensor_id else None
+
+
+@ensure_csrf_cookie
+@require_http_methods(["GET", "POST"])
+@staff_required
+def rules_collection(request):
+    """
+    GET: list the alert rules.
+    POST: create one, body {"name", "expression", "sensor_id"?, "cooldown_seconds"?, "enabled"?}
+    """
+    from .. import rules
+    from ..models import AlertRule
+
+    if request.method == 'GET':
+        return JsonResponse({'rules': [rules.serialize_rule(rule) for rule in AlertRule.objects.all()]}, status=200)
+    try:
+        rule = AlertRule()
+        with transaction.atomic():
+            apply_rule_fields(rule, json.loads(request.body))
+            rule.save()
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': e.message_dict if hasattr(e, 'error_dict') else e.messages}, status=400)
+    return JsonResponse(rules.serialize_rule(rule), status=201)
+
+
+@require_http_methods(["GET", "PATCH", "DELETE"])
+@staff_required
+def rule_detail(request, rule_id):
+    """GET, PATCH (same fields as creation) or DELETE one alert rule"""
+    from .. import rules
+    from ..models import AlertRule
+
+    rule = AlertRule.objects.filter(pk=rule_id).first()
+    if rule is None:
+        return JsonResponse({'error': 'Rule not found'}, status=404)
+    if request.method == 'DELETE':
+        rule.delete()
+        return JsonResponse({'deleted': rule_id}, status=200)
+    if request.method == 'PATCH':
+        try:
+            with transaction.atomic():
+                apply_rule_fields(rule, json.loads(request.body))
+                rule.save()
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except ValidationError as e:
+            return JsonResponse({'error': e.message_dict if hasattr(e, 'error_dict') else e.messages}, status=400)
+    return JsonResponse(rules.serialize_rule(rule), status=200)
+
+
+@require_http_methods(["GET"])
+@staff_required
+def get_rule_alerts(request):
+    """
+    Latest rule alerts, newest first.
+    Params: rule (id), sensor, limit (default 50, cap 500)
+    """
+    try:
+        from .. import data_utils
+        data = data_utils.get_rule_alerts_data_dict(
+            limit=min(int(request.GET.get('limit', 50)), 500),
+            rule_id=int(request.GET['rule']) if request.GET.get('rule') else None,
+            sensor_id=request.GET.get('sensor'),
+        )
+        return JsonResponse(data, status=200)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid rule or limit parameter'}, status=400)
@@ -18,6 +18,12 @@ django_asgi_app = get_asgi_application()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 import iot.routing
+from iot import retention, sketches
+
+# Optional in-process retention scheduler (IOT_RETENTION_INTERVAL_SECONDS)
+retention.start_scheduler()
+# Periodic persistence of the quantile sketches (IOT_SKETCH_FLUSH_SECONDS)
+sketches.start_flusher()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
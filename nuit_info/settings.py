@@ -135,4 +135,73 @@ CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',
     },
-}
\ No newline at end of file
+}
+# Query profiling (opt-in): slow query log with EXPLAIN QUERY PLAN
+IOT_QUERY_PROFILING = False
+IOT_SLOW_QUERY_MS = 50
+IOT_QUERY_TOP_N = 20
+
+# Sampling profiler (opt-in): toggled by signal or /api/metrics/profiler/
+IOT_PROFILER_SIGNAL = None  # e.g. 'SIGUSR2'
+IOT_PROFILER_INTERVAL_MS = 5
+IOT_PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Fleet view: a sensor is stale / offline after this many seconds without data
+IOT_SENSOR_STALE_SECONDS = 60
+IOT_SENSOR_OFFLINE_SECONDS = 300
+
+# Data retention in days (None = keep forever), see `manage.py enforce_retention`
+IOT_RETENTION = {
+    'raw': 7,        # raw readings, then averaged into minute rollups
+    'archive': 365,  # raw readings in the compressed archive (0 = no archive)
+    'minute': 90,    # minute rollups, then folded into hour rollups
+    'hour': None,    # hour rollups
+}
+IOT_RETENTION_INTERVAL_SECONDS = None  # e.g. 3600 to run in-process under daphne
+IOT_RETENTION_BATCH_SIZE = 5000
+IOT_RETENTION_BATCH_PAUSE = 0.05
+IOT_ARCHIVE_SEGMENT_ROWS = 4096
+
+# IoTData time partitions ('month' or 'day'), see `manage.py partition_iotdata`
+IOT_PARTITION_PERIOD = 'month'
+
+# Analytics / charts: points loaded per request, LTTB input cap for downsampled series
+IOT_ANALYTICS_MAX_POINTS = 2000000
+IOT_DOWNSAMPLE_MAX_INPUT = 500000
+
+# Quantile sketches (p50/p90/p99 cards), see `manage.py rebuild_sketches`
+IOT_SKETCH_METRICS = ['cpu_usage', 'power_watts', 'network_load_mbps']
+IOT_SKETCH_ACCURACY = 0.01  # relative error on every quantile
+IOT_SKETCH_FLUSH_SECONDS = 60
+IOT_SKETCH_CACHE_SECONDS = 5  # flushes of other processes visible after this
+
+# Streaming anomaly detection on ingest (alerts table + ws/alerts/)
+IOT_ANOMALY_DETECTION = True
+IOT_ANOMALY_Z = 4.0             # |value - mean| in standard deviations (Welford)
+IOT_ANOMALY_RATE_Z = 6.0        # step between readings vs EWMA step volatility
+IOT_ANOMALY_EWMA_ALPHA = 0.1
+IOT_ANOMALY_MIN_SAMPLES = 30    # warm-up readings per sensor and metric
+IOT_ANOMALY_STUCK_READINGS = 30
+IOT_ANOMALY_COOLDOWN_SECONDS = 300
+
+# Operator alert rules (AlertRule), reloaded from the database this often
+IOT_RULES_RELOAD_SECONDS = 10
+
+# Server-side scores (iot/scoring.py): formula version, and whether scores
+# sent by devices are overwritten ('server') or kept when present ('device')
+IOT_SCORE_VERSION = 1
+IOT_SCORING_MODE = 'server'
+
+# Generated recommendations, memoized per bucketed features (LRU entries)
+IOT_RECOMMENDATIONS_CACHE_SIZE = 4096  # covers every feature tuple (2304)
+
+# Offline reports (manage.py generate_reports): metrics and worker processes
+IOT_REPORT_METRICS = ['power_watts', 'co2_equiv_g', 'eco_score', 'obsolescence_score',
+                      'bigtech_dependency', 'co2_savings_kg_year']
+IOT_REPORT_WORKERS = None  # None: one per CPU core
+
+# WebSocket ingest (ws/ingest/): readings in flight per connection, readings
+# per INSERT, seconds a partial batch waits for more messages
+IOT_INGEST_WS_CREDITS = 2000
+IOT_INGEST_WS_BATCH_SIZE = 500
+IOT_INGEST_WS_FLUSH_SECONDS = 0.05